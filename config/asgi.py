@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+# /account/events/ (SSE) es una vista async: servir con un servidor ASGI
+# (p. ej. ``uvicorn config.asgi:application``) para que cada conexión abierta no ocupe
+# un hilo. Bajo WSGI funciona igual, pero con un hilo por cliente conectado.
+
 application = get_asgi_application()
@@ -119,6 +119,28 @@ import os as _os
 if _os.getenv("USE_SQLITE_FOR_TESTS", "1") == "1":
     DATABASES["default"].setdefault("TEST", {})
     DATABASES["default"]["TEST"]["ENGINE"] = "django.db.backends.sqlite3"
+# Los índices con INCLUDE (cubrientes) son de PostgreSQL; en SQLite se crean sin esas columnas
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
+# --- Caché ---
+# Las invalidaciones (estado de usuario, versiones de entitlement, eventos en vivo) tienen
+# que llegar a todos los procesos: con varios workers la caché debe ser compartida.
+# CACHE_URL=redis://host:6379/0 usa Redis; CACHE_URL=db la tabla de la base
+# (python manage.py createcachetable); vacío = memoria local, solo para un único proceso.
+CACHE_URL = os.getenv("CACHE_URL", "")
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+elif CACHE_URL == "db":
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "core_cache"}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# --- Consultas lentas (core/slowqueries.py) ---
+# 0 desactiva el wrapper. EXPLAIN (FORMAT JSON) solo en PostgreSQL.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN_LIMIT = int(os.getenv("SLOW_QUERY_EXPLAIN_LIMIT", "3"))
+SLOW_QUERY_PERSIST = os.getenv("SLOW_QUERY_PERSIST", "1") == "1"
+
 # --- Validación de contraseñas ---
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -158,6 +180,118 @@ MP_WEBHOOK_URL    = os.getenv("MP_WEBHOOK_URL", "")
 
 # --- API bridge Frontend (NextAuth) → Django ---
 FRONTEND_SYNC_API_KEY = os.getenv("FRONTEND_SYNC_API_KEY", "dev-frontend-sync")
+# /api/user/status/batch/: máximo de emails por request y TTL de la caché por email
+USER_STATUS_BATCH_MAX = int(os.getenv("USER_STATUS_BATCH_MAX", "500"))
+USER_STATUS_CACHE_SECONDS = int(os.getenv("USER_STATUS_CACHE_SECONDS", "60"))
+# /api/auth/upsert_users/: máximo de usuarios por request
+USER_UPSERT_BATCH_MAX = int(os.getenv("USER_UPSERT_BATCH_MAX", "1000"))
+# Tokens de entitlement (JWT HS256). El frontend verifica con el mismo secreto.
+ENTITLEMENT_TOKEN_SECRET = os.getenv("ENTITLEMENT_TOKEN_SECRET", "dev-entitlements")
+ENTITLEMENT_TOKEN_TTL = int(os.getenv("ENTITLEMENT_TOKEN_TTL", "300"))
+# Mucho menor que ENTITLEMENT_TOKEN_TTL: es la demora máxima de una revocación si la caché
+# no es compartida (ver CACHE_URL)
+ENTITLEMENT_VERSION_CACHE_SECONDS = int(os.getenv("ENTITLEMENT_VERSION_CACHE_SECONDS", "5"))
+
+# --- ASGI ---
+# 1 = /api/plans/, /api/user/status/, /api/subscriptions/start/ y el webhook de MP usan las
+# vistas async de core/views_async.py (servir con uvicorn/daphne vía config/asgi.py)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+MP_HTTP_TIMEOUT = float(os.getenv("MP_HTTP_TIMEOUT", "10"))
+
+# --- Procesamiento de formularios (core/form_processing.py) ---
+# FORM_WORKERS = 0: etapas en el mismo proceso (sin ProcessPoolExecutor)
+FORM_WORKERS = int(os.getenv("FORM_WORKERS", "2"))
+FORM_BATCH_SIZE = int(os.getenv("FORM_BATCH_SIZE", "20"))
+FORM_MAX_ATTEMPTS = int(os.getenv("FORM_MAX_ATTEMPTS", "5"))
+FORM_RETRY_BASE_SECONDS = int(os.getenv("FORM_RETRY_BASE_SECONDS", "30"))
+FORM_CLAIM_LEASE_SECONDS = int(os.getenv("FORM_CLAIM_LEASE_SECONDS", "600"))
+# Payload columnar más grande que esto va a MEDIA_ROOT/payloads/ en vez de a la fila
+FORM_PAYLOAD_INLINE_MAX = int(os.getenv("FORM_PAYLOAD_INLINE_MAX", str(1024 * 1024)))
+# Cola justa (core/form_scheduler.py): peso por Plan.code y tope de forms en proceso por
+# usuario ("codigo=valor,..."); sin plan = tier "none"
+FORM_PLAN_WEIGHTS = {
+    k: float(v)
+    for k, v in (p.split("=", 1) for p in os.getenv("FORM_PLAN_WEIGHTS", "basic=1,pro=2,enterprise=4").split(",") if p)
+}
+FORM_PLAN_MAX_INFLIGHT = {
+    k: int(v)
+    for k, v in (p.split("=", 1) for p in os.getenv("FORM_PLAN_MAX_INFLIGHT", "basic=1,pro=2,enterprise=4").split(",") if p)
+}
+FORM_USER_MAX_INFLIGHT = int(os.getenv("FORM_USER_MAX_INFLIGHT", "1"))
+FORM_QUEUE_STATS_SECONDS = int(os.getenv("FORM_QUEUE_STATS_SECONDS", "15"))
+# Reproceso incremental (core/incremental.py): si cambia más de esta fracción de las filas
+# respecto de la subida anterior se reprocesa completo; 0 lo desactiva
+FORM_INCREMENTAL_MAX_CHANGE = float(os.getenv("FORM_INCREMENTAL_MAX_CHANGE", "0.5"))
+
+# --- Subidas reanudables por partes (core/uploads.py, /api/uploads/) ---
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "200"))
+# Cada parte cabe en un request corto; se escribe a disco en bloques, sin bufferizarla
+UPLOAD_CHUNK_MAX_BYTES = int(os.getenv("UPLOAD_CHUNK_MAX_BYTES", str(8 * 1024 * 1024)))
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+
+# --- Retención (core/retention.py, manage.py purge_forms) ---
+# Forms creados hace más de estos días se borran con sus archivos; 0 = nunca
+FORM_RETENTION_DAYS = int(os.getenv("FORM_RETENTION_DAYS", "0"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+# Pausa entre lotes: acota locks y WAL a costa de duración total
+RETENTION_SLEEP_SECONDS = float(os.getenv("RETENTION_SLEEP_SECONDS", "0.2"))
+RETENTION_FILE_WORKERS = int(os.getenv("RETENTION_FILE_WORKERS", "4"))
+
+# --- Almacenamiento de archivos (core/storage.py) ---
+# Dónde quedan los CSV subidos: "file://" (MEDIA_ROOT), "file:///ruta" o "s3://bucket/prefijo"
+STORAGE_UPLOADS_URI = os.getenv("STORAGE_UPLOADS_URI", "file://")
+# "always" (archivo + directorio), "data" (solo archivo) o "never"
+STORAGE_FSYNC = os.getenv("STORAGE_FSYNC", "always")
+# Niveles de subdirectorios (2 hex c/u) bajo cada carpeta local
+STORAGE_FANOUT = int(os.getenv("STORAGE_FANOUT", "2"))
+# S3 o compatible (MinIO, `manage.py s3_standin`); endpoint vacío = AWS
+STORAGE_S3_ENDPOINT = os.getenv("STORAGE_S3_ENDPOINT", "")
+STORAGE_S3_REGION = os.getenv("STORAGE_S3_REGION", "us-east-1")
+STORAGE_S3_ACCESS_KEY = os.getenv("STORAGE_S3_ACCESS_KEY", "")
+STORAGE_S3_SECRET_KEY = os.getenv("STORAGE_S3_SECRET_KEY", "")
+STORAGE_S3_PART_MB = int(os.getenv("STORAGE_S3_PART_MB", "8"))
+
+# --- Exportaciones en streaming (core/exports.py, /api/exports/, manage.py export_data) ---
+# Además del staff logueado; vacío = solo staff
+EXPORT_API_KEY = os.getenv("EXPORT_API_KEY", "")
+# Filas por vuelta del cursor del servidor
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# --- Respaldo lógico (core/backup.py, manage.py backup_data / restore_data) ---
+BACKUP_DIR = Path(os.getenv("BACKUP_DIR", str(BASE_DIR / "backups")))
+BACKUP_WORKERS = int(os.getenv("BACKUP_WORKERS", "4"))
+BACKUP_SEGMENT_ROWS = int(os.getenv("BACKUP_SEGMENT_ROWS", "100000"))
+# Margen del incremental sobre la hora del respaldo anterior (transacciones largas)
+BACKUP_OVERLAP_SECONDS = float(os.getenv("BACKUP_OVERLAP_SECONDS", "300"))
+
+# --- Admin en modo rendimiento (core/admin_perf.py) ---
+# Sin filtros se usa la estimación de pg_class desde este tamaño; con filtros se cuenta hasta el tope
+ADMIN_ESTIMATE_MIN_ROWS = int(os.getenv("ADMIN_ESTIMATE_MIN_ROWS", "100000"))
+ADMIN_COUNT_CAP = int(os.getenv("ADMIN_COUNT_CAP", "10000"))
+# Ventana por defecto de los filtros de fecha (AuditLog.at, Form.created_at)
+ADMIN_DEFAULT_DAYS = int(os.getenv("ADMIN_DEFAULT_DAYS", "7"))
+# "trigram" (icontains + índices pg_trgm) o "prefix" (istartswith) si no se puede instalar pg_trgm
+ADMIN_SEARCH_MODE = os.getenv("ADMIN_SEARCH_MODE", "trigram")
+ADMIN_FILTER_CACHE_SECONDS = int(os.getenv("ADMIN_FILTER_CACHE_SECONDS", "600"))
+
+# --- Eventos en vivo (core/live.py, SSE /account/events/) ---
+# "notify" (LISTEN/NOTIFY), "cache" (sondeo) o vacío = notify en PostgreSQL, cache en otro caso
+LIVE_BACKEND = os.getenv("LIVE_BACKEND", "")
+LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "1"))
+LIVE_CACHE_SECONDS = int(os.getenv("LIVE_CACHE_SECONDS", "600"))
+LIVE_HEARTBEAT_SECONDS = int(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+# El stream se corta y EventSource reconecta solo: acota conexiones zombis
+LIVE_STREAM_MAX_SECONDS = int(os.getenv("LIVE_STREAM_MAX_SECONDS", "300"))
+# /account/ solo sigue el estado con un pago iniciado hace menos de esto o un cambio de plan
+# pendiente; bajo WSGI lo hace con sondeos cortos cada LIVE_CLIENT_POLL_SECONDS
+LIVE_PENDING_SECONDS = int(os.getenv("LIVE_PENDING_SECONDS", "900"))
+LIVE_CLIENT_POLL_SECONDS = float(os.getenv("LIVE_CLIENT_POLL_SECONDS", "5"))
+
+# --- Métricas Prometheus (core/metrics.py) ---
+# Con varios workers de gunicorn define un directorio compartido y vacíalo al arrancar.
+METRICS_API_KEY = os.getenv("METRICS_API_KEY", "dev-metrics")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
 
 # Detección rápida de modo sandbox/test para depuración
 MP_IS_TEST = str(MP_ACCESS_TOKEN).startswith("TEST-") or str(MP_PUBLIC_KEY).startswith("TEST-")
@@ -0,0 +1,219 @@
+# core/admin_perf.py
+"""Modo rendimiento del admin para tablas grandes (``AuditLog``, ``Form``, slots).
+
+El changelist por defecto hace ``COUNT(*)`` de la tabla (dos veces, con el total sin
+filtros), pagina con ``OFFSET``, busca con ``icontains`` en OR sobre todos los campos (un
+OR entre tablas no puede usar índices) y calcula las opciones de ``list_filter`` con
+``SELECT DISTINCT`` sobre toda la tabla. ``PerformanceAdmin`` cambia eso por:
+
+- ``EstimatedCountPaginator``: sin filtros, ``reltuples`` de ``pg_class`` (la estimación
+  del último ANALYZE); con filtros, un conteo acotado a ``ADMIN_COUNT_CAP`` filas.
+- Paginación keyset sobre ``ordering`` (``?cursor=``): cada página es un rango del índice,
+  sin importar la profundidad. Si el usuario ordena por otra columna se vuelve a ``OFFSET``.
+- Búsqueda por un solo lado: con ``@`` solo en los campos de email, si no solo en los
+  demás, con índices trigram (o de prefijo, ver ``ADMIN_SEARCH_MODE`` y la migración 0018).
+- ``recent_filter``: filtro de fecha activo por defecto (``ADMIN_DEFAULT_DAYS``).
+- ``cached_values_filter``: opciones de columnas sin ``choices`` desde caché.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+CURSOR_VAR = "cursor"
+
+
+def estimated_rows(model, using: str = "default") -> int:
+    """Filas según las estadísticas de PostgreSQL; -1 si no hay (otra base o sin ANALYZE)."""
+    conn = connections[using]
+    if conn.vendor != "postgresql":
+        return -1
+    with conn.cursor() as cur:
+        cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        row = cur.fetchone()
+    return int(row[0]) if row else -1
+
+
+class EstimatedCountPaginator(Paginator):
+    """``count`` estimado (``estimated``) o acotado (``capped``: hay más de ``cap``)."""
+
+    estimated = capped = False
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not qs.query.where:
+            n = estimated_rows(qs.model, qs.db)
+            if n >= getattr(settings, "ADMIN_ESTIMATE_MIN_ROWS", 100_000):
+                self.estimated = True
+                return n
+        cap = getattr(settings, "ADMIN_COUNT_CAP", 10_000)
+        n = qs.order_by().values("pk")[: cap + 1].count()
+        self.capped = n > cap
+        return min(n, cap)
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, fields: list) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(values) != len(fields):
+            raise ValueError
+        return [f.to_python(v) for f, v in zip(fields, values)]
+    except Exception:
+        raise IncorrectLookupParameters("cursor inválido")
+
+
+def keyset_q(ordering: list[str], values: list) -> Q:
+    """Filas después de ``values`` en ``ordering`` (comparación lexicográfica)."""
+    q = Q()
+    for i, name in enumerate(ordering):
+        op = "lt" if name.startswith("-") else "gt"
+        step = Q(**{f"{name.lstrip('-')}__{op}": values[i]})
+        for prev, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev.lstrip("-"): value})
+        q |= step
+    return q
+
+
+class KeysetChangeList(ChangeList):
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filtros, búsqueda y orden nuevos empiezan desde la primera página
+        if CURSOR_VAR not in (new_params or {}):
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        ordering = list(self.model_admin.ordering or ())
+        self.keyset = bool(ordering) and ORDER_VAR not in self.params and not self.list_editable
+        if not self.keyset:
+            return super().get_results(request)
+        opts = self.model._meta
+        fields = [opts.pk if n.lstrip("-") == "pk" else opts.get_field(n.lstrip("-")) for n in ordering]
+        qs = self.queryset.order_by(*ordering)
+        cursor = request.GET.get(CURSOR_VAR)
+        if cursor:
+            qs = qs.filter(keyset_q(ordering, decode_cursor(cursor, fields)))
+        rows = list(qs[: self.list_per_page + 1])
+        more = len(rows) > self.list_per_page
+        self.result_list = rows[: self.list_per_page]
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = more or bool(cursor)
+        last = self.result_list[-1] if more else None
+        self.next_url = (
+            self.get_query_string({CURSOR_VAR: encode_cursor([getattr(last, f.attname) for f in fields])})
+            if last else None
+        )
+        self.first_url = self.get_query_string(remove=[CURSOR_VAR]) if cursor else None
+
+
+class PerformanceAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term or not self.search_fields:
+            return queryset, False
+        is_email = "@" in term
+        fields = [f for f in self.search_fields if ("email" in f) == is_email] or list(self.search_fields)
+        lookup = "istartswith" if getattr(settings, "ADMIN_SEARCH_MODE", "trigram") == "prefix" else "icontains"
+        q = Q()
+        for f in fields:
+            q |= Q(**{f"{f}__{lookup}": term})
+        return queryset.filter(q), False
+
+
+def recent_filter(field: str, title: str = "", days: tuple = (1, 7, 30, 90)):
+    """Filtro por antigüedad de ``field``, activo por defecto (``ADMIN_DEFAULT_DAYS``)."""
+
+    class RecentFilter(admin.SimpleListFilter):
+        parameter_name = f"{field}_dias"
+
+        def __init__(self, request, params, model, model_admin):
+            self.title = title or model._meta.get_field(field).verbose_name
+            super().__init__(request, params, model, model_admin)
+
+        @property
+        def default(self) -> str:
+            return str(getattr(settings, "ADMIN_DEFAULT_DAYS", 7))
+
+        def lookups(self, request, model_admin):
+            return [(str(d), f"Últimos {d} días" if d > 1 else "Último día") for d in days] + [("all", "Todo")]
+
+        def choices(self, changelist):
+            current = self.value() or self.default
+            for lookup, display in self.lookup_choices:
+                yield {
+                    "selected": current == lookup,
+                    "query_string": changelist.get_query_string({self.parameter_name: lookup}),
+                    "display": display,
+                }
+
+        def queryset(self, request, queryset):
+            value = self.value() or self.default
+            if value == "all":
+                return queryset
+            try:
+                since = timezone.now() - timedelta(days=int(value))
+            except ValueError:
+                raise IncorrectLookupParameters(f"{self.parameter_name} inválido")
+            return queryset.filter(**{f"{field}__gte": since})
+
+    return RecentFilter
+
+
+def cached_values_filter(field: str, title: str = "", limit: int = 200):
+    """Como ``list_filter = (field,)`` pero el ``DISTINCT`` se guarda en caché."""
+
+    class CachedValuesFilter(admin.SimpleListFilter):
+        parameter_name = field
+
+        def __init__(self, request, params, model, model_admin):
+            self.title = title or model._meta.get_field(field).verbose_name
+            self.model = model
+            super().__init__(request, params, model, model_admin)
+
+        def lookups(self, request, model_admin):
+            key = f"admin:values:{self.model._meta.label_lower}:{field}"
+            values = cache.get_or_set(
+                key,
+                lambda: list(self.model._default_manager.order_by(field).values_list(field, flat=True).distinct()[:limit]),
+                getattr(settings, "ADMIN_FILTER_CACHE_SECONDS", 600),
+            )
+            return [(str(v), str(v)) for v in values]
+
+        def queryset(self, request, queryset):
+            return queryset.filter(**{field: self.value()}) if self.value() else queryset
+
+    return CachedValuesFilter
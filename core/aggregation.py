@@ -0,0 +1,169 @@
+# core/aggregation.py
+"""Totales de compras/ventas por RUT de contraparte, tipo de documento y período.
+
+El group-by trabaja sobre columnas codificadas como enteros: RUT y período con
+diccionario, tipo de documento como su número. La clave de grupo es un solo entero
+(``(rut * n_doc + doc) * n_per + per``). Con NumPy la suma es vectorizada
+(``np.unique`` + ``np.bincount``); sin NumPy se usa un bucle sobre arrays tipados, más
+lento pero con el mismo resultado. Las columnas de texto se codifican con un diccionario
+en una pasada; las conversiones (``int``, período) se aplican solo a los valores distintos.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Optional, Sequence
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None
+
+# Columnas del registro de compras / ventas del SII
+RUT_COLUMNS = ("RUT Proveedor", "RUT Cliente")
+DOC_COLUMN = "Tipo Doc"
+DATE_COLUMN = "Fecha Docto"
+AMOUNT_FIELDS = {
+    "exento": ("Monto Exento",),
+    "neto": ("Monto Neto",),
+    "iva": ("Monto IVA Recuperable", "Monto IVA"),
+    "total": ("Monto Total",),
+}
+
+
+def _encode(values: Sequence) -> tuple[array, list]:
+    index: dict = {}
+    codes = array("q", (index.setdefault(v, len(index)) for v in values))
+    return codes, list(index)
+
+
+def period_of(fecha: str) -> str:
+    """``dd/mm/aaaa`` o ``aaaa-mm-dd`` → ``aaaa-mm``; vacío si no se reconoce."""
+    fecha = (fecha or "").strip()
+    if len(fecha) >= 10 and fecha[2] == "/" and fecha[5] == "/":
+        return f"{fecha[6:10]}-{fecha[3:5]}"
+    if len(fecha) >= 7 and fecha[4] == "-":
+        return fecha[:7]
+    return ""
+
+
+def _pick(columns: dict, names: Sequence[str]) -> Optional[Sequence]:
+    for n in names:
+        if n in columns:
+            return columns[n]
+    return None
+
+
+def _as_np(values: Sequence) -> "np.ndarray":
+    if isinstance(values, array) and values.typecode == "q":
+        return np.frombuffer(values, dtype=np.int64)  # sin copia
+    return np.asarray(values, dtype=np.int64)
+
+
+def _group_np(keys, amounts):
+    uniq, inv = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inv, minlength=len(uniq))
+    sums = {}
+    for field, values in amounts.items():
+        # bincount suma en float64: exacto mientras |total| < 2**53
+        w = np.bincount(inv, weights=_as_np(values), minlength=len(uniq))
+        sums[field] = np.rint(w).astype(np.int64).tolist()
+    return uniq.tolist(), counts.tolist(), sums
+
+
+def _group_py(keys, amounts):
+    slot: dict[int, int] = {}
+    inv = array("q", (slot.setdefault(key, len(slot)) for key in keys))
+    counts = [0] * len(slot)
+    for i in inv:
+        counts[i] += 1
+    sums = {}
+    for field, values in amounts.items():
+        acc = [0] * len(slot)
+        for i, v in zip(inv, values):
+            acc[i] += v
+        sums[field] = acc
+    return list(slot), counts, sums
+
+
+def _int_codes(values: Sequence) -> tuple[Sequence, list]:
+    if np is not None:
+        uniq, inv = np.unique(_as_np(values), return_inverse=True)
+        return inv.astype(np.int64), uniq.tolist()
+    return _encode(values)
+
+
+def _table_codes(table, names: Sequence[str], n: int) -> tuple[Sequence, list]:
+    """(códigos, valores distintos) de la primera columna presente de ``names``."""
+    name = next((c for c in names if c in table.columns), None)
+    if name is None:
+        return array("q", bytes(8 * n)), [""]
+    ctype = table.column_type(name)
+    if ctype == "dict":
+        return table.codes(name)  # ya codificada en el payload
+    if ctype == "int":
+        return _int_codes(table.int_array(name))
+    return _encode(table.column(name))
+
+
+def _remap(codes: Sequence, raw_values: list, convert) -> tuple[Sequence, list]:
+    """Aplica ``convert`` a los valores distintos y re-codifica (p. ej. fecha → período)."""
+    value_map, values = _encode([convert(v) for v in raw_values])
+    if np is not None:
+        return np.frombuffer(value_map, dtype=np.int64)[np.asarray(codes, dtype=np.int64)], values
+    return array("q", (value_map[c] for c in codes)), values
+
+
+def _group(n: int, rut, doc, per, amounts: dict[str, Sequence]) -> list[dict]:
+    (rut_c, rut_values), (doc_c, doc_values), (per_c, per_values) = rut, doc, per
+    nd, npe = len(doc_values), len(per_values)
+    if np is not None:
+        r = np.asarray(rut_c, dtype=np.int64)
+        keys = (r * nd + np.asarray(doc_c, dtype=np.int64)) * npe + np.asarray(per_c, dtype=np.int64)
+        uniq, counts, sums = _group_np(keys, amounts)
+    else:
+        keys = array("q", ((r * nd + d) * npe + p for r, d, p in zip(rut_c, doc_c, per_c)))
+        uniq, counts, sums = _group_py(keys, amounts)
+
+    out = []
+    for g, key in enumerate(uniq):
+        r, rest = divmod(key, nd * npe)
+        d, p = divmod(rest, npe)
+        out.append({
+            "counterparty_rut": rut_values[r],
+            "doc_type": doc_values[d],
+            "period": per_values[p],
+            "rows": counts[g],
+            **{f: sums[f][g] for f in AMOUNT_FIELDS},
+        })
+    return out
+
+
+def aggregate_table(table) -> list[dict]:
+    """Resumen desde una tabla de ``core/columnar.py``: usa directamente los códigos de
+    diccionario y los arrays int64 del payload (sin listas de objetos por fila)."""
+    n = table.rows
+    if not n:
+        return []
+    rut = _table_codes(table, RUT_COLUMNS, n)
+    doc = _remap(*_table_codes(table, (DOC_COLUMN,), n), lambda d: int(d or 0))
+    per = _remap(*_table_codes(table, (DATE_COLUMN,), n), period_of)
+    zeros = array("q", bytes(8 * n))
+    amounts = {}
+    for field, names in AMOUNT_FIELDS.items():
+        name = next((c for c in names if c in table.columns), None)
+        amounts[field] = table.int_array(name) if name else zeros
+    return _group(n, rut, doc, per, amounts)
+
+
+def aggregate_columns(columns: dict[str, Sequence]) -> list[dict]:
+    """Igual que ``aggregate_table`` pero sobre columnas en listas (filas ya parseadas)."""
+    n = len(next(iter(columns.values()), []))
+    if not n:
+        return []
+    blank = [""] * n
+    rut = _encode(_pick(columns, RUT_COLUMNS) or blank)
+    doc = _remap(*_encode(columns.get(DOC_COLUMN) or blank), lambda d: int(d or 0))
+    per = _remap(*_encode(columns.get(DATE_COLUMN) or blank), period_of)
+    zeros = array("q", bytes(8 * n))
+    amounts = {f: (_pick(columns, names) or zeros) for f, names in AMOUNT_FIELDS.items()}
+    return _group(n, rut, doc, per, amounts)
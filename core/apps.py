@@ -5,4 +5,7 @@ class CoreConfig(AppConfig):
     name = "core"
 
     def ready(self):
-        from . import signals  # noqa: F401
+        from . import checks, signals  # noqa: F401
+        from . import slowqueries
+
+        slowqueries.install()
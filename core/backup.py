@@ -0,0 +1,493 @@
+# core/backup.py
+"""Respaldo lógico de las tablas de ``core`` (``manage.py backup_data`` / ``restore_data``).
+
+Cada respaldo es un directorio bajo ``BACKUP_DIR`` con segmentos JSONL comprimidos
+(``<tabla>-00001.jsonl.gz``, uno por rango de ``segment_rows`` pks) y un ``manifest.json``
+con filas, bytes y sha256 de cada segmento; el manifiesto se escribe al final, así que un
+directorio sin él es un respaldo incompleto.
+
+Los segmentos se vuelcan en paralelo en un pool de procesos (serializar a JSON es CPU y
+con hilos lo frena el GIL), cada uno con su conexión. En PostgreSQL todos leen el mismo
+snapshot exportado con ``pg_export_snapshot()`` (como ``pg_dump -j``): el respaldo es
+consistente aunque haya escrituras mientras corre.
+
+Incremental: el manifiesto guarda por tabla el pk máximo y la hora de inicio del respaldo.
+El siguiente incremental vuelca solo lo nuevo o cambiado desde ahí: pk mayor en tablas que
+solo crecen y columnas de fecha (``at``, ``created_at``, ``updated_at``, ...) en las que
+cambian, con ``overlap`` segundos de margen para transacciones largas. Tablas sin columna
+que delate cambios (planes, usuarios, suscripción actual, slots) van completas. Los
+borrados (retención) no se registran. Los resúmenes derivados (``SubscriptionMonthlySummary``
+y ``RutFormSummary``) no se respaldan: la restauración los recalcula al final desde el
+ledger y los Forms.
+
+La restauración aplica la cadena (completo + incrementales en orden) tabla por tabla en
+orden de dependencias, con ``bulk_create`` por lotes (upsert por pk) dentro de una sola
+transacción con las FKs diferidas, recalcula los resúmenes y al final reajusta las
+secuencias de ids.
+"""
+from __future__ import annotations
+
+import base64
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import zlib
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from . import ledger, rut_summary, storage
+from .models import (
+    AuditLog, EntitlementVersion, FileUpload, Form, FormAggregate, FormPayload, FormTransition, Plan,
+    SubscriptionMonthlySummary, UploadSession, UserRutSlot, UserSubscriptionCurrent, UserSubscriptionHistory,
+)
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+
+class BackupError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Table:
+    model: type
+    # Filas nuevas o cambiadas desde (since, last_pk); None = la tabla va completa
+    changed: Optional[Callable[[datetime, Optional[int]], Q]] = None
+    append_only: bool = False  # restauración: las filas existentes no se reescriben
+
+    @property
+    def name(self) -> str:
+        return self.model._meta.label_lower
+
+
+def _pk_or(*fields: str):
+    def changed(since, last_pk):
+        q = Q(pk__gt=last_pk) if last_pk is not None else Q()
+        for f in fields:
+            q |= Q(**{f"{f}__gt": since})
+        return q
+    return changed
+
+
+# En orden de dependencias (la restauración sigue este orden)
+TABLES = (
+    Table(get_user_model()),
+    # Versión hacia atrás = tokens revocados vuelven a valer
+    Table(EntitlementVersion, _pk_or("updated_at")),
+    Table(Plan),
+    Table(UserSubscriptionCurrent),
+    Table(UserSubscriptionHistory, _pk_or("valid_from"), append_only=True),
+    Table(Form, _pk_or("submitted_at", "claimed_at", "processed_at")),
+    Table(UserRutSlot),  # locked_by_form → Form; no todos los save() tocan updated_at
+    # rows_count/hashes se llenan al procesar el Form
+    Table(FileUpload, _pk_or("form__claimed_at", "form__processed_at")),
+    Table(UploadSession, _pk_or("created_at", "updated_at")),
+    Table(FormPayload, _pk_or("created_at", "form__processed_at")),
+    Table(FormAggregate, _pk_or("form__processed_at")),  # se escriben al terminar el Form
+    Table(FormTransition, _pk_or("at"), append_only=True),
+    Table(AuditLog, _pk_or("at"), append_only=True),
+)
+BY_NAME = {t.name: t for t in TABLES}
+
+
+@dataclass
+class _TableResult:
+    name: str
+    rows: int = 0
+    raw_bytes: int = 0  # JSONL sin comprimir
+    bytes: int = 0
+    max_pk: Optional[int] = None
+    segments: list = field(default_factory=list)
+
+
+@dataclass
+class _BackupResult:
+    path: Path
+    incremental: bool
+    tables: dict = field(default_factory=dict)
+    started: float = field(default_factory=time.monotonic)
+    elapsed: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return sum(t.rows for t in self.tables.values())
+
+    @property
+    def raw_bytes(self) -> int:
+        return sum(t.raw_bytes for t in self.tables.values())
+
+    @property
+    def bytes(self) -> int:
+        return sum(t.bytes for t in self.tables.values())
+
+    @property
+    def mb_per_sec(self) -> float:
+        """MB/s de JSONL (sin comprimir): comparable entre niveles de compresión."""
+        return self.raw_bytes / (1024 * 1024) / max(self.elapsed or time.monotonic() - self.started, 1e-9)
+
+
+# -----------------------------
+# Codificación de filas
+# -----------------------------
+class _Encoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()  # DjangoJSONEncoder recorta a milisegundos
+        if isinstance(o, (bytes, memoryview)):
+            return base64.b64encode(bytes(o)).decode()  # BinaryField.to_python lo decodifica
+        return super().default(o)
+
+
+def _columns(model) -> list:
+    return list(model._meta.concrete_fields)
+
+
+class _SegmentWriter:
+    """Un segmento gzip, con el sha256 del archivo comprimido calculado mientras se escribe.
+    El archivo se crea con la primera fila: un rango vacío no deja segmento."""
+
+    FLUSH_LINES = 1000
+
+    def __init__(self, path: Path, level: int, fsync: str):
+        self.path, self.level, self.fsync = path, level, fsync
+        self.fh = None
+        self.pending: list[str] = []
+        self.seg = {"file": path.name, "rows": 0, "raw_bytes": 0, "bytes": 0}
+
+    def _out(self, data: bytes):
+        if data:
+            self.fh.write(data)
+            self.digest.update(data)
+            self.seg["bytes"] += len(data)
+
+    def add(self, line: str):
+        self.pending.append(line)
+        if len(self.pending) >= self.FLUSH_LINES:
+            self._flush()
+
+    def _flush(self):
+        if self.fh is None:
+            self.fh = open(self.path, "wb")
+            self.z = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            self.digest = hashlib.sha256()
+        raw = "".join(self.pending).encode()
+        self._out(self.z.compress(raw))
+        self.seg["rows"] += len(self.pending)
+        self.seg["raw_bytes"] += len(raw)
+        self.pending = []
+
+    def close(self) -> Optional[dict]:
+        if self.pending:
+            self._flush()
+        if self.fh is None:
+            return None
+        self._out(self.z.flush())
+        if self.fsync != "never":
+            self.fh.flush()
+            os.fsync(self.fh.fileno())
+        self.fh.close()
+        self.seg["sha256"] = self.digest.hexdigest()
+        return self.seg
+
+
+def _dump_segment(name: str, part: int, pk_range: Optional[tuple[int, int]], out_dir: Path,
+                  since: Optional[datetime], last_pk: Optional[int], snapshot: Optional[str],
+                  level: int, fsync: str, chunk_size: int = 2000) -> tuple[str, int, Optional[dict]]:
+    """Vuelca las filas de la tabla ``name`` con pk en ``pk_range`` (todas si es None); con
+    ``since`` (incremental) solo las nuevas o cambiadas. Devuelve (tabla, parte, segmento)."""
+    table = BY_NAME[name]
+    names = [f.attname for f in _columns(table.model)]
+    encoder = _Encoder(ensure_ascii=False, separators=(",", ":"))
+    writer = _SegmentWriter(out_dir / f"{name}-{part:05d}.jsonl.gz", level, fsync)
+    with transaction.atomic():
+        if snapshot:
+            with connection.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute("SET TRANSACTION SNAPSHOT %s", [snapshot])
+        qs = table.model._base_manager.all()
+        if pk_range:
+            qs = qs.filter(pk__gte=pk_range[0], pk__lte=pk_range[1])
+        if since is not None and table.changed is not None:
+            qs = qs.filter(table.changed(since, last_pk))
+        for row in qs.order_by("pk").values_list(*names).iterator(chunk_size=chunk_size):
+            writer.add(encoder.encode(dict(zip(names, row))) + "\n")
+    return name, part, writer.close()
+
+
+def _dump_in_worker(*args):
+    try:
+        return _dump_segment(*args)
+    finally:
+        connection.close()  # conexión propia del proceso
+
+
+# -----------------------------
+# Manifiestos
+# -----------------------------
+def root() -> Path:
+    return Path(getattr(settings, "BACKUP_DIR", Path(settings.BASE_DIR) / "backups"))
+
+
+def read_manifest(path: Path) -> dict:
+    try:
+        return json.loads((path / MANIFEST).read_text())
+    except FileNotFoundError:
+        raise BackupError(f"{path} no tiene {MANIFEST} (respaldo incompleto o inexistente)")
+
+
+def latest(base_dir: Optional[Path] = None) -> Optional[Path]:
+    """Último respaldo completo (con manifiesto) bajo ``base_dir``."""
+    done = sorted(p for p in (base_dir or root()).glob("*/" + MANIFEST))
+    return done[-1].parent if done else None
+
+
+def chain(path: Path) -> list[Path]:
+    """Respaldos a aplicar para restaurar ``path``: el completo y sus incrementales."""
+    out = [path]
+    while (base := read_manifest(out[0]).get("base")):
+        out.insert(0, path.parent / base)
+    return out
+
+
+# -----------------------------
+# Respaldo
+# -----------------------------
+def backup(
+    base_dir: Optional[Path] = None,
+    incremental: bool = False,
+    workers: int = 4,
+    segment_rows: int = 100_000,
+    level: int = 6,
+    overlap: float = 300.0,
+    tables: Optional[list[str]] = None,
+    fsync: str = "always",
+) -> _BackupResult:
+    base_dir = base_dir or root()
+    base_path = latest(base_dir) if incremental else None
+    if incremental and base_path is None:
+        raise BackupError("no hay un respaldo previo para el incremental")
+    base = read_manifest(base_path) if base_path else None
+    since = datetime.fromisoformat(base["started_at"]) - timedelta(seconds=overlap) if base else None
+    unknown = set(tables or ()) - set(BY_NAME)
+    if unknown:
+        raise BackupError(f"tablas desconocidas: {', '.join(sorted(unknown))}")
+    selected = [t for t in TABLES if not tables or t.name in tables]
+
+    started_at = timezone.now()
+    label = f"{started_at:%Y%m%dT%H%M%S%f}" + ("-inc" if incremental else "-full")
+    out_dir = base_dir / label
+    out_dir.mkdir(parents=True)
+    res = _BackupResult(out_dir, incremental)
+
+    with transaction.atomic():
+        snapshot = None
+        if connection.vendor == "postgresql" and workers > 1:
+            with connection.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute("SELECT pg_export_snapshot()")
+                snapshot = cur.fetchone()[0]
+        # Una tarea por rango de ``segment_rows`` pks (las tablas grandes se reparten entre
+        # procesos) o por tabla si el pk no es entero
+        tasks = []
+        for t in selected:
+            r = res.tables[t.name] = _TableResult(t.name)
+            last_pk = (base["tables"].get(t.name) or {}).get("max_pk") if base else None
+            if t.model._meta.pk.get_internal_type() in ("AutoField", "BigAutoField"):
+                bounds = t.model._base_manager.aggregate(lo=Min("pk"), hi=Max("pk"))
+                r.max_pk = bounds["hi"]
+                if r.max_pk is None:
+                    continue
+                for part, lo in enumerate(range(bounds["lo"], bounds["hi"] + 1, segment_rows), 1):
+                    tasks.append((t.name, part, (lo, lo + segment_rows - 1), out_dir, since, last_pk, snapshot))
+            else:
+                tasks.append((t.name, 1, None, out_dir, since, None, snapshot))
+        tasks = [task + (level, fsync) for task in tasks]
+        if workers > 1:
+            # Procesos (codificar JSON es CPU); la transacción exportadora sigue abierta
+            # mientras usan el snapshot
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=django.setup) as pool:
+                done = list(pool.map(_dump_in_worker, *zip(*tasks))) if tasks else []
+        else:
+            done = [_dump_segment(*task) for task in tasks]
+    for name, part, seg in sorted(done, key=lambda d: (d[0], d[1])):
+        if seg:
+            r = res.tables[name]
+            r.segments.append(seg)
+            r.rows += seg["rows"]
+            r.raw_bytes += seg["raw_bytes"]
+            r.bytes += seg["bytes"]
+    res.elapsed = time.monotonic() - res.started
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "label": label,
+        "started_at": started_at.isoformat(),
+        "incremental": incremental,
+        "base": base_path.name if base_path else None,
+        "overlap": overlap,
+        "vendor": connection.vendor,
+        "tables": {
+            r.name: {
+                "max_pk": r.max_pk, "rows": r.rows, "raw_bytes": r.raw_bytes, "bytes": r.bytes,
+                "segments": r.segments,
+            }
+            for r in res.tables.values()
+        },
+    }
+    storage.atomic_write(out_dir / MANIFEST, json.dumps(manifest, indent=1).encode(), fsync)
+    return res
+
+
+# -----------------------------
+# Restauración
+# -----------------------------
+def verify(path: Path) -> dict:
+    """Comprueba el sha256 de cada segmento; devuelve el manifiesto."""
+    manifest = read_manifest(path)
+    for name, info in manifest["tables"].items():
+        for seg in info["segments"]:
+            digest = hashlib.sha256()
+            try:
+                with open(path / seg["file"], "rb") as fh:
+                    while block := fh.read(storage.COPY_BLOCK):
+                        digest.update(block)
+            except FileNotFoundError:
+                raise BackupError(f"falta el segmento {seg['file']} de {path.name}")
+            if digest.hexdigest() != seg["sha256"]:
+                raise BackupError(f"checksum inválido en {path.name}/{seg['file']}")
+    return manifest
+
+
+def _rows(path: Path, model) -> Iterator:
+    fields = {f.attname: f for f in _columns(model)}
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            data = json.loads(line)
+            yield model(**{k: fields[k].to_python(v) for k, v in data.items() if k in fields}), len(line)
+
+
+@dataclass
+class _RestoreResult:
+    backups: int = 0
+    rows: int = 0
+    raw_bytes: int = 0
+    tables: dict = field(default_factory=dict)  # tabla → filas
+    summaries: int = 0  # filas de resúmenes recalculadas
+    started: float = field(default_factory=time.monotonic)
+    elapsed: float = 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.raw_bytes / (1024 * 1024) / max(self.elapsed or time.monotonic() - self.started, 1e-9)
+
+
+@contextmanager
+def _keep_dates(models):
+    """``bulk_create`` llama a ``pre_save``: con ``auto_now``/``auto_now_add`` activos
+    pisaría las fechas respaldadas con la hora de la restauración."""
+    saved = [
+        (f, f.auto_now, f.auto_now_add)
+        for m in models for f in m._meta.concrete_fields
+        if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)
+    ]
+    for f, _, _ in saved:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, now, add in saved:
+            f.auto_now, f.auto_now_add = now, add
+
+
+def _insert(table: Table, objs: list):
+    manager = table.model._base_manager
+    if table.append_only:
+        manager.bulk_create(objs, ignore_conflicts=True)
+        return
+    pk = table.model._meta.pk
+    manager.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=[pk.name],
+        update_fields=[f.name for f in _columns(table.model) if not f.primary_key],
+    )
+
+
+def _restore_tables(paths: list[Path], res: _RestoreResult, batch_size: int, progress) -> None:
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cur:
+            cur.execute("SET CONSTRAINTS ALL DEFERRED")
+    for path in paths:
+        manifest = read_manifest(path)
+        for table in TABLES:
+            info = manifest["tables"].get(table.name)
+            if not info:
+                continue
+            for seg in info["segments"]:
+                batch = []
+                for obj, size in _rows(path / seg["file"], table.model):
+                    batch.append(obj)
+                    res.raw_bytes += size
+                    if len(batch) >= batch_size:
+                        _insert(table, batch)
+                        batch = []
+                if batch:
+                    _insert(table, batch)
+                res.rows += seg["rows"]
+                res.tables[table.name] = res.tables.get(table.name, 0) + seg["rows"]
+                if progress:
+                    progress(res, path.name, seg["file"])
+        res.backups += 1
+
+
+def _rebuild_summaries(batch_size: int) -> int:
+    """Resúmenes derivados de lo restaurado (por lotes de usuarios, como rebuild_rut_summary)."""
+    ledger.rebuild_summary()
+    rows = SubscriptionMonthlySummary.objects.count()
+    ids = get_user_model()._base_manager.order_by("pk").values_list("pk", flat=True)
+    last = 0
+    while chunk := list(ids.filter(pk__gt=last)[:batch_size]):
+        last = chunk[-1]
+        rows += rut_summary.rebuild(chunk)
+    return rows
+
+
+def restore(path: Path, batch_size: int = 2000, progress=None) -> _RestoreResult:
+    """Restaura ``path`` (y los respaldos de los que depende) en la base actual."""
+    paths = chain(path)
+    for p in paths:  # nada se carga si un segmento está dañado
+        verify(p)
+    res = _RestoreResult()
+    models = [t.model for t in TABLES]
+    # SQLite: PRAGMA foreign_keys solo se puede cambiar fuera de la transacción
+    with connection.constraint_checks_disabled(), _keep_dates(models):
+        with transaction.atomic():
+            _restore_tables(paths, res, batch_size, progress)
+            if connection.vendor != "postgresql":
+                connection.check_constraints(table_names=[m._meta.db_table for m in models])
+            res.summaries = _rebuild_summaries(batch_size)
+    sequences = connection.ops.sequence_reset_sql(no_style(), models)
+    if sequences:
+        with connection.cursor() as cur:
+            for sql in sequences:
+                cur.execute(sql)
+    res.elapsed = time.monotonic() - res.started
+    return res
@@ -0,0 +1,22 @@
+# core/checks.py
+"""Chequeos de despliegue (``python manage.py check --deploy``)."""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """La revocación de entitlements y el estado de usuario se invalidan en la caché: con
+    ``LocMemCache`` cada worker tiene la suya y solo se invalida la del que hizo el cambio."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend.endswith("LocMemCache"):
+        return [
+            Warning(
+                "La caché por defecto es local al proceso; las invalidaciones no llegan a los demás workers.",
+                hint="Configura CACHE_URL (redis://... o db).",
+                id="core.W001",
+            )
+        ]
+    return []
@@ -0,0 +1,198 @@
+# core/columnar.py
+"""Formato columnar compacto para las filas parseadas de los CSV (``FormPayload``).
+
+Un contenedor guarda una tabla por archivo (``compras_33``, ``compras_46``…). Cada columna
+es un bloque comprimido con zlib e independiente del resto:
+
+- ``int``: array ``q`` (int64) en el orden de bytes indicado en la cabecera. Solo para
+  columnas que el llamador declara en ``types`` (montos) o que ya vienen como enteros: un
+  texto de dígitos (folio, código) puede tener ceros a la izquierda y queda como texto.
+- ``dict``: diccionario de valores distintos + códigos ``H``/``I`` (RUT, razón social…).
+- ``str``: lista JSON de textos.
+
+Disposición: ``ACP1`` + largo de la cabecera (uint32 LE) + cabecera JSON + bloques.
+``ColumnarPayload`` lee solo la cabecera; cada columna se descomprime al pedirla (y se
+cachea). Sobre un ``mmap`` solo se tocan las páginas de las columnas leídas.
+"""
+from __future__ import annotations
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterable, Iterator, Optional, Union
+
+MAGIC = b"ACP1"
+_LEVEL = 6
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+# -----------------------------
+# Codificación
+# -----------------------------
+def infer_type(name: str, values: list) -> str:
+    if "RUT" in name.upper():
+        return "dict"
+    if values and all(isinstance(v, int) for v in values):
+        return "int"
+    distinct = len(set(values))
+    return "dict" if values and distinct <= len(values) // 2 else "str"
+
+
+class _Body:
+    def __init__(self):
+        self.parts: list[bytes] = []
+        self.size = 0
+
+    def add(self, raw: bytes) -> tuple[int, int]:
+        block = zlib.compress(raw, _LEVEL)
+        off = self.size
+        self.parts.append(block)
+        self.size += len(block)
+        return off, len(block)
+
+
+def _encode_column(body: _Body, name: str, values: list, ctype: Optional[str] = None) -> dict:
+    ctype = ctype or infer_type(name, values)
+    meta = {"name": name, "type": ctype}
+    if ctype == "int":
+        meta["off"], meta["len"] = body.add(array("q", (int(v or 0) for v in values)).tobytes())
+    elif ctype == "dict":
+        index: dict = {}
+        codes = [index.setdefault(v, len(index)) for v in values]
+        meta["codes"] = "H" if len(index) < 65536 else "I"
+        meta["dict_off"], meta["dict_len"] = body.add(json.dumps(list(index), ensure_ascii=False).encode("utf-8"))
+        meta["off"], meta["len"] = body.add(array(meta["codes"], codes).tobytes())
+    else:
+        meta["off"], meta["len"] = body.add(json.dumps(values, ensure_ascii=False).encode("utf-8"))
+    return meta
+
+
+def encode_table(columns: dict[str, list], types: Optional[dict[str, str]] = None) -> bytes:
+    """Una tabla como contenedor de una sola tabla (``pack`` las junta)."""
+    return pack({"": columns}, types and {"": types})
+
+
+def pack(tables: dict[str, dict[str, list]], types: Optional[dict[str, dict[str, str]]] = None) -> bytes:
+    body = _Body()
+    header: dict = {"byteorder": sys.byteorder, "tables": {}}
+    for tname, columns in tables.items():
+        rows = len(next(iter(columns.values()), []))
+        ttypes = (types or {}).get(tname, {})
+        header["tables"][tname] = {
+            "rows": rows,
+            "columns": [_encode_column(body, n, v, ttypes.get(n)) for n, v in columns.items()],
+        }
+    raw_header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return b"".join([MAGIC, struct.pack("<I", len(raw_header)), raw_header, *body.parts])
+
+
+def merge(containers: dict[str, Buffer]) -> bytes:
+    """Junta contenedores de una tabla (uno por archivo) sin recomprimir columnas."""
+    header: dict = {"byteorder": sys.byteorder, "tables": {}}
+    parts: list[bytes] = []
+    size = 0
+    for tname, data in containers.items():
+        src = ColumnarPayload(data)
+        if src.byteorder != sys.byteorder:
+            raise ValueError("merge entre órdenes de bytes distintos")
+        table = dict(src._header["tables"][""])
+        body = bytes(src._body)
+        table["columns"] = [dict(c) for c in table["columns"]]
+        for c in table["columns"]:
+            c["off"] += size
+            if "dict_off" in c:
+                c["dict_off"] += size
+        header["tables"][tname] = table
+        parts.append(body)
+        size += len(body)
+    raw_header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return b"".join([MAGIC, struct.pack("<I", len(raw_header)), raw_header, *parts])
+
+
+# -----------------------------
+# Lectura perezosa
+# -----------------------------
+class Table:
+    def __init__(self, payload: "ColumnarPayload", name: str, meta: dict):
+        self._payload = payload
+        self.name = name
+        self.rows: int = meta["rows"]
+        self._cols = {c["name"]: c for c in meta["columns"]}
+        self._cache: dict[str, list] = {}
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._cols)
+
+    def column_type(self, name: str) -> str:
+        return self._cols[name]["type"]
+
+    def column(self, name: str) -> list:
+        if name not in self._cache:
+            self._cache[name] = self._decode(self._cols[name])
+        return self._cache[name]
+
+    def int_array(self, name: str) -> array:
+        """Columna ``int`` como ``array('q')`` (sin pasar por lista de objetos)."""
+        meta = self._cols[name]
+        if meta["type"] != "int":
+            raise TypeError(f"{name} no es int")
+        return self._payload._array("q", meta["off"], meta["len"])
+
+    def codes(self, name: str) -> tuple[array, list]:
+        """Columna ``dict`` como (códigos, valores distintos), sin expandirla."""
+        meta = self._cols[name]
+        if meta["type"] != "dict":
+            raise TypeError(f"{name} no es dict")
+        p = self._payload
+        values = json.loads(p._block(meta["dict_off"], meta["dict_len"]))
+        return p._array(meta["codes"], meta["off"], meta["len"]), values
+
+    def _decode(self, meta: dict) -> list:
+        p = self._payload
+        if meta["type"] == "int":
+            return p._array("q", meta["off"], meta["len"]).tolist()
+        if meta["type"] == "dict":
+            values = json.loads(p._block(meta["dict_off"], meta["dict_len"]))
+            return [values[i] for i in p._array(meta["codes"], meta["off"], meta["len"])]
+        return json.loads(p._block(meta["off"], meta["len"]))
+
+    def iter_rows(self, columns: Optional[Iterable[str]] = None) -> Iterator[dict]:
+        names = list(columns or self.columns)
+        cols = [self.column(n) for n in names]
+        for i in range(self.rows):
+            yield {n: c[i] for n, c in zip(names, cols)}
+
+
+class ColumnarPayload:
+    def __init__(self, data: Buffer):
+        view = memoryview(data)
+        if bytes(view[:4]) != MAGIC:
+            raise ValueError("no es un payload columnar")
+        (hlen,) = struct.unpack("<I", view[4:8])
+        self._header = json.loads(bytes(view[8 : 8 + hlen]))
+        self._body = view[8 + hlen :]
+        self.byteorder = self._header["byteorder"]
+        self._tables: dict[str, Table] = {}
+
+    @property
+    def tables(self) -> list[str]:
+        return list(self._header["tables"])
+
+    def table(self, name: str = "") -> Table:
+        if name not in self._tables:
+            self._tables[name] = Table(self, name, self._header["tables"][name])
+        return self._tables[name]
+
+    def _block(self, off: int, length: int) -> bytes:
+        return zlib.decompress(self._body[off : off + length])
+
+    def _array(self, code: str, off: int, length: int) -> array:
+        out = array(code)
+        out.frombytes(self._block(off, length))
+        if self.byteorder != sys.byteorder:
+            out.byteswap()
+        return out
@@ -0,0 +1,198 @@
+# core/csvscan.py
+"""Lectura de los CSV guardados sobre ``mmap``, sin copiar el archivo a un ``str``.
+
+``MappedCSV`` recorre el buffer mapeado por ventanas de ``WINDOW`` bytes cortadas en un
+salto de línea: cada ventana se parte en líneas y celdas con ``bytes.split`` (en C) y la
+memoria usada queda acotada a una ventana, no al archivo. Las filas se identifican por
+su rango de bytes (``spans``) y se vuelven a leer con un slice del mapeo. Solo se
+decodifican las celdas que se piden (``read_columns``); los montos se convierten a
+``int`` directamente desde los bytes.
+
+El encoding se decide por celda: UTF-8 y, al primer error, latin-1 para el resto del
+archivo (exportes del SII). Con comillas, una fila puede abarcar varias líneas: se
+junta mientras el número de ``"`` sea impar y esa fila se parsea con ``csv.reader``.
+"""
+from __future__ import annotations
+
+import csv
+import mmap
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from .incremental import row_hash
+
+WINDOW = 4 * 1024 * 1024
+_BOM = b"\xef\xbb\xbf"
+
+Buffer = Union[bytes, bytearray, mmap.mmap]
+
+
+class RowError(ValueError):
+    """Una celda no se pudo convertir; ``row`` es el índice de la fila de datos."""
+
+    def __init__(self, row: int, column: str):
+        super().__init__(f"fila {row}: {column}")
+        self.row = row
+        self.column = column
+
+
+class MappedCSV:
+    def __init__(self, buf: Buffer):
+        self.buf = buf
+        self.encoding = "utf-8"
+        start = len(_BOM) if buf[: len(_BOM)] == _BOM else 0
+        end = buf.find(b"\n", start)
+        end = len(buf) if end < 0 else end
+        first = buf[start:end].rstrip(b"\r")
+        self.delimiter = b";" if b";" in first else b","
+        self.quoted = buf.find(b'"') >= 0
+        self.header = [self.decode(h).strip() for h in self._split(first)] if first else []
+        self._data_start = end + 1
+        self._spans: Optional[array] = None
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> "MappedCSV":
+        with open(path, "rb") as fh:
+            try:
+                buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # archivo vacío: no se puede mapear
+                buf = b""
+        return cls(buf)
+
+    def close(self) -> None:
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    def __enter__(self) -> "MappedCSV":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -----------------------------
+    # Celdas
+    # -----------------------------
+    def decode(self, raw: Union[bytes, str]) -> str:
+        if isinstance(raw, str):  # fila con comillas, ya parseada por csv.reader
+            return raw
+        try:
+            return raw.decode(self.encoding)
+        except UnicodeDecodeError:
+            self.encoding = "latin-1"
+            return raw.decode("latin-1")
+
+    def _split(self, line: bytes) -> list:
+        if self.quoted and b'"' in line:
+            return next(csv.reader([self.decode(line)], delimiter=self.delimiter.decode()))
+        return line.split(self.delimiter)
+
+    # -----------------------------
+    # Filas
+    # -----------------------------
+    def _physical_rows(self) -> Iterator[tuple[int, bytes]]:
+        """``(offset, bytes)`` de cada fila de datos, incluidas las vacías."""
+        buf, size, pos = self.buf, len(self.buf), self._data_start
+        pending: list[bytes] = []
+        pending_at, quotes = 0, 0
+        while pos < size:
+            end = size
+            if pos + WINDOW < size:
+                end = buf.rfind(b"\n", pos, pos + WINDOW)
+                if end < 0:  # línea más larga que la ventana
+                    end = buf.find(b"\n", pos + WINDOW)
+                    end = size if end < 0 else end
+            off = pos
+            for line in buf[pos:end].split(b"\n"):
+                at, off = off, off + len(line) + 1
+                if self.quoted:
+                    if not pending:
+                        pending_at, quotes = at, 0
+                    pending.append(line)
+                    quotes += line.count(b'"')
+                    if quotes % 2:
+                        continue  # comillas abiertas: la fila sigue en la línea siguiente
+                    line, at = b"\n".join(pending) if len(pending) > 1 else line, pending_at
+                    pending = []
+                yield at, line
+            pos = end + 1
+        if pending:  # comillas sin cerrar al final del archivo
+            yield pending_at, b"\n".join(pending)
+
+    def _is_blank(self, line: bytes) -> bool:
+        return not line.replace(self.delimiter, b"").replace(b'"', b"").strip()
+
+    def index(self) -> array:
+        """Hash de cada fila no vacía (``core/incremental.py``); guarda sus rangos de bytes."""
+        spans, hashes = array("q"), array("q")
+        for at, line in self._physical_rows():
+            line = line.rstrip(b"\r")
+            if self._is_blank(line):
+                continue
+            spans.append(at)
+            spans.append(at + len(line))
+            hashes.append(row_hash(line))
+        self._spans = spans
+        return hashes
+
+    @property
+    def rows(self) -> int:
+        if self._spans is None:
+            self.index()
+        return len(self._spans) // 2
+
+    def lines(self, rows: Optional[Iterable[int]] = None) -> Iterator[tuple[int, bytes]]:
+        """``(índice, bytes)`` de las filas pedidas (todas por defecto, en orden). Todas:
+        recorrido por ventanas; algunas: slice del mapeo en su rango de bytes."""
+        if rows is None:
+            i = 0
+            for _, line in self._physical_rows():
+                line = line.rstrip(b"\r")
+                if not self._is_blank(line):
+                    yield i, line
+                    i += 1
+            return
+        if self._spans is None:
+            self.index()
+        spans = self._spans
+        for i in rows:
+            yield i, self.buf[spans[2 * i] : spans[2 * i + 1]]
+
+    def line_number(self, row: int) -> int:
+        """Número de línea (1 = cabecera) de una fila de datos; solo para mensajes de error."""
+        if self._spans is None:
+            self.index()
+        return bytes(self.buf[: self._spans[2 * row]]).count(b"\n") + 1
+
+    def read_columns(
+        self,
+        names: Optional[Iterable[str]] = None,
+        rows: Optional[Iterable[int]] = None,
+        ints: Iterable[str] = (),
+    ) -> dict[str, list]:
+        """Columnas ``names`` (todas por defecto) de las filas ``rows``. Las de ``ints`` se
+        convierten a ``int`` desde los bytes (vacío = 0); el resto se decodifica a texto.
+
+        Si se piden pocas columnas se decodifican solo esas celdas; si se piden casi todas
+        conviene decodificar la línea entera una vez."""
+        names = list(self.header if names is None else names)
+        ints = set(ints)
+        whole = len(names) - len(ints & set(names)) > len(self.header) // 2
+        delim = self.delimiter.decode() if whole else self.delimiter
+        out: dict[str, list] = {name: [] for name in names}
+        cols = [(out[name], self.header.index(name), name in ints, name) for name in names]
+        decode, split = self.decode, self._split
+        name = ""
+        for row, line in self.lines(rows):
+            cells = split(line) if not whole or (self.quoted and b'"' in line) else decode(line).split(delim)
+            n = len(cells)
+            try:
+                for col, i, is_int, name in cols:
+                    cell = cells[i].strip() if i < n else ""
+                    if is_int:
+                        col.append(int(cell) if cell else 0)
+                    else:
+                        col.append(cell if isinstance(cell, str) else decode(cell))
+            except ValueError:
+                raise RowError(row, name)
+        return out
@@ -0,0 +1,151 @@
+# core/entitlements.py
+"""Tokens de entitlement firmados (JWT HS256) para que Next.js no consulte el estado en
+cada carga de página.
+
+El token lleva plan, cupo, estado, vencimiento y la versión de entitlement del usuario.
+El frontend lo verifica localmente con ``ENTITLEMENT_TOKEN_SECRET`` y solo pide uno nuevo
+cuando expira o cuando ``/api/entitlements/version/`` devuelve una versión mayor
+(revocación). La versión se incrementa en cada cambio de suscripción.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import EntitlementVersion
+
+_VERSION_KEY = "entitlement_version:"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _secret() -> bytes:
+    return str(getattr(settings, "ENTITLEMENT_TOKEN_SECRET", "") or settings.SECRET_KEY).encode("utf-8")
+
+
+def _sign(signing_input: str) -> str:
+    return _b64(hmac.new(_secret(), signing_input.encode("ascii"), hashlib.sha256).digest())
+
+
+def encode(claims: dict) -> str:
+    header = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+    payload = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{header}.{payload}.{_sign(header + '.' + payload)}"
+
+
+def decode(token: str, now: Optional[float] = None) -> dict:
+    """Verifica firma y expiración; lanza ``InvalidToken``."""
+    try:
+        header, payload, sig = token.split(".")
+        claims = json.loads(_unb64(payload))
+    except Exception:
+        raise InvalidToken("malformed")
+    if not hmac.compare_digest(sig, _sign(header + "." + payload)):
+        raise InvalidToken("bad signature")
+    if claims.get("exp", 0) <= (now or time.time()):
+        raise InvalidToken("expired")
+    return claims
+
+
+# -----------------------------
+# Versiones
+# -----------------------------
+def bump_versions(user_ids: Iterable[int]) -> None:
+    """Incrementa la versión (revoca tokens vigentes). Un UPDATE + INSERT de faltantes."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    with transaction.atomic():
+        EntitlementVersion.objects.filter(user_id__in=user_ids).update(version=F("version") + 1)
+        have = set(
+            EntitlementVersion.objects.filter(user_id__in=user_ids).values_list("user_id", flat=True)
+        )
+        missing = [EntitlementVersion(user_id=u, version=2) for u in user_ids if u not in have]
+        if missing:
+            try:
+                with transaction.atomic():
+                    EntitlementVersion.objects.bulk_create(missing)
+            except IntegrityError:
+                # Alta concurrente: la fila ya existe, basta con incrementarla
+                EntitlementVersion.objects.filter(
+                    user_id__in=[m.user_id for m in missing]
+                ).update(version=F("version") + 1)
+    keys = [_VERSION_KEY + str(u) for u in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_versions(user_ids: Iterable[int]) -> dict[int, int]:
+    """Versión actual por usuario; caché primero, una consulta para el resto.
+    Usuarios sin fila tienen versión 1. ``bump_versions`` borra las claves, lo que solo
+    alcanza a todos los workers con una caché compartida (``CACHE_URL``); si no, el TTL
+    corto (``ENTITLEMENT_VERSION_CACHE_SECONDS``) acota la demora de la revocación."""
+    user_ids = list(dict.fromkeys(int(u) for u in user_ids))
+    cached = cache.get_many([_VERSION_KEY + str(u) for u in user_ids])
+    out = {int(k[len(_VERSION_KEY):]): v for k, v in cached.items()}
+    missing = [u for u in user_ids if u not in out]
+    if missing:
+        found = dict(
+            EntitlementVersion.objects.filter(user_id__in=missing).values_list("user_id", "version")
+        )
+        fresh = {u: found.get(u, 1) for u in missing}
+        cache.set_many(
+            {_VERSION_KEY + str(u): v for u, v in fresh.items()},
+            timeout=getattr(settings, "ENTITLEMENT_VERSION_CACHE_SECONDS", 5),
+        )
+        out.update(fresh)
+    return {u: out[u] for u in user_ids}
+
+
+# -----------------------------
+# Emisión
+# -----------------------------
+def issue_token(user) -> tuple[str, dict]:
+    """``user`` debe venir con ``select_related("usersubscriptioncurrent__plan",
+    "entitlement_version")`` para no generar consultas extra."""
+    now = int(time.time())
+    ttl = int(getattr(settings, "ENTITLEMENT_TOKEN_TTL", 300))
+    exp = now + ttl
+
+    plan = None
+    status = "none"
+    sub_exp = None
+    sub = getattr(user, "usersubscriptioncurrent", None)
+    if sub and sub.plan:
+        status = sub.status
+        plan = {"code": sub.plan.code, "rut_quota": sub.plan.rut_quota}
+        if sub.expires_at:
+            sub_exp = int(sub.expires_at.timestamp())
+            if status == "active" and sub_exp > now:
+                exp = min(exp, sub_exp)  # el token no sobrevive al plan
+
+    ver = getattr(user, "entitlement_version", None)
+    claims = {
+        "sub": str(user.pk),
+        "email": user.email,
+        "plan": plan,
+        "status": status,
+        "sub_exp": sub_exp,
+        "ver": ver.version if ver else 1,
+        "iat": now,
+        "exp": exp,
+    }
+    return encode(claims), claims
@@ -0,0 +1,183 @@
+# core/exports.py
+"""Exportación en streaming (CSV o JSONL, opcionalmente gzip) de ``AuditLog``, ``Form`` y
+el historial de suscripciones, para ``/api/exports/<dataset>/`` y ``manage.py export_data``.
+
+Las filas salen de ``.values_list(...).iterator(chunk_size=...)``: en PostgreSQL es un
+cursor del lado del servidor y Django trae ``chunk_size`` filas por vez, así que la memoria
+no depende de cuántas filas tenga la exportación. Se serializan a un buffer que se entrega
+cada ``EXPORT_BUFFER_BYTES`` y, con ``gzip``, se comprime al vuelo con un ``compressobj``
+que solo guarda su ventana.
+
+Filtros comunes: rango de tiempo (``since`` incluido, ``until`` excluido) sobre el campo de
+fecha de cada dataset, ``action`` (``AuditLog.action``, ``Form.status`` o ``status_to``
+del historial) y ``user`` (id o email).
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, time
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import metrics
+from .models import AuditLog, Form, UserSubscriptionHistory
+
+FORMATS = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+
+class InvalidExport(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Dataset:
+    model: type
+    time_field: str
+    action_field: str
+    columns: tuple[tuple[str, str], ...]  # (columna, lookup de values_list)
+
+
+DATASETS = {
+    "audit": Dataset(
+        AuditLog, "at", "action",
+        (
+            ("id", "id"), ("at", "at"), ("user_id", "user_id"), ("user_email", "user__email"),
+            ("action", "action"), ("entity", "entity"), ("entity_id", "entity_id"), ("metadata", "metadata"),
+        ),
+    ),
+    "forms": Dataset(
+        Form, "created_at", "status",
+        (
+            ("id", "id"), ("created_at", "created_at"), ("user_id", "user_id"), ("user_email", "user__email"),
+            ("type", "type"), ("sii_rut", "sii_rut"), ("status", "status"), ("attempts", "attempts"),
+            ("submitted_at", "submitted_at"), ("processed_at", "processed_at"), ("error_message", "error_message"),
+        ),
+    ),
+    "subscriptions": Dataset(
+        UserSubscriptionHistory, "valid_from", "status_to",
+        (
+            ("id", "id"), ("valid_from", "valid_from"), ("valid_to", "valid_to"), ("user_id", "user_id"),
+            ("user_email", "user__email"), ("plan", "plan__code"), ("plan_from", "plan_from__code"),
+            ("status_from", "status_from"), ("status_to", "status_to"), ("price_paid", "price_paid"),
+            ("notes", "notes"),
+        ),
+    ),
+}
+
+
+def parse_when(value: str) -> datetime:
+    """Fecha (``2026-01-31``, medianoche local) o fecha-hora ISO; sin zona = hora local."""
+    value = value.strip()
+    try:
+        # Bien formada pero inexistente (2026-02-30, mes 13): ValueError de Django
+        dt = parse_datetime(value)
+        d = parse_date(value) if dt is None and value else None
+    except ValueError:
+        dt = d = None
+    if dt is None:
+        if d is None:
+            raise InvalidExport(f"fecha inválida: {value!r}")
+        dt = datetime.combine(d, time.min)
+    return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+
+
+def queryset(
+    dataset: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    action: str = "",
+    user: str = "",
+):
+    """``values_list`` de las columnas del dataset, filtrado y en orden (fecha, id)."""
+    if dataset not in DATASETS:
+        raise InvalidExport(f"dataset desconocido: {dataset}")
+    ds = DATASETS[dataset]
+    qs = ds.model.objects.all()
+    if since:
+        qs = qs.filter(**{f"{ds.time_field}__gte": since})
+    if until:
+        qs = qs.filter(**{f"{ds.time_field}__lt": until})
+    if action:
+        qs = qs.filter(**{ds.action_field: action})
+    if user:
+        # isdecimal(): isdigit() acepta "²", que int() rechaza
+        qs = qs.filter(user_id=int(user)) if user.isdecimal() else qs.filter(user__email__iexact=user)
+    return qs.order_by(ds.time_field, "pk").values_list(*(lookup for _, lookup in ds.columns))
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+    return value
+
+
+def _lines(names: list[str], rows, fmt: str) -> Iterator[str]:
+    """Texto serializado en bloques de ~``EXPORT_BUFFER_BYTES``."""
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(names)
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        if writer:
+            writer.writerow([_cell(v) for v in row])
+        else:
+            buf.write(encoder.encode(dict(zip(names, row))))
+            buf.write("\n")
+        if buf.tell() >= EXPORT_BUFFER_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def stream(
+    dataset: str,
+    fmt: str = "csv",
+    gzip: bool = False,
+    chunk_size: Optional[int] = None,
+    **filters,
+) -> Iterator[bytes]:
+    """Bytes de la exportación. Los filtros se validan al llamar, no al iterar."""
+    if fmt not in FORMATS:
+        raise InvalidExport(f"formato desconocido: {fmt}")
+    qs = queryset(dataset, **filters)
+    names = [name for name, _ in DATASETS[dataset].columns]
+    chunk_size = chunk_size or getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+    def rows():
+        n = 0
+        for n, row in enumerate(qs.iterator(chunk_size=chunk_size), 1):
+            yield row
+        metrics.EXPORT_ROWS.inc(n, dataset=dataset, format=fmt)
+
+    def body():
+        z = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits 31: cabecera gzip
+        for text in _lines(names, rows(), fmt):
+            data = text.encode("utf-8")
+            if z:
+                data = z.compress(data)
+            if data:
+                yield data
+        if z:
+            yield z.flush()
+
+    return body()
+
+
+def filename(dataset: str, fmt: str, gzip: bool = False) -> str:
+    return f"{dataset}-{timezone.now():%Y%m%dT%H%M%S}.{fmt}" + (".gz" if gzip else "")
@@ -0,0 +1,85 @@
+# core/form_history.py
+"""Historial de Forms de un usuario (``/api/forms/``) con paginación keyset.
+
+Las páginas van de más nuevo a más antiguo por ``(created_at, id)``. El cursor es la
+última fila entregada: la siguiente página es ``WHERE (created_at, id) < cursor`` sobre el
+índice ``form_user_created_idx`` y lee solo ``limit + 1`` filas, sin importar cuántas
+páginas haya antes (``OFFSET`` tendría que recorrerlas todas). La cantidad de archivos de
+cada Form sale de una subconsulta correlacionada en la misma consulta: se evalúa solo para
+las filas de la página.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import FORM_STATUS, FORM_TYPE, FileUpload, Form
+
+FILTERS = {"type": dict(FORM_TYPE), "status": dict(FORM_STATUS), "sii_rut": None}
+# Todo lo que entrega la lista está en el índice (INCLUDE en PostgreSQL)
+FIELDS = ("id", "type", "status", "sii_rut", "created_at", "submitted_at", "processed_at")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created, pk = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created), int(pk)
+    except (ValueError, TypeError):
+        raise InvalidQuery("cursor inválido")
+
+
+def listing(user, filters: dict):
+    """Forms del usuario filtrados, con ``files`` anotado, del más nuevo al más antiguo."""
+    qs = Form.objects.filter(user=user)
+    for name, value in filters.items():
+        if name not in FILTERS:
+            raise InvalidQuery(f"filtro desconocido: {name}")
+        if FILTERS[name] is not None and value not in FILTERS[name]:
+            raise InvalidQuery(f"{name} inválido: {value}")
+        qs = qs.filter(**{name: value})
+    files = (
+        FileUpload.objects.filter(form=OuterRef("pk"))
+        .order_by()
+        .values("form")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return qs.annotate(files=Coalesce(Subquery(files, output_field=IntegerField()), Value(0))).order_by(
+        "-created_at", "-pk"
+    )
+
+
+def page(user, filters: dict, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> dict:
+    """``{"results": [...], "next_cursor": str | None}``; ``filters`` por type/status/sii_rut."""
+    qs = listing(user, filters)
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        # el ``lte`` redundante acota el rango del índice; el OR decide los empates
+        qs = qs.filter(Q(created_at__lt=created) | Q(created_at=created, pk__lt=pk), created_at__lte=created)
+    rows = list(qs.values(*FIELDS, "files")[: limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    for r in rows:
+        for k in ("created_at", "submitted_at", "processed_at"):
+            r[k] = r[k].isoformat() if r[k] else None
+    last = rows[-1] if more else None
+    return {
+        "results": rows,
+        "next_cursor": encode_cursor(datetime.fromisoformat(last["created_at"]), last["id"]) if last else None,
+    }
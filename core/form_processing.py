@@ -0,0 +1,548 @@
+# core/form_processing.py
+"""Motor de procesamiento de formularios: ``stored → validating → done | error``.
+
+- ``claim_forms`` toma trabajo con ``FOR UPDATE SKIP LOCKED`` (varios workers/nodos sin
+  pisarse) y marca cada Form como ``validating`` con ``claimed_at`` como lease: si el
+  worker muere, otro lo retoma pasado ``FORM_CLAIM_LEASE_SECONDS``.
+- ``process_file`` (lectura, validación, hash y agregación de un CSV, incluido el resumen
+  por RUT/tipo/período de ``core/aggregation.py``) no toca la base de datos y corre en un
+  ``ProcessPoolExecutor``, un archivo por tarea: los dos archivos de un envío se procesan a
+  la vez y ``join`` los une en un solo ``FormPayload`` (+ ``FormAggregate``). El proceso
+  padre solo escribe resultados.
+- Si el mismo RUT ya subió ese tipo de archivo, ``process_file`` solo valida y agrega las
+  filas que cambiaron respecto de esa subida (``core/incremental.py``).
+- Cada transición queda en ``FormTransition`` con la duración de cada etapa. Los errores
+  transitorios (almacenamiento) se reintentan con backoff exponencial hasta
+  ``FORM_MAX_ATTEMPTS``; los demás terminan en ``error`` con ``error_message``.
+"""
+from __future__ import annotations
+
+import hashlib
+import mmap
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import aggregation, columnar, csvscan, form_scheduler, incremental, metrics, rut_summary, storage
+from .models import FileUpload, Form, FormAggregate, FormPayload, FormTransition
+
+REQUIRED_COLUMNS = ("Tipo Doc", "Folio", "Monto Total")
+# Par de archivos de cada envío (ver FileUpload.file_kind)
+FILE_KINDS = {
+    "compras": ("compras_33", "compras_46"),
+    "ventas": ("ventas_33", "ventas_36"),
+}
+
+
+class FormProcessingError(Exception):
+    """Error definitivo del contenido (CSV inválido, sin archivos…)."""
+
+
+class TransientProcessingError(Exception):
+    """Error recuperable: se reintenta con backoff."""
+
+
+# Lo único que se reintenta; cualquier otra excepción es un bug o un dato inválido y
+# reintentarla solo repite el mismo fallo
+RETRYABLE = (TransientProcessingError, OSError, BrokenProcessPool)
+
+
+# -----------------------------
+# Etapas (proceso hijo, sin ORM)
+# -----------------------------
+def _local_path(uri: str, root: str) -> Path:
+    if uri.startswith("file://"):
+        uri = uri[len("file://"):]
+    path = Path(uri)
+    return path if path.is_absolute() else Path(root) / path
+
+
+def _open_stored(uri: str, root: str, cfg: Optional[dict] = None) -> csvscan.MappedCSV:
+    # ``root`` (y ``cfg`` para URIs remotas) viajan en el job: el hijo del pool no necesita
+    # settings configurados
+    try:
+        if not storage.is_remote(uri):
+            return csvscan.MappedCSV.open(_local_path(uri, root))
+        # remoto: descarga en streaming a un temporal y lo mapea; el mapeo sigue válido
+        # después de borrar el archivo
+        with storage.for_uri(uri, cfg).local_copy(uri) as path:
+            return csvscan.MappedCSV.open(path)
+    except FileNotFoundError:
+        raise FormProcessingError(f"archivo no encontrado: {uri}")
+    except OSError as e:
+        raise TransientProcessingError(f"no se pudo leer {uri}: {e}")
+
+
+def check_header(kind: str, src: csvscan.MappedCSV) -> list[str]:
+    missing = [c for c in REQUIRED_COLUMNS if c not in src.header]
+    if missing:
+        raise FormProcessingError(f"{kind}: faltan columnas {', '.join(missing)}")
+    return src.header
+
+
+def parse_rows(kind: str, src: csvscan.MappedCSV, rows: Optional[list[int]] = None) -> dict:
+    """Columnas de las filas ``rows`` (todas por defecto) con los montos validados."""
+    amounts = [h for h in src.header if h.startswith("Monto")]
+    try:
+        columns = src.read_columns(rows=rows, ints=amounts)
+    except csvscan.RowError as e:
+        raise FormProcessingError(f"{kind}: fila {src.line_number(e.row)}: monto inválido")
+    return {
+        "amount_columns": sorted(amounts, key=src.header.index),
+        "columns": columns,
+        "rows": len(next(iter(columns.values()), [])),
+    }
+
+
+def aggregate_file(parsed: dict) -> dict:
+    return {
+        "rows": parsed["rows"],
+        "totals": {c: sum(parsed["columns"][c]) for c in parsed["amount_columns"]},
+        "groups": aggregation.aggregate_columns(parsed["columns"]),
+    }
+
+
+def _base_table(f: dict, header: list[str], root: str) -> Optional[columnar.Table]:
+    """Tabla del archivo anterior (``f["base"]``) si tiene las mismas columnas."""
+    base = f["base"]
+    if base["blob"] is not None:
+        payload = columnar.ColumnarPayload(base["blob"])
+    else:
+        try:
+            with open(_local_path(base["uri"], root), "rb") as fh:
+                payload = columnar.ColumnarPayload(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+        except OSError:
+            return None
+    if f["kind"] not in payload.tables:
+        return None
+    table = payload.table(f["kind"])
+    return table if table.columns == header else None
+
+
+def apply_delta(base: dict, table: columnar.Table, added: dict, d: incremental.Diff) -> tuple[dict, dict]:
+    """Columnas y agregados del archivo nuevo a partir del anterior y las filas cambiadas."""
+    amounts = added["amount_columns"]
+    prev, types = {}, {}
+    for name in table.columns:
+        prev[name], types[name] = table.column(name), table.column_type(name)
+        if types[name] == "int" and name not in amounts:
+            # payload anterior que guardó una columna de texto como int: vuelve a texto
+            prev[name], types[name] = list(map(str, prev[name])), None
+    removed = incremental.take(prev, d.removed)
+    columns = incremental.rebuild(prev, added["columns"], d)
+    agg = {
+        "rows": len(d.order),
+        "totals": {
+            c: base["totals"].get(c, 0) + sum(added["columns"][c]) - sum(removed[c]) for c in amounts
+        },
+        "groups": incremental.merge_groups(
+            base["groups"],
+            aggregation.aggregate_columns(added["columns"]),
+            aggregation.aggregate_columns(removed),
+        ),
+    }
+    # los tipos del payload anterior siguen valiendo: no se vuelven a inferir
+    return {"amount_columns": amounts, "columns": columns, "types": {n: t for n, t in types.items() if t}}, agg
+
+
+def process_file(f: dict, root: str) -> dict:
+    """Lee, valida, hashea y agrega un archivo. Picklable: una tarea del pool por archivo.
+
+    Con ``f["base"]`` (subida anterior del mismo RUT y tipo) solo las filas que cambiaron se
+    validan y agregan, salvo que cambie más de ``base["max_change"]`` del archivo."""
+    t0 = time.perf_counter()
+    with _open_stored(f["uri"], root, f.get("storage")) as src:
+        content_hash = hashlib.sha256(src.buf).hexdigest()
+        t1 = time.perf_counter()
+        header = check_header(f["kind"], src)
+        hashes = src.index()
+        t2 = time.perf_counter()
+        d, table = None, _base_table(f, header, root) if f.get("base") else None
+        if table is not None:
+            d = incremental.diff(incremental.unpack_hashes(f["base"]["row_hashes"]), hashes)
+            if d.changed > f["base"]["max_change"] * max(len(hashes), 1):
+                d = None
+        t3 = time.perf_counter()
+        if d is None:
+            parsed = parse_rows(f["kind"], src)
+            t4 = time.perf_counter()
+            agg = aggregate_file(parsed)
+        else:
+            added = parse_rows(f["kind"], src, d.added)
+            t4 = time.perf_counter()
+            parsed, agg = apply_delta(f["base"], table, added, d)
+    t5 = time.perf_counter()
+    types = parsed.get("types") or {c: "int" for c in parsed["amount_columns"]}
+    blob = columnar.encode_table(parsed["columns"], types)
+    t6 = time.perf_counter()
+    return {
+        "id": f["id"],
+        "kind": f["kind"],
+        "hash": content_hash,
+        "row_hashes": incremental.pack_hashes(hashes),
+        "delta": d and {
+            "base": f["base"]["id"],
+            "added": len(d.added),
+            "removed": len(d.removed),
+            "kept": len(hashes) - len(d.added),
+        },
+        **agg,
+        "columnar": blob,
+        "timings": {
+            "read": (t1 - t0) * 1000,
+            "diff": (t3 - t2) * 1000,
+            "validate": (t2 - t1 + t4 - t3) * 1000,
+            "aggregate": (t5 - t4) * 1000,
+            "encode": (t6 - t5) * 1000,
+        },
+    }
+
+
+def check_files(job: dict) -> None:
+    """Cada envío trae su par de archivos según el tipo (``FILE_KINDS``)."""
+    kinds = {f["kind"] for f in job["files"]}
+    if not kinds:
+        raise FormProcessingError("el formulario no tiene archivos")
+    missing = [k for k in FILE_KINDS.get(job["type"], ()) if k not in kinds]
+    if missing:
+        raise FormProcessingError(f"falta el archivo {', '.join(missing)}")
+
+
+def join(job: dict, results: list[dict], wall_ms: float) -> dict:
+    """Une los resultados por archivo en el resultado del Form (un solo FormPayload).
+
+    En ``timings`` cada etapa es la del archivo más lento (camino crítico); ``parallel`` es
+    el tiempo de pared de todos los archivos y ``file:<kind>`` el total de cada uno."""
+    t0 = time.perf_counter()
+    files, grand, groups = {}, {}, {}
+    for r in sorted(results, key=lambda r: r["id"]):
+        files[r["id"]] = {
+            "kind": r["kind"], "hash": r["hash"], "row_hashes": r["row_hashes"], "rows": r["rows"], "totals": r["totals"],
+        }
+        for col, v in r["totals"].items():
+            grand[col] = grand.get(col, 0) + v
+        groups[r["kind"]] = r["groups"]
+    payload = {
+        "type": job["type"],
+        "files": {
+            r["kind"]: {"rows": r["rows"], "totals": r["totals"], **({"delta": r["delta"]} if r["delta"] else {})}
+            for r in results
+        },
+        "totals": grand,
+    }
+    timings = {
+        stage: max(r["timings"][stage] for r in results)
+        for stage in ("read", "diff", "validate", "aggregate", "encode")
+    }
+    timings["parallel"] = wall_ms
+    timings.update({f"file:{r['kind']}": sum(r["timings"].values()) for r in results})
+    blob = columnar.merge({r["kind"]: r["columnar"] for r in sorted(results, key=lambda r: r["id"])})
+    timings["join"] = (time.perf_counter() - t0) * 1000
+    return {"files": files, "payload": payload, "columnar": blob, "groups": groups, "timings": timings}
+
+
+def run_stages(job: dict) -> dict:
+    """Procesa todos los archivos de un Form en el proceso actual (sin pool)."""
+    check_files(job)
+    t0 = time.perf_counter()
+    results = [process_file(f, job["root"]) for f in job["files"]]
+    return join(job, results, (time.perf_counter() - t0) * 1000)
+
+
+# -----------------------------
+# Cola (proceso padre)
+# -----------------------------
+@dataclass
+class _Claim:
+    form_id: int
+    attempt: int
+    claimed_at: datetime
+    job: dict
+    tier: str = form_scheduler.NO_TIER
+
+
+@dataclass
+class _ProcessResult:
+    claimed: int = 0
+    done: int = 0
+    retried: int = 0
+    failed: int = 0
+    lost: int = 0  # lease vencido: otro worker retomó el Form
+
+
+def _queue_q(now: datetime) -> Q:
+    lease = timedelta(seconds=getattr(settings, "FORM_CLAIM_LEASE_SECONDS", 600))
+    ready = form_scheduler.QUEUED & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+    stale = Q(status="validating", claimed_at__lt=now - lease)
+    return ready | stale
+
+
+def claim_forms(limit: int, now: Optional[datetime] = None) -> list[_Claim]:
+    """Toma hasta ``limit`` Forms en el orden de la cola justa (``core/form_scheduler.py``)."""
+    now = now or timezone.now()
+    root = str(settings.MEDIA_ROOT)
+    lease = timedelta(seconds=getattr(settings, "FORM_CLAIM_LEASE_SECONDS", 600))
+    cands = form_scheduler.candidates(_queue_q(now), limit)
+    if not cands:
+        return []
+    running = form_scheduler.inflight({c.user_id for c in cands}, now - lease)
+    chosen = {c.pk: c for c in form_scheduler.schedule(cands, running, limit)}
+    rank = {pk: i for i, pk in enumerate(chosen)}
+
+    with transaction.atomic():
+        # Re-filtra: entre la planificación y el lock otro worker pudo tomarlos
+        rows = sorted(
+            Form.objects.filter(_queue_q(now), pk__in=list(chosen))
+            .select_for_update(skip_locked=True)
+            .values_list("pk", "status", "attempts", "type", "user_id", "sii_rut"),
+            key=lambda r: rank[r[0]],
+        )
+        if not rows:
+            return []
+        ids = [r[0] for r in rows]
+        Form.objects.filter(pk__in=ids).update(
+            status="validating", claimed_at=now, attempts=F("attempts") + 1
+        )
+        FormTransition.objects.bulk_create(
+            [
+                FormTransition(form_id=pk, from_status=status, to_status="validating", attempt=attempts + 1)
+                for pk, status, attempts, *_ in rows
+            ]
+        )
+        files: dict[int, list[dict]] = {pk: [] for pk in ids}
+        cfg = None
+        for fid, form_id, kind, uri in (
+            FileUpload.objects.filter(form_id__in=ids)
+            .order_by("pk")
+            .values_list("pk", "form_id", "file_kind", "storage_uri")
+        ):
+            files[form_id].append({"id": fid, "kind": kind, "uri": uri})
+            if storage.is_remote(uri):
+                files[form_id][-1]["storage"] = cfg = cfg or storage.config()
+        for pk, status, *_ in rows:
+            c = chosen[pk]
+            transaction.on_commit(
+                lambda s=status: metrics.FORM_TRANSITIONS.inc(from_status=s, to_status="validating")
+            )
+            transaction.on_commit(
+                lambda c=c: metrics.FORM_QUEUE_WAIT_SECONDS.observe(
+                    max((now - c.queued_at).total_seconds(), 0), tier=c.tier
+                )
+            )
+    claims = [
+        _Claim(
+            pk, attempts + 1, now,
+            {"form_id": pk, "type": ftype, "user_id": user_id, "sii_rut": sii_rut, "files": files[pk], "root": root},
+            tier=chosen[pk].tier,
+        )
+        for pk, _, attempts, ftype, user_id, sii_rut in rows
+    ]
+    _attach_bases(claims, {pk: (user_id, sii_rut) for pk, *_, user_id, sii_rut in rows})
+    return claims
+
+
+_GROUP_FIELDS = ("counterparty_rut", "doc_type", "period", "rows", *aggregation.AMOUNT_FIELDS)
+
+
+def _attach_bases(claims: list[_Claim], owners: dict[int, tuple[int, str]]) -> None:
+    """Agrega a cada archivo su base para el reproceso incremental: la subida anterior ya
+    procesada del mismo usuario, ``sii_rut`` y ``file_kind`` (``core/incremental.py``)."""
+    max_change = getattr(settings, "FORM_INCREMENTAL_MAX_CHANGE", 0.5)
+    if max_change <= 0:
+        return
+    for claim in claims:
+        user_id, sii_rut = owners[claim.form_id]
+        for f in claim.job["files"]:
+            prev = (
+                FileUpload.objects.filter(
+                    form__user_id=user_id, form__sii_rut=sii_rut, form__status="done",
+                    file_kind=f["kind"], row_hashes__isnull=False,
+                )
+                .exclude(form_id=claim.form_id)
+                .order_by("-form__processed_at", "-pk")
+                .values_list("pk", "form_id", "row_hashes")
+                .first()
+            )
+            if prev is None:
+                continue
+            payload = (
+                FormPayload.objects.filter(form_id=prev[1])
+                .order_by("-pk")
+                .values_list("payload_json", "columns_blob", "columns_uri")
+                .first()
+            )
+            if payload is None or (payload[1] is None and not payload[2]):
+                continue
+            totals = payload[0].get("files", {}).get(f["kind"], {}).get("totals")
+            if totals is None:
+                continue
+            f["base"] = {
+                "id": prev[0],
+                "row_hashes": bytes(prev[2]),
+                "blob": bytes(payload[1]) if payload[1] is not None else None,
+                "uri": payload[2],
+                "totals": totals,
+                "groups": list(
+                    FormAggregate.objects.filter(form_id=prev[1], file_kind=f["kind"]).values(*_GROUP_FIELDS)
+                ),
+                "max_change": max_change,
+            }
+
+
+def _close(claim: _Claim, to_status: str, **fields) -> bool:
+    """Cierra el claim si sigue siendo nuestro (mismo ``claimed_at``)."""
+    return bool(
+        Form.objects.filter(pk=claim.form_id, status="validating", claimed_at=claim.claimed_at)
+        .update(status=to_status, claimed_at=None, **fields)
+    )
+
+
+def _record(claim: _Claim, to_status: str, timings=None, message: str = "") -> None:
+    FormTransition.objects.create(
+        form_id=claim.form_id,
+        from_status="validating",
+        to_status=to_status,
+        attempt=claim.attempt,
+        timings=timings or {},
+        message=message,
+    )
+    transaction.on_commit(
+        lambda: metrics.FORM_TRANSITIONS.inc(from_status="validating", to_status=to_status)
+    )
+
+
+def _columnar_fields(claim: _Claim, blob: bytes) -> dict:
+    """Filas en formato columnar: en la fila si es chico, en un archivo si no."""
+    if len(blob) <= getattr(settings, "FORM_PAYLOAD_INLINE_MAX", 1024 * 1024):
+        return {"columns_blob": blob, "columns_size": len(blob)}
+    rel = Path("payloads") / f"{claim.form_id}.acp"
+    path = Path(claim.job["root"]) / rel
+    storage.atomic_write(path, blob, getattr(settings, "STORAGE_FSYNC", "always"))
+    return {"columns_uri": str(rel), "columns_size": len(blob)}
+
+
+def complete(claim: _Claim, result: dict) -> bool:
+    t0 = time.perf_counter()
+    timings = dict(result["timings"])
+    with transaction.atomic():
+        if not _close(claim, "done", processed_at=timezone.now(), error_message="", next_attempt_at=None):
+            return False
+        uploads = list(FileUpload.objects.filter(pk__in=list(result["files"])))
+        for fu in uploads:
+            info = result["files"][fu.pk]
+            fu.rows_count, fu.content_hash, fu.row_hashes = info["rows"], info["hash"], info["row_hashes"]
+        FileUpload.objects.bulk_update(uploads, ["rows_count", "content_hash", "row_hashes"])
+        FormPayload.objects.create(
+            form_id=claim.form_id, payload_json=result["payload"], **_columnar_fields(claim, result["columnar"])
+        )
+        FormAggregate.objects.filter(form_id=claim.form_id).delete()
+        FormAggregate.objects.bulk_create(
+            [
+                FormAggregate(form_id=claim.form_id, file_kind=kind, **g)
+                for kind, groups in result["groups"].items()
+                for g in groups
+            ],
+            batch_size=1000,
+        )
+        job = claim.job
+        rut_summary.processed(job["user_id"], job["sii_rut"], job["type"], "done", result["payload"])
+        timings["store"] = (time.perf_counter() - t0) * 1000
+        _record(claim, "done", timings)
+    for stage, ms in timings.items():
+        if not stage.startswith("file:"):
+            metrics.FORM_STAGE_SECONDS.observe(ms / 1000, stage=stage)
+    return True
+
+
+def fail(claim: _Claim, exc: BaseException) -> str:
+    """Reintento con backoff si es transitorio (``RETRYABLE``) y quedan intentos; si no, ``error``."""
+    max_attempts = getattr(settings, "FORM_MAX_ATTEMPTS", 5)
+    message = str(exc) or exc.__class__.__name__
+    with transaction.atomic():
+        if isinstance(exc, RETRYABLE) and claim.attempt < max_attempts:
+            base = getattr(settings, "FORM_RETRY_BASE_SECONDS", 30)
+            delay = base * 2 ** (claim.attempt - 1)
+            if not _close(
+                claim,
+                "stored",
+                error_message=message,
+                next_attempt_at=timezone.now() + timedelta(seconds=delay),
+            ):
+                return "lost"
+            _record(claim, "stored", message=message)
+            return "retried"
+        if not _close(claim, "error", error_message=message, processed_at=timezone.now()):
+            return "lost"
+        rut_summary.processed(claim.job["user_id"], claim.job["sii_rut"], claim.job["type"], "error")
+        _record(claim, "error", message=message)
+        return "failed"
+
+
+def make_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """``workers <= 0``: sin pool, las etapas corren en el mismo proceso."""
+    return ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+
+
+def process_batch(pool: Optional[Executor] = None, batch_size: Optional[int] = None) -> _ProcessResult:
+    batch_size = batch_size or getattr(settings, "FORM_BATCH_SIZE", 20)
+    res = _ProcessResult()
+    form_scheduler.refresh_queue_gauges()
+    claims = claim_forms(batch_size)
+    res.claimed = len(claims)
+
+    def handle(claim: _Claim, result=None, exc=None):
+        if exc is None:
+            outcome = "done" if complete(claim, result) else "lost"
+        else:
+            outcome = fail(claim, exc)
+        setattr(res, outcome, getattr(res, outcome) + 1)
+        metrics.FORMS_PROCESSED.inc(tier=claim.tier, result=outcome)
+
+    if pool is None:
+        for claim in claims:
+            try:
+                result = run_stages(claim.job)
+            except Exception as e:
+                handle(claim, exc=e)
+            else:
+                handle(claim, result)
+        return res
+
+    # Todos los archivos de todos los Forms al pool a la vez: cada Form tarda lo que su
+    # archivo más lento, no la suma de sus archivos
+    pending: dict[int, dict] = {}
+    futures = {}
+    for claim in claims:
+        try:
+            check_files(claim.job)
+        except FormProcessingError as e:
+            handle(claim, exc=e)
+            continue
+        pending[claim.form_id] = {"claim": claim, "results": [], "t0": time.perf_counter(), "failed": False}
+        for f in claim.job["files"]:
+            futures[pool.submit(process_file, f, claim.job["root"])] = claim.form_id
+
+    for fut in as_completed(futures):
+        st = pending[futures[fut]]
+        if st["failed"]:
+            continue
+        claim = st["claim"]
+        try:
+            st["results"].append(fut.result())
+        except Exception as e:  # BrokenProcessPool: transitorio (RETRYABLE)
+            st["failed"] = True
+            handle(claim, exc=e)
+            continue
+        if len(st["results"]) == len(claim.job["files"]):
+            wall_ms = (time.perf_counter() - st["t0"]) * 1000
+            handle(claim, join(claim.job, st["results"], wall_ms))
+    return res
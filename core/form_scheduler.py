@@ -0,0 +1,126 @@
+# core/form_scheduler.py
+"""Cola justa ponderada para ``core/form_processing.py``.
+
+Orden de atención de cada ronda de ``claim_forms``:
+
+1. Carril de prioridad (``Form.priority`` descendente), estricto.
+2. Dentro del carril, WFQ jerárquico: cada tier (``Plan.code``) recibe una fracción
+   proporcional a ``FORM_PLAN_WEIGHTS`` y, dentro del tier, los usuarios se reparten por
+   igual. La etiqueta de finalización del k-ésimo Form de un usuario (contando los que ya
+   tiene en proceso) es ``k * usuarios_activos_del_tier / peso_del_tier``.
+3. Nadie supera su tope de Forms en proceso (``FORM_PLAN_MAX_INFLIGHT``); una cuenta con
+   miles de Forms en cola no desplaza al resto.
+
+El tope se evalúa antes de tomar los locks: con varios workers en paralelo un usuario puede
+exceder momentáneamente su tope por, como mucho, un Form por worker.
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db.models import Count, Exists, F, Min, OuterRef, Q, Value, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+
+from . import metrics
+from .models import FileUpload, Form
+
+NO_TIER = "none"
+_TIER = Coalesce(F("user__usersubscriptioncurrent__plan__code"), Value(NO_TIER))
+_stats_at = 0.0
+# Un envío sin archivos solo registra el uso del RUT (bloqueo por primer uso): no se procesa
+QUEUED = Q(status="stored") & Exists(FileUpload.objects.filter(form=OuterRef("pk")))
+
+
+@dataclass
+class Candidate:
+    pk: int
+    user_id: int
+    tier: str
+    priority: int
+    queued_at: datetime
+
+
+def weight(tier: str) -> float:
+    return max(float(getattr(settings, "FORM_PLAN_WEIGHTS", {}).get(tier, 1)), 0.001)
+
+
+def max_inflight(tier: str) -> int:
+    caps = getattr(settings, "FORM_PLAN_MAX_INFLIGHT", {})
+    return int(caps.get(tier, getattr(settings, "FORM_USER_MAX_INFLIGHT", 1)))
+
+
+def candidates(queue_filter, limit: int, scan_factor: int = 20) -> list[Candidate]:
+    """Cabezas de cola de cada usuario (sin locks). Una consulta con ROW_NUMBER por usuario:
+    nunca se leen más Forms de un usuario de los que su tope máximo permitiría tomar."""
+    per_user = max([*getattr(settings, "FORM_PLAN_MAX_INFLIGHT", {}).values(),
+                    getattr(settings, "FORM_USER_MAX_INFLIGHT", 1)])
+    order = [F("priority").desc(), F("submitted_at").asc(nulls_first=True), F("pk").asc()]
+    rows = (
+        Form.objects.filter(queue_filter)
+        .annotate(rn=Window(RowNumber(), partition_by=[F("user_id")], order_by=order), tier=_TIER)
+        .filter(rn__lte=per_user)
+        .order_by(*order)
+        .values_list("pk", "user_id", "tier", "priority", "submitted_at", "created_at")[: limit * scan_factor]
+    )
+    return [Candidate(pk, uid, tier, prio, sub or created) for pk, uid, tier, prio, sub, created in rows]
+
+
+def inflight(user_ids: Iterable[int], since: datetime) -> dict[int, int]:
+    return dict(
+        Form.objects.filter(user_id__in=list(user_ids), status="validating", claimed_at__gte=since)
+        .values("user_id")
+        .annotate(n=Count("pk"))
+        .values_list("user_id", "n")
+    )
+
+
+def schedule(cands: list[Candidate], running: dict[int, int], limit: int) -> list[Candidate]:
+    """Elige hasta ``limit`` candidatos en orden de atención (función pura)."""
+    users_by_tier: dict[str, set[int]] = defaultdict(set)
+    for c in cands:
+        users_by_tier[c.tier].add(c.user_id)
+
+    picked: Counter = Counter()
+    tagged = []
+    for c in sorted(cands, key=lambda c: (c.user_id, -c.priority, c.queued_at, c.pk)):
+        k = running.get(c.user_id, 0) + picked[c.user_id] + 1
+        if k > max_inflight(c.tier):
+            continue
+        picked[c.user_id] += 1
+        finish = k * len(users_by_tier[c.tier]) / weight(c.tier)
+        tagged.append((-c.priority, finish, c.queued_at, c.pk, c))
+    tagged.sort(key=lambda t: t[:4])
+    return [t[-1] for t in tagged[:limit]]
+
+
+def queue_stats() -> dict[str, dict]:
+    """Profundidad y espera más antigua por tier (una consulta agregada)."""
+    now = timezone.now()
+    out = {}
+    for tier, depth, oldest in (
+        Form.objects.filter(QUEUED)
+        .annotate(tier=_TIER)
+        .values("tier")
+        .annotate(depth=Count("pk"), oldest=Min(Coalesce("submitted_at", "created_at")))
+        .values_list("tier", "depth", "oldest")
+    ):
+        out[tier] = {"depth": depth, "oldest_wait_s": (now - oldest).total_seconds() if oldest else 0.0}
+    return out
+
+
+def refresh_queue_gauges(force: bool = False) -> Optional[dict[str, dict]]:
+    """Actualiza ``FORM_QUEUE_DEPTH`` como mucho cada ``FORM_QUEUE_STATS_SECONDS``."""
+    global _stats_at
+    if not force and time.monotonic() - _stats_at < getattr(settings, "FORM_QUEUE_STATS_SECONDS", 15):
+        return None
+    _stats_at = time.monotonic()
+    stats = queue_stats()
+    for tier in {*getattr(settings, "FORM_PLAN_WEIGHTS", {}), NO_TIER, *stats}:
+        metrics.FORM_QUEUE_DEPTH.set(stats.get(tier, {}).get("depth", 0), tier=tier)
+    return stats
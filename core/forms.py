@@ -6,7 +6,7 @@ TYPE_CHOICES = (
     ("ventas", "Ventas"),
 )
 
-MAX_FILE_MB = 15
+MAX_FILE_MB = 15  # multipart en un POST; archivos más grandes van por /api/uploads/ (core/uploads.py)
 ALLOWED_EXTS = {".csv"}
 
 def _validate_file(f: forms.FileField):
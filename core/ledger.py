@@ -0,0 +1,197 @@
+# core/ledger.py
+"""Ledger append-only de suscripciones.
+
+Cada transición de estado o de plan de ``UserSubscriptionCurrent`` agrega una fila a
+``UserSubscriptionHistory`` y actualiza de forma incremental
+``SubscriptionMonthlySummary`` (altas, renovaciones, cambios de plan, morosidad, bajas e
+ingresos por mes y plan). Los cobros recurrentes aprobados no cambian el estado y se
+registran aparte con ``record_payment``. Dentro de ``batch()`` las filas se acumulan y se escriben con un
+solo ``bulk_create`` más un UPDATE por (mes, plan) al cerrar el bloque, en la misma
+transacción que el cambio que las originó.
+"""
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Plan, SubscriptionMonthlySummary, UserSubscriptionHistory
+
+_local = threading.local()
+
+def _month_of(at: datetime) -> date:
+    return timezone.localtime(at).date().replace(day=1)
+
+
+def classify(row: UserSubscriptionHistory, quotas: dict[int, int]) -> dict[str, object]:
+    """Deltas de resumen que aporta una fila del ledger."""
+    delta: dict[str, object] = {}
+    if row.status_to == "active":
+        if row.status_from in ("none", "canceled"):
+            delta["activations"] = 1
+        elif row.status_from == "past_due":
+            delta["renewals"] = 1
+        elif row.plan_from_id and row.plan_from_id != row.plan_id:
+            old_q, new_q = quotas.get(row.plan_from_id, 0), quotas.get(row.plan_id, 0)
+            delta["upgrades" if new_q >= old_q else "downgrades"] = 1
+        elif row.price_paid:
+            delta["renewals"] = 1  # cobro recurrente: active -> active en el mismo plan
+        if row.price_paid:
+            delta["revenue"] = Decimal(str(row.price_paid))
+    elif row.status_to == "past_due" and row.status_from == "active":
+        delta["past_due"] = 1
+    elif row.status_to in ("canceled", "none") and row.status_from != row.status_to:
+        delta["churned"] = 1
+    return delta
+
+
+def _apply_summary(rows: list[UserSubscriptionHistory]) -> None:
+    plan_ids = {r.plan_id for r in rows} | {r.plan_from_id for r in rows if r.plan_from_id}
+    quotas = dict(Plan.objects.filter(pk__in=plan_ids).values_list("pk", "rut_quota"))
+
+    acc: dict[tuple[date, int], dict[str, object]] = defaultdict(dict)
+    for r in rows:
+        bucket = acc[(_month_of(r.valid_from), r.plan_id)]
+        for field, value in classify(r, quotas).items():
+            bucket[field] = bucket.get(field, 0) + value
+
+    for (month, plan_id), delta in acc.items():
+        if not delta:
+            continue
+        updates = {f: F(f) + v for f, v in delta.items()}
+        qs = SubscriptionMonthlySummary.objects.filter(month=month, plan_id=plan_id)
+        if qs.update(**updates):
+            continue
+        try:
+            with transaction.atomic():
+                SubscriptionMonthlySummary.objects.create(month=month, plan_id=plan_id, **delta)
+        except IntegrityError:
+            # Otro proceso creó la fila entre el UPDATE y el INSERT
+            qs.update(**updates)
+
+
+def _flush(rows: list[UserSubscriptionHistory]) -> None:
+    if not rows:
+        return
+    with transaction.atomic():
+        UserSubscriptionHistory.objects.bulk_create(rows)
+        _apply_summary(rows)
+
+
+@contextmanager
+def batch():
+    """Acumula las transiciones del bloque y las escribe juntas al salir."""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append([])
+    try:
+        yield
+    except BaseException:
+        stack.pop()
+        raise
+    rows = stack.pop()
+    if stack:
+        stack[-1].extend(rows)  # batch anidado: lo escribe el externo
+    else:
+        _flush(rows)
+
+
+def record(
+    user_id: int,
+    plan_id: int,
+    status_from: str,
+    status_to: str,
+    *,
+    plan_from_id: Optional[int] = None,
+    price_paid: Optional[Decimal] = None,
+    at: Optional[datetime] = None,
+    valid_to: Optional[datetime] = None,
+    notes: str = "",
+) -> None:
+    record_many(
+        [
+            UserSubscriptionHistory(
+                user_id=user_id,
+                plan_id=plan_id,
+                plan_from_id=plan_from_id,
+                status_from=status_from,
+                status_to=status_to,
+                valid_from=at or timezone.now(),
+                valid_to=valid_to,
+                price_paid=price_paid,
+                notes=notes,
+            )
+        ]
+    )
+
+
+def record_many(rows: Iterable[UserSubscriptionHistory]) -> None:
+    rows = list(rows)
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].extend(rows)
+    else:
+        _flush(rows)
+
+
+PAYMENT_NOTE = "mp_payment:"
+
+
+def record_payment(
+    user_id: int,
+    plan_id: int,
+    payment_id: str,
+    amount: Decimal,
+    *,
+    valid_to: Optional[datetime] = None,
+) -> bool:
+    """Fila ``active -> active`` por un cobro aprobado; ``True`` si cuenta como renovación.
+
+    Idempotente por ``payment_id`` (MP reintenta el webhook). El primer cobro tras un alta
+    ya está en el ingreso de esa transición: se registra sin ``price_paid``. Llamar en la
+    transacción que bloqueó la suscripción y fuera de ``batch()`` (consulta filas previas).
+    """
+    note = f"{PAYMENT_NOTE}{payment_id}"
+    rows = UserSubscriptionHistory.objects.filter(user_id=user_id)
+    if rows.filter(notes=note).exists():
+        return False
+    last = rows.exclude(notes__startswith=PAYMENT_NOTE).order_by("-pk").first()
+    absorbed = bool(
+        last and last.price_paid and not rows.filter(pk__gt=last.pk, notes__startswith=PAYMENT_NOTE).exists()
+    )
+    record(
+        user_id,
+        plan_id,
+        "active",
+        "active",
+        plan_from_id=plan_id,
+        price_paid=None if absorbed else amount,
+        valid_to=valid_to,
+        notes=note,
+    )
+    return not absorbed
+
+
+def rebuild_summary() -> int:
+    """Recalcula ``SubscriptionMonthlySummary`` desde cero a partir del ledger."""
+    with transaction.atomic():
+        SubscriptionMonthlySummary.objects.all().delete()
+        chunk: list[UserSubscriptionHistory] = []
+        total = 0
+        for row in UserSubscriptionHistory.objects.order_by("pk").iterator(chunk_size=2000):
+            chunk.append(row)
+            if len(chunk) >= 2000:
+                _apply_summary(chunk)
+                total += len(chunk)
+                chunk = []
+        _apply_summary(chunk)
+        total += len(chunk)
+    return total
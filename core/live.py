@@ -0,0 +1,232 @@
+# core/live.py
+"""Pub/sub en proceso para empujar cambios de suscripción por SSE (``/account/events/``).
+
+Publicación (lado webhook, síncrono):
+  - ``notify``: ``pg_notify`` dentro de la transacción; PostgreSQL lo entrega al hacer
+    commit y lo descarta si hay rollback.
+  - ``cache``: escribe el último estado del usuario en la caché tras el commit; el hub lo
+    recoge por sondeo (útil sin PostgreSQL o detrás de pgbouncer en modo transacción).
+
+Suscripción (lado ASGI): un solo ``_Hub`` por proceso con una cola por conexión SSE y un
+único listener (una conexión LISTEN atendida con ``loop.add_reader`` o una tarea de
+sondeo). Las conexiones ociosas solo esperan en su cola: no ocupan un hilo cada una.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "subscription_events"
+_CACHE_PREFIX = "live:sub:"
+
+
+def backend() -> str:
+    configured = getattr(settings, "LIVE_BACKEND", "")
+    if configured:
+        return configured
+    return "notify" if connection.vendor == "postgresql" else "cache"
+
+
+def state_payload(usc) -> dict:
+    """Estado mínimo que necesita la página de cuenta (sin consultas si el plan está cargado)."""
+    if usc is None:
+        return {"status": "none", "plan": None, "pending": False}
+    return {
+        "status": usc.status,
+        "plan": usc.plan.code if usc.plan_id else None,
+        "pending": bool(usc.pending_plan_id),
+    }
+
+
+def current_state(user_id: int) -> dict:
+    from .models import UserSubscriptionCurrent
+
+    usc = UserSubscriptionCurrent.objects.select_related("plan").filter(user_id=user_id).first()
+    return state_payload(usc)
+
+
+def publish(user_id: int, payload: dict) -> None:
+    """Publica el estado de ``user_id``; se entrega solo si la transacción hace commit."""
+    payload = {**payload, "user_id": user_id, "ts": time.time()}
+    if backend() == "notify":
+        with connection.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, %s)", [CHANNEL, json.dumps(payload)])
+    else:
+        timeout = getattr(settings, "LIVE_CACHE_SECONDS", 600)
+        transaction.on_commit(lambda: cache.set(_CACHE_PREFIX + str(user_id), payload, timeout))
+
+
+def sse(payload: dict, event: str = "subscription", retry_ms: Optional[int] = None) -> str:
+    out = f"retry: {retry_ms}\n" if retry_ms else ""
+    return out + f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+# -----------------------------
+# Hub (un proceso ASGI = un loop)
+# -----------------------------
+class _Hub:
+    def __init__(self):
+        self._subs: dict[int, set[asyncio.Queue]] = defaultdict(set)
+        self._since: dict[int, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Loop nuevo (arranque o tests con async_to_sync): rehacer el listener
+            self._stop_listener()
+            self._subs.clear()
+            self._since.clear()
+            self._loop = loop
+        q: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if not self._subs[user_id]:
+            self._since[user_id] = time.time()
+        self._subs[user_id].add(q)
+        if self._listener is None:
+            self._listener = (_NotifyListener if backend() == "notify" else _CacheListener)(self)
+            self._listener.start(loop)
+        return q
+
+    def unsubscribe(self, user_id: int, q: asyncio.Queue) -> None:
+        queues = self._subs.get(user_id)
+        if queues is None:
+            return
+        queues.discard(q)
+        if not queues:
+            del self._subs[user_id]
+            self._since.pop(user_id, None)
+        if not self._subs:
+            self._stop_listener()
+
+    def user_ids(self) -> list[int]:
+        return list(self._subs)
+
+    def since(self, user_id: int) -> float:
+        return self._since.get(user_id, 0.0)
+
+    def dispatch(self, user_id: int, payload: dict) -> None:
+        for q in self._subs.get(user_id, ()):
+            # Solo importa el último estado: se reemplaza el pendiente si no se leyó
+            if q.full():
+                q.get_nowait()
+            q.put_nowait(payload)
+
+    def _stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+class _CacheListener:
+    def __init__(self, hub: _Hub):
+        self.hub = hub
+        self.task: Optional[asyncio.Task] = None
+        self.seen: dict[int, float] = {}
+
+    def start(self, loop) -> None:
+        self.task = loop.create_task(self.run())
+
+    def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+
+    async def poll_once(self) -> None:
+        ids = self.hub.user_ids()
+        if not ids:
+            return
+        got = await cache.aget_many([_CACHE_PREFIX + str(u) for u in ids])
+        for key, payload in got.items():
+            user_id = int(key[len(_CACHE_PREFIX):])
+            last = max(self.seen.get(user_id, 0.0), self.hub.since(user_id))
+            if payload.get("ts", 0) > last:
+                self.seen[user_id] = payload["ts"]
+                self.hub.dispatch(user_id, payload)
+
+    async def run(self) -> None:
+        interval = float(getattr(settings, "LIVE_POLL_SECONDS", 1.0))
+        while True:
+            try:
+                await self.poll_once()
+            except Exception:
+                log.exception("live: error sondeando la caché")
+            await asyncio.sleep(interval)
+
+
+class _NotifyListener:
+    """Una conexión psycopg2 en autocommit con LISTEN, leída desde el loop sin hilo propio."""
+
+    def __init__(self, hub: _Hub):
+        self.hub = hub
+        self.conn = None
+        self.loop = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, loop) -> None:
+        self.loop = loop
+        self.task = loop.create_task(self.run())
+
+    def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+        self._close()
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        params = connections["default"].get_connection_params()
+        conn = psycopg2.connect(**params)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        return conn
+
+    def _close(self) -> None:
+        if self.conn is not None:
+            try:
+                self.loop.remove_reader(self.conn.fileno())
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def _on_readable(self) -> None:
+        try:
+            self.conn.poll()
+        except Exception:
+            log.exception("live: conexión LISTEN caída")
+            self._close()
+            return
+        while self.conn.notifies:
+            n = self.conn.notifies.pop(0)
+            try:
+                payload = json.loads(n.payload)
+            except ValueError:
+                continue
+            self.hub.dispatch(int(payload.get("user_id", 0)), payload)
+
+    async def run(self) -> None:
+        while True:
+            if self.conn is None:
+                try:
+                    # El connect bloquea: una vez por proceso, en el executor
+                    self.conn = await self.loop.run_in_executor(None, self._connect)
+                    self.loop.add_reader(self.conn.fileno(), self._on_readable)
+                except Exception:
+                    log.exception("live: no se pudo abrir LISTEN")
+                    self.conn = None
+            await asyncio.sleep(5)
+
+
+hub = _Hub()
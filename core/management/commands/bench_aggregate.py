@@ -0,0 +1,50 @@
+# core/management/commands/bench_aggregate.py
+"""Throughput del resumen por RUT/tipo/período (core/aggregation.py): filas/s con NumPy y
+sin NumPy, desde columnas parseadas y desde el payload columnar guardado."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import aggregation, columnar
+from core.management.commands.bench_payload import AMOUNTS, synthetic_columns
+
+
+class Command(BaseCommand):
+    help = "Benchmark del group-by de compras/ventas (filas/s)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def _best(self, fn, repeat):
+        best, out = float("inf"), None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = fn()
+            best = min(best, time.perf_counter() - t0)
+        return best, out
+
+    def handle(self, *args, **opts):
+        n, repeat = opts["rows"], opts["repeat"]
+        cols = synthetic_columns(n)
+        blob = columnar.encode_table(cols, {a: "int" for a in AMOUNTS})
+        expected = sum(cols["Monto Total"])
+        self.stdout.write(f"bench_aggregate: {n} filas (mejor de {repeat})")
+
+        numpy = aggregation.np
+        modes = [("numpy", numpy), ("python", None)] if numpy is not None else [("python", None)]
+        try:
+            for label, mod in modes:
+                aggregation.np = mod
+                for source, fn in (
+                    ("columnas", lambda: aggregation.aggregate_columns(cols)),
+                    ("payload", lambda: aggregation.aggregate_table(columnar.ColumnarPayload(blob).table())),
+                ):
+                    secs, groups = self._best(fn, repeat)
+                    ok = sum(g["total"] for g in groups) == expected
+                    self.stdout.write(
+                        f"  {label:6s} {source:8s} {secs * 1000:8.1f}ms  {n / secs / 1e6:5.2f}M filas/s  "
+                        f"grupos={len(groups)}  {'ok' if ok else 'TOTAL DISTINTO'}"
+                    )
+        finally:
+            aggregation.np = numpy
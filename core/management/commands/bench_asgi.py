@@ -0,0 +1,117 @@
+# core/management/commands/bench_asgi.py
+"""Compara el webhook de MP síncrono (modelo WSGI) con el async (modelo ASGI).
+
+Misma “memoria fija” para ambos: WSGI atiende con ``--threads`` hilos (un request en vuelo
+por hilo); ASGI corre en un solo event loop con hasta ``--concurrency`` requests en vuelo.
+La latencia de Mercado Pago se simula con ``--mp-latency-ms`` (no sale a la red); cada
+request consulta un pago no aprobado, así que solo escribe auditoría.
+"""
+import asyncio
+import logging
+import statistics
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory
+
+from core import views, views_async
+
+
+class _SyncMP:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def payment(self):
+        return self
+
+    def get(self, payment_id):
+        time.sleep(self.latency)
+        return {"status": 200, "response": {"status": "pending", "external_reference": ""}}
+
+
+class _AsyncMP:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def payment_get(self, payment_id):
+        await asyncio.sleep(self.latency)
+        return {"status": 200, "response": {"status": "pending", "external_reference": ""}}
+
+
+_BODY = '{"type": "payment", "data": {"id": "bench"}}'
+
+
+def _summary(name, latencies, elapsed, peak_bytes, threads):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    return (
+        f"{name:5s} req/s={len(latencies) / elapsed:8.1f}  p50={statistics.median(latencies) * 1000:7.1f}ms  "
+        f"p95={p95 * 1000:7.1f}ms  pico_mem={peak_bytes / 1024:8.0f}KiB  hilos={threads}"
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark del webhook de MP: vista síncrona con pool de hilos vs vista async en un loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--threads", type=int, default=16, help="Hilos WSGI (presupuesto de memoria)")
+        parser.add_argument("--concurrency", type=int, default=500, help="Requests en vuelo en ASGI")
+        parser.add_argument("--mp-latency-ms", type=float, default=150.0)
+
+    def _run_wsgi(self, n, threads, latency):
+        rf = RequestFactory()
+        latencies = []
+
+        def one(_):
+            req = rf.post("/webhooks/mercadopago/", data=_BODY, content_type="application/json")
+            t0 = time.perf_counter()
+            views.billing_webhook(req)
+            latencies.append(time.perf_counter() - t0)
+
+        with mock.patch.object(views, "_get_mp_sdk", lambda: _SyncMP(latency)):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(one, range(n)))
+            elapsed = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return _summary("wsgi", latencies, elapsed, peak, threads)
+
+    def _run_asgi(self, n, concurrency, latency):
+        rf = AsyncRequestFactory()
+        latencies = []
+
+        async def main():
+            sem = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with sem:
+                    req = rf.post("/webhooks/mercadopago/", data=_BODY, content_type="application/json")
+                    t0 = time.perf_counter()
+                    await views_async.billing_webhook_async(req)
+                    latencies.append(time.perf_counter() - t0)
+
+            await asyncio.gather(*(one() for _ in range(n)))
+
+        with mock.patch.object(views_async, "get_async_mp", lambda: _AsyncMP(latency)):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            asyncio.run(main())
+            elapsed = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return _summary("asgi", latencies, elapsed, peak, threading.active_count())
+
+    def handle(self, *args, **opts):
+        latency = opts["mp_latency_ms"] / 1000
+        logging.getLogger("core.views").setLevel(logging.ERROR)
+        n = opts["requests"]
+        self.stdout.write(f"bench_asgi: {n} webhooks, latencia MP simulada {opts['mp_latency_ms']:.0f}ms")
+        self.stdout.write(self._run_wsgi(n, opts["threads"], latency))
+        self.stdout.write(self._run_asgi(n, opts["concurrency"], latency))
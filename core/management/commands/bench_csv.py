@@ -0,0 +1,87 @@
+# core/management/commands/bench_csv.py
+"""Parser sobre ``mmap`` (core/csvscan.py) vs ``csv.reader`` sobre el archivo leído y
+decodificado entero, con un CSV sintético de ``--mb`` megabytes en disco."""
+import csv
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core import csvscan
+from core.management.commands.bench_payload import AMOUNTS, synthetic_columns
+
+
+def _amount(value) -> int:
+    value = (value or "").strip()
+    return int(value) if value else 0
+
+
+def _with_csv_reader(path):
+    with open(path, "rb") as fh:
+        text = fh.read().decode("utf-8")
+    reader = csv.reader(io.StringIO(text), delimiter=";")
+    header = next(reader)
+    amount_idx = {header.index(a) for a in AMOUNTS}
+    cols = [[] for _ in header]
+    for row in reader:
+        for i, col in enumerate(cols):
+            col.append(_amount(row[i]) if i in amount_idx else row[i].strip())
+    return len(cols[0])
+
+
+def _with_mmap(path, names=None):
+    with csvscan.MappedCSV.open(path) as src:
+        cols = src.read_columns(names, ints=AMOUNTS)
+    return len(next(iter(cols.values())))
+
+
+def _index_only(path):
+    with csvscan.MappedCSV.open(path) as src:
+        return len(src.index())
+
+
+class Command(BaseCommand):
+    help = "Benchmark de lectura de CSV guardados: mmap + columnas pedidas vs csv.reader."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mb", type=int, default=100)
+        parser.add_argument("--memory", action="store_true", help="Mide también el pico de memoria (más lento)")
+
+    def _write(self, mb):
+        cols = synthetic_columns(20_000)
+        names = list(cols)
+        block = "\n".join(";".join(str(v) for v in row) for row in zip(*cols.values())).encode("utf-8") + b"\n"
+        fh = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+        with fh:
+            fh.write((";".join(names) + "\n").encode("utf-8"))
+            while fh.tell() < mb * 1024 * 1024:
+                fh.write(block)
+        return fh.name
+
+    def handle(self, *args, **opts):
+        path = self._write(opts["mb"])
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        cases = [
+            ("csv.reader (todo)", lambda: _with_csv_reader(path)),
+            ("mmap (todo)", lambda: _with_mmap(path)),
+            ("mmap (RUT + montos)", lambda: _with_mmap(path, ["RUT Proveedor", *AMOUNTS])),
+            ("mmap (solo hash)", lambda: _index_only(path)),
+        ]
+        self.stdout.write(f"bench_csv: {size_mb:.0f} MB")
+        try:
+            for label, fn in cases:
+                t0 = time.perf_counter()
+                rows = fn()
+                secs = time.perf_counter() - t0
+                line = f"  {label:22s} {secs:7.2f}s  {size_mb / secs:7.1f} MB/s  filas={rows}"
+                if opts["memory"]:
+                    tracemalloc.start()
+                    fn()
+                    line += f"  pico_mem={tracemalloc.get_traced_memory()[1] / (1024 * 1024):7.0f}MiB"
+                    tracemalloc.stop()
+                self.stdout.write(line)
+        finally:
+            os.unlink(path)
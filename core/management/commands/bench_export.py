@@ -0,0 +1,74 @@
+# core/management/commands/bench_export.py
+"""Memoria pico y filas/s de la exportación en streaming (core/exports.py) vs cargar el
+queryset entero como el admin, con ``--rows`` filas de ``AuditLog``. Hace rollback al final."""
+import gc
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import exports
+from core.models import AuditLog
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024), elapsed, size
+
+
+class Command(BaseCommand):
+    help = "Benchmark de exportación: streaming (CSV, JSONL, gzip) vs queryset en memoria."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+        parser.add_argument("--skip-list", action="store_true", help="No medir la carga en memoria")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._run(sorted(opts["rows"]), opts["skip_list"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, skip_list):
+        created = 0
+        for n in sizes:
+            AuditLog.objects.bulk_create(
+                [
+                    AuditLog(
+                        action="form_submitted", entity="form", entity_id=str(i),
+                        metadata={"slot_id": i, "rut": "11111111-1"},
+                    )
+                    for i in range(created, n)
+                ],
+                batch_size=5000,
+            )
+            created = n
+            self.stdout.write(f"bench_export: {n} filas de AuditLog")
+            cases = [
+                ("stream csv", lambda: sum(map(len, exports.stream("audit", "csv")))),
+                ("stream jsonl", lambda: sum(map(len, exports.stream("audit", "jsonl")))),
+                ("stream csv.gz", lambda: sum(map(len, exports.stream("audit", "csv", gzip=True)))),
+            ]
+            if not skip_list:
+                cases.append(
+                    ("list(queryset)", lambda: len(list(AuditLog.objects.select_related("user").order_by("at", "pk"))))
+                )
+            for name, fn in cases:
+                peak, elapsed, size = _measure(fn)
+                self.stdout.write(
+                    f"  {name:15s} pico {peak:8.1f} MiB  {n / elapsed:9.0f} filas/s"
+                    + (f"  {size / (1024 * 1024):7.1f} MiB" if name.startswith("stream") else "")
+                )
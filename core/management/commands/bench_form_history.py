@@ -0,0 +1,67 @@
+# core/management/commands/bench_form_history.py
+"""Latencia de ``/api/forms/`` según la profundidad de página: keyset (core/form_history.py)
+vs ``OFFSET``. Crea ``--forms`` Forms de un usuario temporal y hace rollback al final."""
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import form_history
+from core.models import FileUpload, Form
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+class Command(BaseCommand):
+    help = "Benchmark del historial de Forms: keyset vs OFFSET a distintas profundidades."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--forms", type=int, default=50_000)
+        parser.add_argument("--limit", type=int, default=50)
+
+    def handle(self, *args, **opts):
+        n, limit = opts["forms"], opts["limit"]
+        try:
+            with transaction.atomic():
+                self._run(n, limit)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, n, limit):
+        user = get_user_model().objects.create_user(username="bench-history", email="bench-history@example.com")
+        now = timezone.now()
+        Form.objects.bulk_create(
+            [Form(user=user, type=("compras", "ventas")[i % 2], status="done", sii_rut="1-9") for i in range(n)],
+            batch_size=5000,
+        )
+        forms = list(Form.objects.filter(user=user).values_list("pk", flat=True))
+        for i, pk in enumerate(forms):  # auto_now_add: fechas escalonadas después de crear
+            Form.objects.filter(pk=pk).update(created_at=now - timedelta(hours=i))
+        FileUpload.objects.bulk_create(
+            [FileUpload(form_id=pk, file_kind="compras_33", storage_uri="x", original_filename="x.csv") for pk in forms],
+            batch_size=5000,
+        )
+        ordered = list(Form.objects.filter(user=user).order_by("-created_at", "-pk").values_list("created_at", "pk"))
+        self.stdout.write(f"bench_form_history: {n} forms, páginas de {limit}")
+        for depth in (0, n // 10, n // 2, n - limit):
+            cursor = form_history.encode_cursor(*ordered[depth - 1]) if depth else None
+            keyset = _timed(lambda: form_history.page(user, {}, cursor, limit))
+            offset = _timed(
+                lambda: list(form_history.listing(user, {}).values(*form_history.FIELDS, "files")[depth : depth + limit])
+            )
+            self.stdout.write(f"  fila {depth:7d}: keyset {keyset:7.2f} ms   offset {offset:7.2f} ms")
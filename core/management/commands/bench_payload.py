@@ -0,0 +1,77 @@
+# core/management/commands/bench_payload.py
+"""Tamaño y tiempo de carga: filas como objetos JSON (JSONField) vs formato columnar."""
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from core import columnar
+
+AMOUNTS = ("Monto Exento", "Monto Neto", "Monto IVA Recuperable", "Monto Total")
+
+
+def synthetic_columns(n: int, seed: int = 7) -> dict[str, list]:
+    """Registro de compras sintético con ~2000 proveedores."""
+    rnd = random.Random(seed)
+    providers = [(f"{rnd.randint(1_000_000, 99_999_999)}-{rnd.choice('0123456789K')}", f"Proveedor {i} SpA") for i in range(2000)]
+    cols: dict[str, list] = {k: [] for k in (
+        "Nro", "Tipo Doc", "Tipo Compra", "RUT Proveedor", "Razon Social", "Folio", "Fecha Docto", *AMOUNTS)}
+    d0 = date(2025, 1, 1)
+    for i in range(n):
+        rut, name = providers[rnd.randrange(len(providers))]
+        neto = rnd.randint(1_000, 5_000_000)
+        iva = round(neto * 0.19)
+        exento = rnd.choice((0, 0, 0, rnd.randint(0, 100_000)))
+        for k, v in (
+            ("Nro", str(i + 1)), ("Tipo Doc", rnd.choice(("33", "34", "61"))), ("Tipo Compra", "Del Giro"),
+            ("RUT Proveedor", rut), ("Razon Social", name), ("Folio", str(rnd.randint(1, 10**7))),
+            ("Fecha Docto", (d0 + timedelta(days=rnd.randrange(365))).strftime("%d/%m/%Y")),
+            ("Monto Exento", exento), ("Monto Neto", neto), ("Monto IVA Recuperable", iva),
+            ("Monto Total", exento + neto + iva),
+        ):
+            cols[k].append(v)
+    return cols
+
+
+class Command(BaseCommand):
+    help = "Benchmark de FormPayload: filas JSON vs payload columnar (tamaño y carga)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def _best(self, fn, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        return best * 1000
+
+    def handle(self, *args, **opts):
+        n, repeat = opts["rows"], opts["repeat"]
+        cols = synthetic_columns(n)
+        names = list(cols)
+        rows = [dict(zip(names, vals)) for vals in zip(*cols.values())]
+
+        as_json = json.dumps(rows, ensure_ascii=False).encode("utf-8")
+        t0 = time.perf_counter()
+        blob = columnar.pack({"compras_33": cols}, {"compras_33": {a: "int" for a in AMOUNTS}})
+        encode_ms = (time.perf_counter() - t0) * 1000
+
+        json_total = self._best(lambda: sum(r["Monto Total"] for r in json.loads(as_json)), repeat)
+        col_total = self._best(
+            lambda: sum(columnar.ColumnarPayload(blob).table("compras_33").int_array("Monto Total")), repeat
+        )
+        json_full = self._best(lambda: json.loads(as_json), repeat)
+        col_full = self._best(
+            lambda: list(columnar.ColumnarPayload(blob).table("compras_33").iter_rows()), repeat
+        )
+
+        self.stdout.write(f"bench_payload: {n} filas, {len(names)} columnas (mejor de {repeat})")
+        self.stdout.write(f"  tamaño   json={len(as_json) / 1024:10.0f}KiB  columnar={len(blob) / 1024:8.0f}KiB  "
+                          f"({len(as_json) / len(blob):.1f}x)  codificar={encode_ms:.0f}ms")
+        self.stdout.write(f"  suma 'Monto Total'  json={json_total:8.1f}ms  columnar={col_total:8.1f}ms")
+        self.stdout.write(f"  todas las filas     json={json_full:8.1f}ms  columnar={col_full:8.1f}ms")
@@ -0,0 +1,92 @@
+# core/management/commands/bench_storage.py
+"""Throughput de ``core/storage.py``: escritura en streaming, lectura completa y lecturas
+por rango al azar, en disco local (por política de fsync) y en S3 contra el stand-in
+local (``core/s3_standin.py``) o un endpoint real con ``--s3``."""
+import contextlib
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import storage
+from core.s3_standin import S3StandIn
+
+
+class _Source:
+    """Stream de ``size`` bytes pseudoaleatorios sin tenerlos en memoria."""
+
+    def __init__(self, size: int, block: bytes):
+        self.left, self.block = size, block
+
+    def read(self, n: int = -1) -> bytes:
+        n = self.left if n < 0 else min(n, self.left)
+        out = (self.block * (n // len(self.block) + 1))[:n]
+        self.left -= n
+        return out
+
+
+class Command(BaseCommand):
+    help = "Benchmark de almacenamiento: escritura, lectura y lectura por rangos (local y S3)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mb", type=int, default=256, help="Tamaño de cada objeto")
+        parser.add_argument("--files", type=int, default=4)
+        parser.add_argument("--ranges", type=int, default=2000, help="Lecturas por rango por backend")
+        parser.add_argument("--range-kb", type=int, default=64)
+        parser.add_argument("--s3", default="", help="s3://bucket/prefijo real (usa STORAGE_S3_*)")
+
+    def _run(self, label, store, opts):
+        size = opts["mb"] * 1024 * 1024
+        block = os.urandom(1024 * 1024)
+        uris = []
+        t0 = time.perf_counter()
+        for i in range(opts["files"]):
+            uris.append(store.put_stream(f"bench/obj-{i}.bin", _Source(size, block)))
+        write = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for uri in uris:
+            with contextlib.closing(store.open(uri)) as fh:
+                while fh.read(storage.COPY_BLOCK):
+                    pass
+        read = time.perf_counter() - t0
+
+        rnd = random.Random(1)
+        span = opts["range_kb"] * 1024
+        t0 = time.perf_counter()
+        for _ in range(opts["ranges"]):
+            store.read_range(rnd.choice(uris), rnd.randrange(size - span), span)
+        ranged = time.perf_counter() - t0
+        for uri in uris:
+            store.delete(uri)
+
+        total_mb = opts["mb"] * opts["files"]
+        self.stdout.write(
+            f"  {label:22s} escritura {total_mb / write:8.1f} MB/s   lectura {total_mb / read:8.1f} MB/s   "
+            f"rangos {opts['ranges'] / ranged:8.0f} req/s ({opts['range_kb']} KiB)"
+        )
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"bench_storage: {opts['files']} objetos de {opts['mb']} MB")
+        tmp = tempfile.mkdtemp(prefix="bench-storage-")
+        try:
+            for policy in storage.FSYNC_POLICIES:
+                self._run(f"local fsync={policy}", storage.LocalStorage(os.path.join(tmp, "local"), fsync=policy), opts)
+            if opts["s3"]:
+                self._run("s3", storage.backend(opts["s3"]), opts)
+                return
+            srv = S3StandIn(os.path.join(tmp, "s3")).start()
+            try:
+                store = storage.S3Storage(
+                    "bench", endpoint=srv.endpoint, access_key=srv.access_key, secret_key=srv.secret_key
+                )
+                store.create_bucket()
+                self._run("s3 stand-in", store, opts)
+                store.close()
+            finally:
+                srv.stop()
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,28 @@
+# core/management/commands/expire_subscriptions.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.subscriptions import expire_due_subscriptions
+
+
+class Command(BaseCommand):
+    help = "Pasa a past_due las suscripciones activas vencidas (seguro en varios nodos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--loop", action="store_true", help="Modo worker: repetir indefinidamente")
+        parser.add_argument("--interval", type=int, default=60, help="Segundos entre barridos en --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            res = expire_due_subscriptions(batch_size=options["batch_size"])
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"expire_subscriptions: {res.expired} vencidas, {res.slots_frozen} slots congelados "
+                f"en {res.batches} lotes ({elapsed:.2f}s)."
+            ))
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,47 @@
+# core/management/commands/export_data.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exports
+
+
+class Command(BaseCommand):
+    help = "Exporta AuditLog, Forms o el historial de suscripciones en streaming (CSV o JSONL, opcional gzip)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(exports.DATASETS))
+        parser.add_argument("--format", choices=sorted(exports.FORMATS), default="csv")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--since", help="Fecha o fecha-hora ISO (incluida)")
+        parser.add_argument("--until", help="Fecha o fecha-hora ISO (excluida)")
+        parser.add_argument("--action", default="", help="AuditLog.action, Form.status o status_to")
+        parser.add_argument("--user", default="", help="Id o email del usuario")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Sobrescribe EXPORT_CHUNK_SIZE")
+        parser.add_argument("-o", "--output", default="-", help="Archivo de salida; '-' = stdout")
+
+    def handle(self, *args, **opts):
+        try:
+            chunks = exports.stream(
+                opts["dataset"],
+                opts["format"],
+                gzip=opts["gzip"],
+                chunk_size=opts["chunk_size"],
+                since=exports.parse_when(opts["since"]) if opts["since"] else None,
+                until=exports.parse_when(opts["until"]) if opts["until"] else None,
+                action=opts["action"],
+                user=opts["user"].strip(),
+            )
+        except exports.InvalidExport as e:
+            raise CommandError(str(e))
+        out = sys.stdout.buffer if opts["output"] == "-" else open(opts["output"], "wb")
+        written = 0
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        if opts["output"] != "-":
+            self.stderr.write(f"export_data: {written / (1024 * 1024):.1f} MiB en {opts['output']}")
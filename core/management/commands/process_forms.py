@@ -0,0 +1,45 @@
+# core/management/commands/process_forms.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.form_processing import make_pool, process_batch
+from core.form_scheduler import refresh_queue_gauges
+
+
+class Command(BaseCommand):
+    help = "Procesa formularios enviados (validación y agregación de CSV) con un pool de procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (0 = sin pool)")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--loop", action="store_true", help="Modo worker: repetir indefinidamente")
+        parser.add_argument("--interval", type=float, default=2.0, help="Segundos de espera con la cola vacía")
+        parser.add_argument("--stats", action="store_true", help="Solo mostrar la cola por tier")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for tier, s in sorted(refresh_queue_gauges(force=True).items()):
+                self.stdout.write(f"{tier:12s} en cola={s['depth']:6d}  espera máx={s['oldest_wait_s']:8.0f}s")
+            return
+        workers = options["workers"]
+        if workers is None:
+            workers = getattr(settings, "FORM_WORKERS", 2)
+        pool = make_pool(workers)
+        try:
+            while True:
+                started = time.monotonic()
+                res = process_batch(pool, options["batch_size"])
+                if res.claimed or not options["loop"]:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"process_forms: {res.claimed} tomados, {res.done} done, {res.retried} reintentos, "
+                        f"{res.failed} error, {res.lost} lease perdido ({time.monotonic() - started:.2f}s)."
+                    ))
+                if not options["loop"]:
+                    break
+                if not res.claimed:
+                    time.sleep(options["interval"])
+        finally:
+            if pool:
+                pool.shutdown()
@@ -0,0 +1,48 @@
+# core/management/commands/purge_forms.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import retention
+
+
+class Command(BaseCommand):
+    help = "Borra por lotes los Forms más antiguos que FORM_RETENTION_DAYS, con sus filas y archivos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Sobrescribe FORM_RETENTION_DAYS")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--sleep", type=float, default=None, help="Segundos entre lotes")
+        parser.add_argument("--workers", type=int, default=None, help="Hilos que borran archivos")
+        parser.add_argument("--max-batches", type=int, default=0)
+        parser.add_argument("--dry-run", action="store_true", help="Solo contar los Forms vencidos")
+
+    def _progress(self, res):
+        self.stdout.write(
+            f"  lote {res.batches}: forms={res.forms} filas={res.total_rows} ({res.rows_per_sec:.0f}/s) "
+            f"archivos={res.files} (+{res.files_failed} fallidos) "
+            f"liberado={(res.db_bytes + res.file_bytes) / (1024 * 1024):.1f} MiB"
+        )
+
+    def handle(self, *args, **opts):
+        before = retention.cutoff(opts["days"])
+        if before is None:
+            raise CommandError("Retención desactivada: define FORM_RETENTION_DAYS o usa --days")
+        if opts["dry_run"]:
+            n = retention.expired(before).count()
+            self.stdout.write(f"purge_forms: {n} forms creados antes de {before:%Y-%m-%d}")
+            return
+        res = retention.purge(
+            before,
+            batch_size=opts["batch_size"] or getattr(settings, "RETENTION_BATCH_SIZE", 200),
+            sleep=getattr(settings, "RETENTION_SLEEP_SECONDS", 0.2) if opts["sleep"] is None else opts["sleep"],
+            workers=opts["workers"] or getattr(settings, "RETENTION_FILE_WORKERS", 4),
+            max_batches=opts["max_batches"],
+            progress=self._progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"purge_forms: {res.forms} forms, {res.total_rows} filas en {res.batches} lotes "
+            f"({res.rows_per_sec:.0f} filas/s); {res.files} archivos, "
+            f"{res.file_bytes / (1024 * 1024):.1f} MiB en archivos + {res.db_bytes / (1024 * 1024):.1f} MiB en la base."
+        ))
+        if res.files_failed:
+            self.stdout.write(self.style.WARNING(f"{res.files_failed} archivos quedan en FileDeletion para reintentar"))
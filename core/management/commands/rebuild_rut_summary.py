@@ -0,0 +1,40 @@
+# core/management/commands/rebuild_rut_summary.py
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.rut_summary import rebuild
+
+
+def _rebuild(user_ids):
+    try:
+        return rebuild(user_ids)
+    finally:
+        connection.close()  # conexión propia de cada hilo
+
+
+class Command(BaseCommand):
+    help = "Recalcula RutFormSummary desde Form para todos los usuarios, por lotes en paralelo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Usuarios por lote")
+        parser.add_argument("--workers", type=int, default=4, help="Lotes en paralelo (hilos)")
+
+    def handle(self, *args, **options):
+        batch = options["batch_size"]
+        ids = get_user_model().objects.order_by("pk").values_list("pk", flat=True)
+        last, batches, rows = 0, 0, 0
+        with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as pool:
+            futures = []
+            while True:
+                chunk = list(ids.filter(pk__gt=last)[:batch])
+                if not chunk:
+                    break
+                last = chunk[-1]
+                futures.append(pool.submit(_rebuild, chunk))
+            for fut in futures:
+                rows += fut.result()
+                batches += 1
+        self.stdout.write(self.style.SUCCESS(f"rebuild_rut_summary: {rows} filas en {batches} lotes."))
@@ -0,0 +1,12 @@
+# core/management/commands/rebuild_subscription_summary.py
+from django.core.management.base import BaseCommand
+
+from core.ledger import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = "Recalcula SubscriptionMonthlySummary desde el ledger UserSubscriptionHistory."
+
+    def handle(self, *args, **options):
+        total = rebuild_summary()
+        self.stdout.write(self.style.SUCCESS(f"rebuild_subscription_summary: {total} filas procesadas."))
@@ -0,0 +1,36 @@
+# core/management/commands/restore_data.py
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import backup
+
+
+class Command(BaseCommand):
+    help = "Restaura un respaldo de backup_data (y los anteriores de su cadena incremental)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default=None, help="Directorio del respaldo; por defecto el último")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--verify-only", action="store_true", help="Solo comprobar los checksums")
+
+    def _progress(self, res, label, segment):
+        self.stdout.write(f"  {label}/{segment}: {res.rows} filas ({res.mb_per_sec:.1f} MB/s)")
+
+    def handle(self, *args, **opts):
+        path = Path(opts["path"]) if opts["path"] else backup.latest()
+        if path is None:
+            raise CommandError("No hay respaldos en BACKUP_DIR")
+        try:
+            if opts["verify_only"]:
+                for p in backup.chain(path):
+                    backup.verify(p)
+                    self.stdout.write(f"  {p.name}: ok")
+                return
+            res = backup.restore(path, batch_size=opts["batch_size"], progress=self._progress)
+        except backup.BackupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"restore_data: {res.rows} filas de {res.backups} respaldos ({res.summaries} de resúmenes), "
+            f"{res.raw_bytes / (1024 * 1024):.1f} MB en {res.elapsed:.1f} s ({res.mb_per_sec:.1f} MB/s)"
+        ))
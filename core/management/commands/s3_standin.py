@@ -0,0 +1,31 @@
+# core/management/commands/s3_standin.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.s3_standin import S3StandIn
+
+
+class Command(BaseCommand):
+    help = "Servidor local compatible con S3 para desarrollo (STORAGE_UPLOADS_URI=s3://...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=str(settings.BASE_DIR / "s3data"))
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=9000)
+        parser.add_argument("--bucket", action="append", default=[], help="Bucket a crear al arrancar")
+
+    def handle(self, *args, **opts):
+        srv = S3StandIn(
+            opts["dir"], opts["host"], opts["port"],
+            access_key=getattr(settings, "STORAGE_S3_ACCESS_KEY", "") or "standin",
+            secret_key=getattr(settings, "STORAGE_S3_SECRET_KEY", "") or "standin-secret",
+        )
+        for bucket in opts["bucket"]:
+            (srv.root / bucket).mkdir(parents=True, exist_ok=True)
+        self.stdout.write(f"S3 stand-in en {srv.endpoint} (datos en {srv.root})")
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            srv.server_close()
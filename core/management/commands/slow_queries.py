@@ -0,0 +1,67 @@
+# core/management/commands/slow_queries.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max, Sum
+from django.utils import timezone
+
+from core.models import SlowQuery
+
+
+class Command(BaseCommand):
+    help = "Reporta las huellas de consultas lentas con mayor tiempo total."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="Cantidad de huellas a mostrar")
+        parser.add_argument("--hours", type=int, default=24, help="Ventana de tiempo (0 = todo)")
+        parser.add_argument("--explain", action="store_true", help="Muestra el último EXPLAIN capturado")
+        parser.add_argument("--purge-days", type=int, default=0, help="Elimina registros más antiguos que N días")
+
+    def handle(self, *args, **options):
+        if options["purge_days"]:
+            cutoff = timezone.now() - timedelta(days=options["purge_days"])
+            deleted, _ = SlowQuery.objects.filter(at__lt=cutoff).delete()
+            self.stdout.write(f"slow_queries: {deleted} registros eliminados.")
+
+        qs = SlowQuery.objects.all()
+        if options["hours"]:
+            qs = qs.filter(at__gte=timezone.now() - timedelta(hours=options["hours"]))
+
+        rows = (
+            qs.values("fingerprint")
+            .annotate(
+                calls=Count("id"),
+                total_ms=Sum("duration_ms"),
+                avg_ms=Avg("duration_ms"),
+                max_ms=Max("duration_ms"),
+            )
+            .order_by("-total_ms")[: options["limit"]]
+        )
+
+        if not rows:
+            self.stdout.write(self.style.SUCCESS("slow_queries: sin registros."))
+            return
+
+        for r in rows:
+            sample = (
+                SlowQuery.objects.filter(fingerprint=r["fingerprint"])
+                .order_by("-at")
+                .only("normalized_sql", "call_site")
+                .first()
+            )
+            self.stdout.write(
+                f"{r['fingerprint']}  total={r['total_ms']:.1f}ms  calls={r['calls']}  "
+                f"avg={r['avg_ms']:.1f}ms  max={r['max_ms']:.1f}ms"
+            )
+            if sample:
+                self.stdout.write(f"    at   {sample.call_site or '?'}")
+                self.stdout.write(f"    sql  {sample.normalized_sql[:300]}")
+            if options["explain"]:
+                plan = (
+                    SlowQuery.objects.filter(fingerprint=r["fingerprint"], explain__isnull=False)
+                    .order_by("-at")
+                    .values_list("explain", flat=True)
+                    .first()
+                )
+                if plan:
+                    self.stdout.write(f"    plan {plan}")
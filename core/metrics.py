@@ -0,0 +1,424 @@
+# core/metrics.py
+"""Registro de métricas en proceso con exposición en formato Prometheus (text 0.0.4).
+
+Modo simple: los valores viven en memoria del proceso.
+Modo multiproceso (gunicorn): si ``METRICS_MULTIPROC_DIR`` está definido, cada worker
+vuelca su estado a ``<dir>/metrics_<pid>.json`` (escritura atómica, como máximo cada
+``METRICS_FLUSH_SECONDS`` y al salir) y ``/metrics`` agrega todos los archivos.
+Ninguna operación toca la base de datos.
+"""
+from __future__ import annotations
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_GAUGE_MODES = ("sum", "livesum", "max", "min")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return f"{value:.1f}"
+    return repr(float(value))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._registry = registry if registry is not None else REGISTRY
+        self._registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        extra = set(labels) - set(self.labelnames)
+        if extra:
+            raise ValueError(f"{self.name}: labels desconocidos {sorted(extra)}")
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _reset(self) -> None:
+        self._values = {}
+
+    def _snapshot(self) -> list:
+        # Copia los estados de histograma: el volcado a disco ocurre fuera del lock
+        return [[list(k), list(v) if isinstance(v, list) else v] for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counter solo puede incrementar")
+        key = self._key(labels)
+        with self._registry.lock:
+            self._registry.check_fork()
+            self._values[key] = self._values.get(key, 0.0) + amount
+        self._registry.maybe_flush()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, multiprocess_mode: str = "livesum", **kwargs):
+        if multiprocess_mode not in _GAUGE_MODES:
+            raise ValueError(f"multiprocess_mode inválido: {multiprocess_mode}")
+        self.multiprocess_mode = multiprocess_mode
+        super().__init__(*args, **kwargs)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._registry.lock:
+            self._registry.check_fork()
+            self._values[key] = float(value)
+        self._registry.maybe_flush()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._registry.lock:
+            self._registry.check_fork()
+            self._values[key] = self._values.get(key, 0.0) + amount
+        self._registry.maybe_flush()
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (float("inf"),)
+        super().__init__(*args, **kwargs)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._registry.lock:
+            self._registry.check_fork()
+            # [conteo por bucket (no acumulado)..., suma, conteo]
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+        self._registry.maybe_flush()
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._metrics: dict[str, _Metric] = {}
+        self._pid = os.getpid()
+        self._last_flush = 0.0
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    # --- multiproceso ---
+    @staticmethod
+    def multiproc_dir() -> str:
+        return getattr(settings, "METRICS_MULTIPROC_DIR", "") or ""
+
+    def check_fork(self) -> None:
+        # Tras un fork (gunicorn --preload) el hijo no debe heredar los valores del maestro
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._last_flush = 0.0
+            for m in self._metrics.values():
+                m._reset()
+
+    def maybe_flush(self, force: bool = False) -> None:
+        directory = self.multiproc_dir()
+        if not directory:
+            return
+        now = time.monotonic()
+        interval = float(getattr(settings, "METRICS_FLUSH_SECONDS", 1.0))
+        if not force and now - self._last_flush < interval:
+            return
+        self._last_flush = now
+        with self.lock:
+            data = self._snapshot()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"metrics_{os.getpid()}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, path)
+
+    def _snapshot(self) -> dict:
+        return {name: m._snapshot() for name, m in self._metrics.items()}
+
+    def _load_all(self) -> list[tuple[int, dict]]:
+        directory = self.multiproc_dir()
+        if not directory:
+            with self.lock:
+                return [(os.getpid(), self._snapshot())]
+        self.maybe_flush(force=True)
+        out = []
+        for fname in os.listdir(directory):
+            if not (fname.startswith("metrics_") and fname.endswith(".json")):
+                continue
+            try:
+                pid = int(fname[len("metrics_"):-len(".json")])
+                with open(os.path.join(directory, fname), encoding="utf-8") as fh:
+                    out.append((pid, json.load(fh)))
+            except (ValueError, OSError):
+                continue
+        return out
+
+    def collect(self) -> dict[str, dict[tuple, object]]:
+        """Valores agregados de todos los procesos, por métrica y tupla de labels."""
+        merged: dict[str, dict[tuple, object]] = {name: {} for name in self._metrics}
+        for pid, snap in self._load_all():
+            alive = None
+            for name, samples in snap.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                acc = merged[name]
+                for labels, value in samples:
+                    key = tuple(labels)
+                    if metric.kind == "histogram":
+                        prev = acc.get(key)
+                        acc[key] = list(value) if prev is None else [a + b for a, b in zip(prev, value)]
+                    elif metric.kind == "gauge":
+                        mode = metric.multiprocess_mode
+                        if mode == "livesum":
+                            if alive is None:
+                                alive = pid == os.getpid() or _pid_alive(pid)
+                            if not alive:
+                                continue
+                        if key not in acc:
+                            acc[key] = value
+                        elif mode == "max":
+                            acc[key] = max(acc[key], value)
+                        elif mode == "min":
+                            acc[key] = min(acc[key], value)
+                        else:
+                            acc[key] = acc[key] + value
+                    else:
+                        acc[key] = acc.get(key, 0.0) + value
+        return merged
+
+    def render(self) -> str:
+        lines: list[str] = []
+        collected = self.collect()
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(collected.get(name, {}).items()):
+                pairs = [f'{n}="{_escape(v)}"' for n, v in zip(metric.labelnames, key)]
+                if metric.kind == "histogram":
+                    cumulative = 0.0
+                    for bound, count in zip(metric.buckets, value[:-2]):
+                        cumulative += count
+                        le = ",".join(pairs + [f'le="{_fmt(bound)}"'])
+                        lines.append(f"{name}_bucket{{{le}}} {_fmt(cumulative)}")
+                    lbl = "{" + ",".join(pairs) + "}" if pairs else ""
+                    lines.append(f"{name}_sum{lbl} {_fmt(value[-2])}")
+                    lines.append(f"{name}_count{lbl} {_fmt(value[-1])}")
+                else:
+                    lbl = "{" + ",".join(pairs) + "}" if pairs else ""
+                    lines.append(f"{name}{lbl} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+atexit.register(lambda: REGISTRY.maybe_flush(force=True))
+
+
+def timed(histogram: Histogram, **labels):
+    """Decorador: observa la duración de la función (sync o async) en ``histogram``."""
+
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    return await fn(*args, **kwargs)
+
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+# -----------------------------
+# Mercado Pago: proxy que mide cada llamada del SDK
+# -----------------------------
+class _TimedResource:
+    def __init__(self, resource, name: str):
+        self._resource = resource
+        self._name = name
+
+    def __getattr__(self, attr):
+        target = getattr(self._resource, attr)
+        if not callable(target):
+            return target
+
+        @functools.wraps(target)
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            status = "error"
+            try:
+                resp = target(*args, **kwargs)
+                if isinstance(resp, dict):
+                    status = str(resp.get("status") or "")
+                return resp
+            finally:
+                MP_CALL_SECONDS.observe(
+                    time.perf_counter() - start, resource=self._name, method=attr
+                )
+                MP_CALLS.inc(resource=self._name, method=attr, status=status)
+
+        return call
+
+
+class InstrumentedSDK:
+    """Envuelve ``mercadopago.SDK``: ``sdk.preapproval().create(...)`` queda medido."""
+
+    def __init__(self, sdk):
+        self._sdk = sdk
+
+    def __getattr__(self, attr):
+        target = getattr(self._sdk, attr)
+        if not callable(target):
+            return target
+
+        @functools.wraps(target)
+        def factory(*args, **kwargs):
+            return _TimedResource(target(*args, **kwargs), attr)
+
+        return factory
+
+
+def instrument_mp_sdk(sdk) -> Optional[InstrumentedSDK]:
+    if sdk is None or isinstance(sdk, InstrumentedSDK):
+        return sdk
+    return InstrumentedSDK(sdk)
+
+
+# -----------------------------
+# Métricas de negocio / latencia
+# -----------------------------
+WEBHOOK_EVENTS = Counter(
+    "autocs_webhook_events_total", "Webhooks de Mercado Pago recibidos", ("topic",)
+)
+
+WEBHOOK_TOPICS = ("payment", "preapproval")
+
+
+def webhook_topic(topic, action) -> str:
+    """Etiqueta acotada para ``WEBHOOK_EVENTS``: el topic llega del query/body sin
+    autenticar y cada valor distinto sería una serie nueva (y un archivo en multiproceso)."""
+    for value in (topic, action):
+        if isinstance(value, str):
+            head = value.split(".", 1)[0]
+            if head in WEBHOOK_TOPICS:
+                return head
+    return "other"
+
+
+WEBHOOK_SECONDS = Histogram(
+    "autocs_webhook_duration_seconds", "Duración del procesamiento del webhook de MP"
+)
+MP_CALLS = Counter(
+    "autocs_mp_calls_total", "Llamadas al SDK de Mercado Pago", ("resource", "method", "status")
+)
+MP_CALL_SECONDS = Histogram(
+    "autocs_mp_call_duration_seconds", "Latencia de llamadas al SDK de Mercado Pago", ("resource", "method")
+)
+SLOT_LOCKS = Counter(
+    "autocs_slot_lock_total", "Envíos de formulario según si bloquearon un slot", ("result",)
+)
+FORM_TRANSITIONS = Counter(
+    "autocs_form_status_transitions_total", "Transiciones de estado de Form", ("from_status", "to_status")
+)
+FORM_STAGE_SECONDS = Histogram(
+    "autocs_form_stage_duration_seconds", "Duración de cada etapa del procesamiento de Form", ("stage",)
+)
+FORM_QUEUE_DEPTH = Gauge(
+    "autocs_form_queue_depth", "Forms en cola (stored) por tier", ("tier",), multiprocess_mode="max"
+)
+FORM_QUEUE_WAIT_SECONDS = Histogram(
+    "autocs_form_queue_wait_seconds",
+    "Espera desde el envío hasta que un worker toma el Form, por tier",
+    ("tier",),
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+FORMS_PROCESSED = Counter(
+    "autocs_forms_processed_total", "Forms procesados por tier y resultado", ("tier", "result")
+)
+UPLOAD_CHUNKS = Counter(
+    "autocs_upload_chunks_total", "Partes recibidas por las subidas reanudables, por resultado", ("result",)
+)
+UPLOAD_BYTES = Counter("autocs_upload_bytes_total", "Bytes aceptados por las subidas reanudables")
+RETENTION_ROWS = Counter(
+    "autocs_retention_rows_total", "Filas borradas por la purga de retención, por tabla", ("table",)
+)
+RETENTION_BYTES = Counter(
+    "autocs_retention_bytes_total", "Bytes liberados por la purga de retención (db | files)", ("kind",)
+)
+EXPORT_ROWS = Counter(
+    "autocs_export_rows_total", "Filas entregadas por las exportaciones en streaming", ("dataset", "format")
+)
+SLOT_SYNC = Counter(
+    "autocs_slot_sync_total", "Slots afectados al sincronizar con el cupo del plan", ("change",)
+)
+SLOT_SYNC_SECONDS = Histogram(
+    "autocs_slot_sync_duration_seconds", "Duración de _sync_slots_for_quota"
+)
+SUBSCRIPTIONS_EXPIRED = Counter(
+    "autocs_subscriptions_expired_total", "Suscripciones pasadas a past_due por vencimiento"
+)
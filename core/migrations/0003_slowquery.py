@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_plan_rut_quota'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('normalized_sql', models.TextField()),
+                ('sql', models.TextField()),
+                ('params', models.JSONField(default=list)),
+                ('duration_ms', models.FloatField()),
+                ('call_site', models.CharField(blank=True, max_length=255)),
+                ('vendor', models.CharField(blank=True, max_length=32)),
+                ('explain', models.JSONField(blank=True, null=True)),
+                ('at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fingerprint', 'at'], name='core_slowqu_fingerp_ed46aa_idx'), models.Index(fields=['at'], name='core_slowqu_at_f5c1c3_idx')],
+            },
+        ),
+    ]
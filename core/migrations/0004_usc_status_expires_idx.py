@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_slowquery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscriptioncurrent',
+            index=models.Index(fields=['status', 'expires_at'], name='core_usersu_status_2b758a_idx'),
+        ),
+    ]
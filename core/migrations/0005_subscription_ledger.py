@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_usc_status_expires_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('activations', models.PositiveIntegerField(default=0)),
+                ('renewals', models.PositiveIntegerField(default=0)),
+                ('upgrades', models.PositiveIntegerField(default=0)),
+                ('downgrades', models.PositiveIntegerField(default=0)),
+                ('past_due', models.PositiveIntegerField(default=0)),
+                ('churned', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='usersubscriptionhistory',
+            name='plan_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.plan'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscriptionhistory',
+            index=models.Index(fields=['user', 'valid_from'], name='core_usersu_user_id_986f5e_idx'),
+        ),
+        migrations.AddField(
+            model_name='subscriptionmonthlysummary',
+            name='plan',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='core.plan'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscriptionmonthlysummary',
+            constraint=models.UniqueConstraint(fields=('month', 'plan'), name='uq_subsummary_month_plan'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_subscription_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersubscriptioncurrent',
+            name='pending_plan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.plan'),
+        ),
+        migrations.AddField(
+            model_name='usersubscriptioncurrent',
+            name='pending_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_entitlement_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('draft', 'Draft'), ('validating', 'Validating'), ('stored', 'Stored'), ('done', 'Done'), ('error', 'Error')], max_length=16)),
+                ('to_status', models.CharField(choices=[('draft', 'Draft'), ('validating', 'Validating'), ('stored', 'Stored'), ('done', 'Done'), ('error', 'Error')], max_length=16)),
+                ('attempt', models.PositiveSmallIntegerField(default=0)),
+                ('timings', models.JSONField(blank=True, default=dict)),
+                ('message', models.TextField(blank=True)),
+                ('at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='form',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='form',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='form',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='form',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='form',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='form_status_next_idx'),
+        ),
+        migrations.AddField(
+            model_name='formtransition',
+            name='form',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='core.form'),
+        ),
+        migrations.AddIndex(
+            model_name='formtransition',
+            index=models.Index(fields=['form', 'at'], name='form_transition_form_at_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_form_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='priority',
+            field=models.SmallIntegerField(default=0),
+        ),
+    ]
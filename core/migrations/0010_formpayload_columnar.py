@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_form_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formpayload',
+            name='columns_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='formpayload',
+            name='columns_size',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='formpayload',
+            name='columns_uri',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_formpayload_columnar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_kind', models.CharField(max_length=20)),
+                ('counterparty_rut', models.CharField(max_length=20)),
+                ('doc_type', models.IntegerField()),
+                ('period', models.CharField(max_length=7)),
+                ('rows', models.PositiveIntegerField()),
+                ('exento', models.BigIntegerField(default=0)),
+                ('neto', models.BigIntegerField(default=0)),
+                ('iva', models.BigIntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='core.form')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['form', 'file_kind'], name='formagg_form_kind_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_formaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='row_hashes',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
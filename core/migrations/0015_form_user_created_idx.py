@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_filedeletion_form_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='form',
+            index=models.Index(fields=['user', '-created_at', '-id'], include=('type', 'status', 'sii_rut', 'submitted_at', 'processed_at'), name='form_user_created_idx'),
+        ),
+    ]
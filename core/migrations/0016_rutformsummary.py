@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_form_user_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RutFormSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rut', models.CharField(max_length=16)),
+                ('submitted', models.IntegerField(default=0)),
+                ('compras', models.IntegerField(default=0)),
+                ('ventas', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('error', models.IntegerField(default=0)),
+                ('compras_total', models.BigIntegerField(default=0)),
+                ('ventas_total', models.BigIntegerField(default=0)),
+                ('last_submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rut_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'rut'), name='uq_rutsummary_user_rut')],
+            },
+        ),
+    ]
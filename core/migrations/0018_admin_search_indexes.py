@@ -0,0 +1,65 @@
+# Índices para las búsquedas del admin (core/admin_perf.py). Solo PostgreSQL.
+#
+# Django busca con UPPER("col"::text) LIKE UPPER(%s): los índices son sobre esa misma
+# expresión. Con pg_trgm, GIN trigram (sirve para icontains e istartswith); si la extensión
+# no se puede instalar (sin permisos), btree text_pattern_ops, que solo sirve para
+# istartswith: en ese caso usar ADMIN_SEARCH_MODE=prefix.
+
+from django.conf import settings
+from django.db import migrations
+
+COLUMNS = (
+    ("auth_user", "email"),  # user__email en AuditLog, Form y slots
+    ("core_auditlog", "entity_id"),
+    ("core_form", "sii_rut"),
+    ("core_userrutslot", "rut"),
+)
+
+
+def _name(table, column):
+    return f"{table}_{column}_search_idx"
+
+
+def create(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    with conn.cursor() as cur:
+        try:
+            cur.execute("SAVEPOINT admin_trgm")
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cur.execute("RELEASE SAVEPOINT admin_trgm")
+            method, opclass = "gin", "gin_trgm_ops"
+        except Exception:
+            cur.execute("ROLLBACK TO SAVEPOINT admin_trgm")
+            method, opclass = "btree", "text_pattern_ops"
+        for table, column in COLUMNS:
+            table = user_table if table == "auth_user" else table
+            cur.execute(
+                f'CREATE INDEX IF NOT EXISTS "{_name(table, column)}" ON "{table}" '
+                f'USING {method} ((UPPER("{column}"::text)) {opclass})'
+            )
+
+
+def drop(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    with conn.cursor() as cur:
+        for table, column in COLUMNS:
+            table = user_table if table == "auth_user" else table
+            cur.execute(f'DROP INDEX IF EXISTS "{_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_auditlog_export_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersubscriptioncurrent',
+            name='replaced_subscription_id',
+            field=models.CharField(blank=True, max_length=128),
+        ),
+    ]
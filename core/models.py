@@ -1,6 +1,7 @@
 # core/models.py
 from __future__ import annotations
 
+import uuid
 from dataclasses import dataclass
 from typing import Optional
 
@@ -9,6 +10,8 @@ from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.utils import timezone
 
+from . import metrics
+
 
 # -----------------------------
 # Helpers / constantes
@@ -103,14 +106,50 @@ class UserSubscriptionCurrent(models.Model):
     auto_renew = models.BooleanField(default=True)
     provider = models.CharField(max_length=32, blank=True)
     external_subscription_id = models.CharField(max_length=128, blank=True)
+    # Cambio de plan iniciado y aún no confirmado por el webhook de MP
+    pending_plan = models.ForeignKey(
+        Plan, null=True, blank=True, on_delete=models.PROTECT, related_name="+"
+    )
+    pending_since = models.DateTimeField(null=True, blank=True)
+    # Preapproval cancelado por el cambio de plan: su webhook "cancelled" no desactiva nada
+    replaced_subscription_id = models.CharField(max_length=128, blank=True)
+
+    class Meta:
+        indexes = [
+            # Barrido de vencimientos: status='active' AND expires_at < now, en orden
+            models.Index(fields=["status", "expires_at"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user} → {self.plan.code} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado leído de BD: el ledger compara contra esto en post_save (sin re-consultar)
+        instance._ledger_state = (
+            instance.__dict__.get("status"),
+            instance.__dict__.get("plan_id"),
+        )
+        return instance
+
+
+class _AppendOnlyQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise ValidationError("UserSubscriptionHistory es append-only.")
+
+    def delete(self):
+        raise ValidationError("UserSubscriptionHistory es append-only.")
+
 
 class UserSubscriptionHistory(models.Model):
+    """Ledger append-only de transiciones de suscripción (ver core/ledger.py)."""
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     plan = models.ForeignKey(Plan, on_delete=models.PROTECT)
+    plan_from = models.ForeignKey(
+        Plan, null=True, blank=True, on_delete=models.PROTECT, related_name="+"
+    )
     status_from = models.CharField(max_length=16, choices=SUBS_STATUS, default="none")
     status_to = models.CharField(max_length=16, choices=SUBS_STATUS, default="active")
     valid_from = models.DateTimeField(default=timezone.now)
@@ -118,6 +157,59 @@ class UserSubscriptionHistory(models.Model):
     price_paid = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     notes = models.TextField(blank=True)
 
+    objects = _AppendOnlyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "valid_from"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("UserSubscriptionHistory es append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("UserSubscriptionHistory es append-only.")
+
+
+class SubscriptionMonthlySummary(models.Model):
+    """Resumen mensual por plan, mantenido incrementalmente por el ledger."""
+
+    month = models.DateField()  # primer día del mes (hora local)
+    plan = models.ForeignKey(Plan, on_delete=models.PROTECT)
+    activations = models.PositiveIntegerField(default=0)
+    renewals = models.PositiveIntegerField(default=0)
+    upgrades = models.PositiveIntegerField(default=0)
+    downgrades = models.PositiveIntegerField(default=0)
+    past_due = models.PositiveIntegerField(default=0)
+    churned = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["month", "plan"], name="uq_subsummary_month_plan")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.month:%Y-%m} {self.plan_id}"
+
+
+class EntitlementVersion(models.Model):
+    """Contador por usuario que invalida los tokens de entitlement emitidos (core/entitlements.py)."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="entitlement_version",
+    )
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.user_id}@v{self.version}"
+
 
 class UserRutSlot(models.Model):
     user = models.ForeignKey(
@@ -185,6 +277,27 @@ class Form(models.Model):
     submitted_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=16, choices=FORM_STATUS, default="draft")
     error_message = models.TextField(blank=True)
+    # Procesamiento (core/form_processing.py)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    # Carril de prioridad: mayor se atiende antes, sin importar el peso del plan
+    priority = models.SmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Cola del motor: stored listos por next_attempt_at
+            models.Index(fields=["status", "next_attempt_at"], name="form_status_next_idx"),
+            # Retención (core/retention.py): Forms vencidos por fecha de creación
+            models.Index(fields=["created_at"], name="form_created_idx"),
+            # Historial por usuario con keyset (core/form_history.py)
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                include=["type", "status", "sii_rut", "submitted_at", "processed_at"],
+                name="form_user_created_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Form({self.type}) by {self.user_id} [{self.status}]"
@@ -196,11 +309,24 @@ class Form(models.Model):
             .select_related()
             .get(pk=slot_id, user=self.user)
         )
+        prev_status = self.status
+        first_submit = self.submitted_at is None
         self.status = "stored"
         self.submitted_at = timezone.now()
-        self.save(update_fields=["status", "submitted_at"])
+        if slot.rut:
+            # El RUT del envío es el del slot elegido (la UI no manda sii_rut)
+            self.sii_rut = slot.rut
+        self.save(update_fields=["status", "submitted_at", "sii_rut"])
+        if first_submit:
+            from .rut_summary import submitted
+
+            submitted(self.user_id, self.sii_rut, self.type, self.submitted_at)
+        transaction.on_commit(
+            lambda: metrics.FORM_TRANSITIONS.inc(from_status=prev_status, to_status="stored")
+        )
 
         if slot.state == "available":
+            transaction.on_commit(lambda: metrics.SLOT_LOCKS.inc(result="locked"))
             slot.lock(self)
             slot.save(update_fields=["state", "locked_at", "locked_by_form"])
             AuditLog.log(
@@ -211,11 +337,27 @@ class Form(models.Model):
                 {"rut": slot.rut},
             )
         else:
+            transaction.on_commit(lambda: metrics.SLOT_LOCKS.inc(result="skipped"))
             AuditLog.log(
                 self.user_id, "form_submitted", "form", str(self.pk), {"slot_id": slot.pk}
             )
 
 
+class FormTransition(models.Model):
+    """Historial de estados de un Form con la duración de cada etapa (ms)."""
+
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name="transitions")
+    from_status = models.CharField(max_length=16, choices=FORM_STATUS)
+    to_status = models.CharField(max_length=16, choices=FORM_STATUS)
+    attempt = models.PositiveSmallIntegerField(default=0)
+    timings = models.JSONField(default=dict, blank=True)
+    message = models.TextField(blank=True)
+    at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["form", "at"], name="form_transition_form_at_idx")]
+
+
 class FileUpload(models.Model):
     form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name="file_uploads")
     file_kind = models.CharField(max_length=32)  # compras_33|compras_46|ventas_33|ventas_36
@@ -223,12 +365,108 @@ class FileUpload(models.Model):
     original_filename = models.TextField()
     content_hash = models.CharField(max_length=128, blank=True)
     rows_count = models.PositiveIntegerField(null=True, blank=True)
+    # Hash de cada fila (int64 LE, orden de archivo) para el reproceso incremental
+    row_hashes = models.BinaryField(null=True, blank=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 
+class UploadSession(models.Model):
+    """Subida por partes de un CSV (core/uploads.py). ``received`` es el offset confirmado
+    desde el que se reanuda; ``chain_sha256`` el hash encadenado de las partes recibidas."""
+
+    STATUS = (("open", "Open"), ("complete", "Complete"), ("aborted", "Aborted"))
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name="upload_sessions")
+    file_kind = models.CharField(max_length=32)
+    filename = models.TextField()
+    size = models.BigIntegerField()  # bytes declarados al crear la sesión
+    received = models.BigIntegerField(default=0)
+    chunks = models.PositiveIntegerField(default=0)
+    chain_sha256 = models.CharField(max_length=64)
+    status = models.CharField(max_length=16, choices=STATUS, default="open")
+    file_upload = models.OneToOneField(FileUpload, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+
 class FormPayload(models.Model):
     form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name="form_payloads")
-    payload_json = models.JSONField()
+    payload_json = models.JSONField()  # resumen (filas y totales por archivo)
+    # Filas parseadas en formato columnar (core/columnar.py): en la fila o en un archivo
+    columns_blob = models.BinaryField(null=True, blank=True)
+    columns_uri = models.TextField(blank=True)
+    columns_size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def columns(self):
+        """``ColumnarPayload`` perezoso; ``None`` si el payload no tiene filas guardadas."""
+        from .columnar import ColumnarPayload
+
+        if self.columns_blob is not None:
+            return ColumnarPayload(self.columns_blob)
+        if self.columns_uri:
+            import mmap
+            from pathlib import Path
+
+            path = Path(self.columns_uri)
+            if not path.is_absolute():
+                path = Path(settings.MEDIA_ROOT) / path
+            with open(path, "rb") as fh:
+                return ColumnarPayload(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+        return None
+
+
+class FormAggregate(models.Model):
+    """Totales de un archivo por RUT de contraparte, tipo de documento y período
+    (core/aggregation.py). Se reescriben completos cada vez que el Form se procesa."""
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name="aggregates")
+    file_kind = models.CharField(max_length=20)
+    counterparty_rut = models.CharField(max_length=20)
+    doc_type = models.IntegerField()
+    period = models.CharField(max_length=7)  # aaaa-mm
+    rows = models.PositiveIntegerField()
+    exento = models.BigIntegerField(default=0)
+    neto = models.BigIntegerField(default=0)
+    iva = models.BigIntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["form", "file_kind"], name="formagg_form_kind_idx")]
+
+
+class RutFormSummary(models.Model):
+    """Forms enviados por usuario y RUT (core/rut_summary.py), mantenido en la misma
+    transacción que cada cambio de estado. Los totales son ``Monto Total`` de los ``done``."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="rut_summaries")
+    rut = models.CharField(max_length=16)
+    submitted = models.IntegerField(default=0)
+    compras = models.IntegerField(default=0)
+    ventas = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    error = models.IntegerField(default=0)
+    compras_total = models.BigIntegerField(default=0)
+    ventas_total = models.BigIntegerField(default=0)
+    last_submitted_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "rut"], name="uq_rutsummary_user_rut")]
+
+    def __str__(self) -> str:
+        return f"{self.user_id}:{self.rut}"
+
+
+class FileDeletion(models.Model):
+    """Archivo de un Form ya borrado pendiente de eliminar del almacenamiento
+    (core/retention.py). Se crea en la misma transacción que borra las filas."""
+
+    uri = models.TextField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
 
@@ -242,6 +480,13 @@ class AuditLog(models.Model):
     metadata = models.JSONField(default=dict)
     at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Exportación por rango de fechas en orden (at, id) sin ordenar en memoria (core/exports.py)
+            models.Index(fields=["at", "id"], name="audit_at_idx"),
+            models.Index(fields=["action", "at"], name="audit_action_at_idx"),
+        ]
+
     @classmethod
     def log(
         cls, user_id: Optional[int], action: str, entity: str, entity_id: str, metadata: dict
@@ -251,6 +496,29 @@ class AuditLog(models.Model):
         )
 
 
+class SlowQuery(models.Model):
+    """Ocurrencia de una consulta sobre el umbral ``SLOW_QUERY_MS`` (ver core/slowqueries.py)."""
+
+    fingerprint = models.CharField(max_length=32)
+    normalized_sql = models.TextField()
+    sql = models.TextField()
+    params = models.JSONField(default=list)
+    duration_ms = models.FloatField()
+    call_site = models.CharField(max_length=255, blank=True)
+    vendor = models.CharField(max_length=32, blank=True)
+    explain = models.JSONField(null=True, blank=True)
+    at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["fingerprint", "at"]),
+            models.Index(fields=["at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.fingerprint} {self.duration_ms:.1f}ms"
+
+
 # -----------------------------
 # Señales: sincronizar slots al cambiar de plan
 # -----------------------------
@@ -263,59 +531,112 @@ class _SlotsSyncResult:
     created: int = 0
     removed: int = 0
     unlocked: int = 0
+    moved: int = 0
 
 
 def _sync_slots_for_quota(user_id: int, new_quota: int) -> _SlotsSyncResult:
-    """Ajusta slots al cupo:
+    """Ajusta slots al cupo aplicando solo la diferencia, con operaciones bulk:
       - UPGRADE: desbloquea todos los slots existentes y crea los faltantes.
-      - DOWNGRADE: elimina los slots sobrantes y DESBLOQUEA los que permanecen (1..new_quota).
+      - DOWNGRADE: mueve los RUTs de los slots sobrantes a slots vacíos que permanecen,
+        elimina los sobrantes y DESBLOQUEA los que quedan (1..new_quota).
+    Cupo igual al actual: no hace nada.
     """
     res = _SlotsSyncResult()
-    with transaction.atomic():
+    with metrics.SLOT_SYNC_SECONDS.time(), transaction.atomic():
         slots = list(
             UserRutSlot.objects.select_for_update()
             .filter(user_id=user_id)
             .order_by("slot_index")
         )
-        current = len(slots)
-
-        # UPGRADE → desbloquear todos + crear faltantes
-        if new_quota > current:
-            for s in slots:
-                if s.state == "locked":
-                    s.set_available()
-                    s.save(update_fields=["state", "locked_at", "locked_by_form"])
-                    res.unlocked += 1
-            for idx in range(current + 1, new_quota + 1):
-                UserRutSlot.objects.create(user_id=user_id, slot_index=idx, state="empty")
-                res.created += 1
-
-        # DOWNGRADE → borrar excedentes + desbloquear los que quedan
-        elif new_quota < current:
-            to_delete = [s for s in slots if s.slot_index > new_quota]
-            UserRutSlot.objects.filter(pk__in=[s.pk for s in to_delete]).delete()
-            res.removed = len(to_delete)
-
-            remaining = (
-                UserRutSlot.objects.select_for_update()
-                .filter(user_id=user_id, slot_index__lte=new_quota)
-                .order_by("slot_index")
+        if new_quota == len(slots):
+            return res
+
+        keep = [s for s in slots if s.slot_index <= new_quota]
+        extra = [s for s in slots if s.slot_index > new_quota]
+        now = timezone.now()
+
+        # DOWNGRADE → conservar RUTs en slots vacíos + borrar excedentes (un DELETE)
+        moved = []
+        if extra:
+            empties = [s for s in keep if not s.rut]
+            for src, dst in zip([s for s in extra if s.rut], empties):
+                dst.rut, dst.state, dst.updated_at = src.rut, "available", now
+                moved.append(dst)
+            UserRutSlot.objects.filter(pk__in=[s.pk for s in extra]).delete()
+            res.removed = len(extra)
+        if moved:
+            UserRutSlot.objects.bulk_update(moved, ["rut", "state", "updated_at"])
+            res.moved = len(moved)
+
+        # Desbloquear los que quedan (un UPDATE); se audita igual que el pre_save por slot
+        locked = [s for s in keep if s.state == "locked"]
+        if locked:
+            res.unlocked = UserRutSlot.objects.filter(pk__in=[s.pk for s in locked]).update(
+                state="available", locked_at=None, locked_by_form=None, updated_at=now
             )
-            for s in remaining:
-                if s.state == "locked":
-                    s.set_available()
-                    s.save(update_fields=["state", "locked_at", "locked_by_form"])
-                    res.unlocked += 1
+            AuditLog.objects.bulk_create(
+                [
+                    AuditLog(
+                        user_id=user_id,
+                        action="rut_slot_state_changed",
+                        entity="user_rut_slot",
+                        entity_id=str(s.pk),
+                        metadata={"from": "locked", "to": "available", "rut": s.rut},
+                    )
+                    for s in locked
+                ]
+            )
+
+        # UPGRADE → crear faltantes (un INSERT)
+        existing = {s.slot_index for s in keep}
+        missing = [
+            UserRutSlot(user_id=user_id, slot_index=idx, state="empty")
+            for idx in range(1, new_quota + 1)
+            if idx not in existing
+        ]
+        if missing:
+            UserRutSlot.objects.bulk_create(missing)
+            res.created = len(missing)
+
+        def _count():
+            for change in ("created", "removed", "unlocked", "moved"):
+                if getattr(res, change):
+                    metrics.SLOT_SYNC.inc(getattr(res, change), change=change)
+
+        transaction.on_commit(_count)
 
     return res
 
 
+def freeze_slots(user_ids: list[int]) -> int:
+    """Congela (bulk) los slots con RUT de usuarios sin suscripción vigente.
+    Un slot congelado queda ``locked`` sin ``locked_by_form``; así se distingue del
+    bloqueo por primer uso y se revierte con ``thaw_slots`` al reactivar."""
+    if not user_ids:
+        return 0
+    return UserRutSlot.objects.filter(user_id__in=user_ids, state="available").update(
+        state="locked", locked_at=timezone.now(), locked_by_form=None, updated_at=timezone.now()
+    )
+
+
+def thaw_slots(user_id: int) -> int:
+    return (
+        UserRutSlot.objects.filter(
+            user_id=user_id, state="locked", locked_by_form__isnull=True, locked_at__isnull=False
+        )
+        .exclude(rut="")
+        .update(state="available", locked_at=None, updated_at=timezone.now())
+    )
+
+
 @receiver(post_save, sender=UserSubscriptionCurrent)
 def on_subscription_changed(
     sender, instance: UserSubscriptionCurrent, created: bool, **kwargs
 ):
     quota = instance.plan.rut_quota
     result = _sync_slots_for_quota(instance.user_id, quota)
+    if instance.status == "active" and not created:
+        thaw_slots(instance.user_id)
     AuditLog.log(
         instance.user_id,
         action="subscription_sync_slots",
@@ -330,6 +651,8 @@ def on_subscription_changed(
 # -----------------------------
 from django.contrib import admin  # noqa: E402
 
+from .admin_perf import PerformanceAdmin, cached_values_filter, recent_filter  # noqa: E402
+
 
 @admin.register(Plan)
 class PlanAdmin(admin.ModelAdmin):
@@ -341,6 +664,7 @@ class PlanAdmin(admin.ModelAdmin):
 @admin.register(UserSubscriptionCurrent)
 class USCAdmin(admin.ModelAdmin):
     list_display = ("user", "plan", "status", "activated_at", "expires_at")
+    list_select_related = ("user", "plan")
     list_filter = ("status", "plan")
     search_fields = ("user__email",)
 
@@ -348,36 +672,113 @@ class USCAdmin(admin.ModelAdmin):
 @admin.register(UserSubscriptionHistory)
 class USHAdmin(admin.ModelAdmin):
     list_display = ("user", "plan", "status_from", "status_to", "valid_from", "valid_to")
+    list_select_related = ("user", "plan")
     list_filter = ("status_from", "status_to", "plan")
     search_fields = ("user__email",)
 
+    # Append-only: solo lectura desde el admin
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SubscriptionMonthlySummary)
+class SubscriptionSummaryAdmin(admin.ModelAdmin):
+    list_display = ("month", "plan", "activations", "renewals", "upgrades", "downgrades", "past_due", "churned", "revenue")
+    list_filter = ("plan",)
+
 
 @admin.register(UserRutSlot)
-class SlotAdmin(admin.ModelAdmin):
+class SlotAdmin(PerformanceAdmin):
     list_display = ("user", "slot_index", "rut", "state", "locked_at")
     list_filter = ("state",)
+    list_select_related = ("user",)
     search_fields = ("user__email", "rut")
+    ordering = ("-id",)
+    raw_id_fields = ("user", "locked_by_form")
 
 
 @admin.register(Form)
-class FormAdmin(admin.ModelAdmin):
-    list_display = ("id", "user", "type", "status", "created_at", "submitted_at")
-    list_filter = ("type", "status")
+class FormAdmin(PerformanceAdmin):
+    list_display = ("id", "user", "type", "status", "priority", "attempts", "created_at", "submitted_at", "processed_at")
+    list_filter = (recent_filter("created_at"), "type", "status", cached_values_filter("priority"))
+    list_select_related = ("user",)
     search_fields = ("user__email", "sii_rut")
+    ordering = ("-created_at", "-id")
+    raw_id_fields = ("user",)
+
+
+@admin.register(FormTransition)
+class FormTransitionAdmin(admin.ModelAdmin):
+    list_display = ("at", "form", "from_status", "to_status", "attempt")
+    list_filter = ("to_status",)
+    readonly_fields = ("timings",)
 
 
 @admin.register(FileUpload)
 class FUAdmin(admin.ModelAdmin):
     list_display = ("form", "file_kind", "uploaded_at")
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("row_hashes")
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "form", "file_kind", "status", "received", "size", "updated_at")
+    list_filter = ("status", "file_kind")
+    search_fields = ("user__email", "filename")
+    raw_id_fields = ("form", "file_upload")
+
 
 @admin.register(FormPayload)
 class FPAdmin(admin.ModelAdmin):
-    list_display = ("form", "created_at")
+    list_display = ("form", "columns_size", "created_at")
+    exclude = ("columns_blob",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("columns_blob")
+
+
+@admin.register(FormAggregate)
+class FormAggregateAdmin(admin.ModelAdmin):
+    list_display = ("form", "file_kind", "counterparty_rut", "doc_type", "period", "rows", "total")
+    list_filter = ("file_kind", "doc_type")
+    search_fields = ("counterparty_rut",)
+    raw_id_fields = ("form",)
+
+
+@admin.register(RutFormSummary)
+class RutFormSummaryAdmin(admin.ModelAdmin):
+    list_display = ("user", "rut", "submitted", "compras", "ventas", "done", "error", "last_submitted_at")
+    search_fields = ("user__email", "rut")
+    raw_id_fields = ("user",)
+
+
+@admin.register(FileDeletion)
+class FileDeletionAdmin(admin.ModelAdmin):
+    list_display = ("id", "uri", "attempts", "created_at")
+    search_fields = ("uri",)
 
 
 @admin.register(AuditLog)
-class AuditAdmin(admin.ModelAdmin):
+class AuditAdmin(PerformanceAdmin):
     list_display = ("at", "user", "action", "entity", "entity_id")
-    list_filter = ("action",)
-    search_fields = ("user__email", "entity", "entity_id")
+    list_filter = (recent_filter("at"), cached_values_filter("action"))
+    list_select_related = ("user",)
+    search_fields = ("user__email", "entity_id")
+    ordering = ("-at", "-id")
+    raw_id_fields = ("user",)
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("at", "fingerprint", "duration_ms", "call_site", "vendor")
+    list_filter = ("vendor",)
+    search_fields = ("fingerprint", "call_site")
+    readonly_fields = ("explain",)
@@ -0,0 +1,103 @@
+# core/mp_async.py
+"""Cliente async de la API REST de Mercado Pago para las vistas ASGI (core/views_async.py).
+
+Usa ``httpx.AsyncClient`` con un pool de conexiones por event loop. Las respuestas tienen
+la misma forma que las del SDK oficial (``{"status": int, "response": dict}``) y se miden
+en las mismas métricas ``MP_CALLS`` / ``MP_CALL_SECONDS``. Sin httpx instalado, delega en
+el SDK síncrono desde un hilo (sin bloquear el loop, pero con un hilo por llamada).
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .metrics import MP_CALL_SECONDS, MP_CALLS
+
+try:
+    import httpx  # type: ignore
+except Exception:  # pragma: no cover
+    httpx = None
+
+API_BASE = "https://api.mercadopago.com"
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+def _http_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        timeout = float(getattr(settings, "MP_HTTP_TIMEOUT", 10))
+        client = _clients[loop] = httpx.AsyncClient(base_url=API_BASE, timeout=timeout)
+    return client
+
+
+class AsyncMP:
+    def __init__(self, token: str):
+        self._headers = {"Authorization": f"Bearer {token}"}
+
+    async def _call(self, resource: str, method: str, verb: str, path: str, body=None) -> dict:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            r = await _http_client().request(verb, path, json=body, headers=self._headers)
+            status = str(r.status_code)
+            try:
+                data = r.json()
+            except ValueError:
+                data = {}
+            return {"status": r.status_code, "response": data}
+        finally:
+            MP_CALL_SECONDS.observe(time.perf_counter() - start, resource=resource, method=method)
+            MP_CALLS.inc(resource=resource, method=method, status=status)
+
+    async def preapproval_get(self, preapproval_id) -> dict:
+        return await self._call("preapproval", "get", "GET", f"/preapproval/{preapproval_id}")
+
+    async def preapproval_create(self, data: dict) -> dict:
+        return await self._call("preapproval", "create", "POST", "/preapproval", data)
+
+    async def preapproval_update(self, preapproval_id, data: dict) -> dict:
+        return await self._call("preapproval", "update", "PUT", f"/preapproval/{preapproval_id}", data)
+
+    async def payment_get(self, payment_id) -> dict:
+        return await self._call("payment", "get", "GET", f"/v1/payments/{payment_id}")
+
+
+class _ThreadedMP:
+    """Respaldo sin httpx: mismo contrato, SDK síncrono en un hilo del executor."""
+
+    def __init__(self, sdk):
+        self._sdk = sdk
+
+    async def _run(self, fn, *args):
+        return await sync_to_async(fn, thread_sensitive=False)(*args)
+
+    async def preapproval_get(self, preapproval_id) -> dict:
+        return await self._run(self._sdk.preapproval().get, preapproval_id)
+
+    async def preapproval_create(self, data: dict) -> dict:
+        return await self._run(self._sdk.preapproval().create, data)
+
+    async def preapproval_update(self, preapproval_id, data: dict) -> dict:
+        return await self._run(self._sdk.preapproval().update, preapproval_id, data)
+
+    async def payment_get(self, payment_id) -> dict:
+        return await self._run(self._sdk.payment().get, payment_id)
+
+
+def get_async_mp():
+    """``AsyncMP`` (o el respaldo con hilos); ``None`` si MP no está configurado."""
+    token = getattr(settings, "MP_ACCESS_TOKEN", "") or ""
+    if not token:
+        return None
+    if httpx is not None:
+        return AsyncMP(token)
+    from .views import _get_mp_sdk
+
+    sdk = _get_mp_sdk()
+    return _ThreadedMP(sdk) if sdk else None
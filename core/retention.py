@@ -0,0 +1,203 @@
+# core/retention.py
+"""Purga de Forms vencidos (``FORM_RETENTION_DAYS``) por lotes chicos.
+
+Un ``DELETE`` del Form en cascada borra de una vez sus archivos, payloads, agregados y
+transiciones: en cuentas grandes son locks largos y un pico de WAL. Acá cada lote toma
+hasta ``batch_size`` Forms en orden de pk (``FOR UPDATE SKIP LOCKED``, sin los que están
+en proceso), borra explícitamente las filas hijas en bulk y después los Forms, y duerme
+``sleep`` segundos antes del siguiente.
+
+Los Forms que bloquearon un slot por primer uso (``UserRutSlot.locked_by_form``) no se
+purgan: con ``SET_NULL`` el slot quedaría ``locked`` sin Form, que es la marca de slot
+congelado (``freeze_slots``), y la siguiente reactivación liberaría el RUT.
+
+Los archivos (CSV subidos, payloads columnares, ``.part`` de subidas abiertas) no se
+borran dentro de la transacción: sus URIs quedan en ``FileDeletion`` en el mismo commit y
+un pool de hilos los elimina del almacenamiento (``core/storage.py``). Si el proceso se
+corta, las filas borradas no vuelven y los archivos siguen en ``FileDeletion``: la
+siguiente corrida los retoma antes de seguir con los Forms.
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.utils import timezone
+
+from . import metrics, rut_summary, storage
+from .models import (
+    FileDeletion, FileUpload, Form, FormAggregate, FormPayload, FormTransition, UploadSession, UserRutSlot,
+)
+from .uploads import part_path
+
+# Hijos de Form en el orden en que se borran (UploadSession antes que FileUpload)
+CHILDREN = (FormAggregate, FormTransition, UploadSession, FormPayload, FileUpload)
+
+
+@dataclass
+class _PurgeResult:
+    batches: int = 0
+    forms: int = 0
+    rows: dict = field(default_factory=dict)  # modelo → filas borradas (incluye Form)
+    files: int = 0
+    files_failed: int = 0
+    db_bytes: int = 0  # payloads en la fila + hashes por fila
+    file_bytes: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.total_rows / max(time.monotonic() - self.started, 1e-9)
+
+
+def cutoff(days: Optional[int] = None, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Fecha de corte; ``None`` si la retención está desactivada (0 días)."""
+    days = getattr(settings, "FORM_RETENTION_DAYS", 0) if days is None else days
+    return (now or timezone.now()) - timedelta(days=days) if days > 0 else None
+
+
+def expired(before: datetime):
+    return (
+        Form.objects.filter(created_at__lt=before)
+        .exclude(status="validating")
+        .exclude(Exists(UserRutSlot.objects.filter(locked_by_form=OuterRef("pk"))))
+    )
+
+
+def _delete_file(uri: str, cfg: dict) -> int:
+    """Hilo del pool: borra un archivo y devuelve su tamaño (0 si ya no estaba)."""
+    store = storage.for_uri(uri, cfg)
+    try:
+        size = store.size(uri)
+    except FileNotFoundError:
+        return 0
+    store.delete(uri)
+    return size
+
+
+class _Reaper:
+    """Borra del almacenamiento los archivos de ``FileDeletion``. Los hilos solo hacen
+    I/O; las filas se actualizan desde el hilo principal."""
+
+    def __init__(self, res: _PurgeResult, workers: int):
+        self.res = res
+        self.cfg = storage.config()
+        self.pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="retention")
+        self.pending: dict[Future, int] = {}
+        self.cursor = 0
+
+    def submit_new(self, limit: int = 1000) -> None:
+        while True:
+            rows = list(
+                FileDeletion.objects.filter(pk__gt=self.cursor).order_by("pk").values_list("pk", "uri")[:limit]
+            )
+            if not rows:
+                return
+            self.cursor = rows[-1][0]
+            for pk, uri in rows:
+                self.pending[self.pool.submit(_delete_file, uri, self.cfg)] = pk
+            if len(rows) < limit:
+                return
+            self.reap(wait=True)  # muchos pendientes de otra corrida: cola acotada
+
+    def reap(self, wait: bool = False) -> None:
+        done, failed = [], {}
+        for fut in [f for f in self.pending if wait or f.done()]:
+            pk = self.pending.pop(fut)
+            try:
+                size = fut.result()
+            except Exception as e:
+                failed[pk] = str(e)[:500]
+                continue
+            done.append(pk)
+            self.res.file_bytes += size
+            metrics.RETENTION_BYTES.inc(size, kind="files")
+        if done:
+            FileDeletion.objects.filter(pk__in=done).delete()
+        for pk, error in failed.items():  # queda para la próxima corrida
+            FileDeletion.objects.filter(pk=pk).update(attempts=F("attempts") + 1, last_error=error)
+        self.res.files += len(done)
+        self.res.files_failed += len(failed)
+
+    def close(self) -> None:
+        self.reap(wait=True)
+        self.pool.shutdown()
+
+
+def _purge_batch(ids: list[int]) -> tuple[dict, int]:
+    """Borra los Forms ``ids`` y sus hijos (dentro de la transacción del lote). Devuelve
+    filas borradas por modelo y bytes guardados en la base."""
+    uploads = FileUpload.objects.filter(form_id__in=ids)
+    payloads = FormPayload.objects.filter(form_id__in=ids)
+    uris = list(uploads.values_list("storage_uri", flat=True))
+    uris += payloads.exclude(columns_uri="").values_list("columns_uri", flat=True)
+    uris += [
+        str(part_path(UploadSession(pk=sid)))
+        for sid in UploadSession.objects.filter(form_id__in=ids, status="open").values_list("pk", flat=True)
+    ]
+    db_bytes = (payloads.filter(columns_blob__isnull=False).aggregate(n=Sum("columns_size"))["n"] or 0) + 8 * (
+        uploads.filter(row_hashes__isnull=False).aggregate(n=Sum("rows_count"))["n"] or 0
+    )
+    FileDeletion.objects.bulk_create([FileDeletion(uri=u) for u in uris if u])
+    rut_summary.removed(ids)
+
+    rows = {}
+    for model in CHILDREN:
+        rows[model.__name__] = model.objects.filter(form_id__in=ids).delete()[0]
+    rows["Form"] = Form.objects.filter(pk__in=ids).delete()[0]
+    return rows, db_bytes
+
+
+def purge(
+    before: datetime,
+    batch_size: int = 200,
+    sleep: float = 0.0,
+    workers: int = 4,
+    max_batches: int = 0,
+    progress: Optional[Callable[[_PurgeResult], None]] = None,
+) -> _PurgeResult:
+    """Borra los Forms creados antes de ``before``; ``progress`` se llama tras cada lote."""
+    res = _PurgeResult()
+    reaper = _Reaper(res, workers)
+    last_pk = 0
+    try:
+        reaper.submit_new()  # archivos que dejó pendientes una corrida anterior
+        while not max_batches or res.batches < max_batches:
+            with transaction.atomic():
+                ids = list(
+                    expired(before)
+                    .filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .select_for_update(skip_locked=True)
+                    .values_list("pk", flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                last_pk = ids[-1]
+                rows, db_bytes = _purge_batch(ids)
+            res.batches += 1
+            res.forms += rows["Form"]
+            res.db_bytes += db_bytes
+            metrics.RETENTION_BYTES.inc(db_bytes, kind="db")
+            for name, n in rows.items():
+                res.rows[name] = res.rows.get(name, 0) + n
+                metrics.RETENTION_ROWS.inc(n, table=name)
+            reaper.submit_new()
+            reaper.reap()
+            if progress:
+                progress(res)
+            if sleep:
+                time.sleep(sleep)
+    finally:
+        reaper.close()
+    return res
@@ -0,0 +1,128 @@
+# core/rut_summary.py
+"""Resumen de Forms por usuario y RUT (``RutFormSummary``) para ``/account/``.
+
+Se mantiene de forma incremental en la misma transacción que cada cambio de estado:
+envío (``draft → stored``: enviados, por tipo, último envío), cierre del procesamiento
+(``done`` con el ``Monto Total`` del payload, o ``error``) y borrado por retención (se
+restan los Forms borrados). Un UPDATE con ``F()`` por (usuario, RUT) y, si la fila no
+existe, INSERT (como ``core/ledger.py``).
+
+``rebuild`` lo recalcula desde ``Form``/``FormPayload`` para un grupo de usuarios; el
+comando ``rebuild_rut_summary`` reparte todos los usuarios en lotes entre varios hilos.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Count, F, Max, Q, Sum
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from .models import Form, RutFormSummary, normalize_rut
+
+COUNTERS = ("submitted", "compras", "ventas", "done", "error", "compras_total", "ventas_total")
+TOTAL_COLUMN = "Monto Total"
+
+
+def _payload_total():
+    """``Monto Total`` de ``payload_json["totals"]`` del payload del Form (join)."""
+    key = KeyTextTransform(TOTAL_COLUMN, KeyTransform("totals", "form_payloads__payload_json"))
+    return Cast(key, BigIntegerField())
+
+
+def _apply(deltas: dict[tuple[int, str], dict], last: Optional[dict] = None) -> None:
+    """Suma ``deltas`` a las filas (usuario, RUT); ``last`` = último envío por fila."""
+    last = last or {}
+    for key in set(deltas) | set(last):
+        delta = {f: v for f, v in deltas.get(key, {}).items() if v}
+        at = last.get(key)
+        updates = {f: F(f) + v for f, v in delta.items()}
+        if at is not None:
+            updates["last_submitted_at"] = Greatest(Coalesce("last_submitted_at", at), at)
+        if not updates:
+            continue
+        qs = RutFormSummary.objects.filter(user_id=key[0], rut=key[1])
+        if qs.update(**updates):
+            continue
+        try:
+            with transaction.atomic():
+                RutFormSummary.objects.create(user_id=key[0], rut=key[1], last_submitted_at=at, **delta)
+        except IntegrityError:
+            # Otro proceso creó la fila entre el UPDATE y el INSERT
+            qs.update(**updates)
+
+
+def submitted(user_id: int, sii_rut: str, form_type: str, at: datetime) -> None:
+    key = (user_id, normalize_rut(sii_rut))
+    _apply({key: {"submitted": 1, form_type: 1}}, {key: at})
+
+
+def processed(user_id: int, sii_rut: str, form_type: str, status: str, payload: Optional[dict] = None) -> None:
+    """Cierre del procesamiento: ``done`` (con los totales del payload) o ``error``."""
+    delta = {status: 1}
+    if status == "done":
+        delta[f"{form_type}_total"] = int((payload or {}).get("totals", {}).get(TOTAL_COLUMN, 0))
+    _apply({(user_id, normalize_rut(sii_rut)): delta})
+
+
+def removed(form_ids: Iterable[int]) -> None:
+    """Resta los Forms ``form_ids`` (antes de borrarlos: retención)."""
+    deltas: dict[tuple[int, str], dict] = defaultdict(lambda: defaultdict(int))
+    rows = (
+        Form.objects.filter(pk__in=list(form_ids), submitted_at__isnull=False)
+        .annotate(total=_payload_total())
+        .values_list("user_id", "sii_rut", "type", "status", "total")
+    )
+    for user_id, sii_rut, form_type, status, total in rows:
+        d = deltas[(user_id, normalize_rut(sii_rut))]
+        d["submitted"] -= 1
+        d[form_type] -= 1
+        if status in ("done", "error"):
+            d[status] -= 1
+        if status == "done":
+            d[f"{form_type}_total"] -= total or 0
+    _apply(deltas)
+
+
+def rebuild(user_ids: Iterable[int]) -> int:
+    """Recalcula las filas de ``user_ids`` desde ``Form``. Devuelve filas escritas.
+
+    Bloquea primero las filas actuales: un cambio de estado concurrente que aún no hizo
+    commit espera a que termine el rebuild y aplica su delta encima; uno que ya hizo
+    commit está en la lectura."""
+    user_ids = list(user_ids)
+    total = _payload_total()
+    with transaction.atomic():
+        list(RutFormSummary.objects.select_for_update().filter(user_id__in=user_ids).values_list("pk"))
+        rows = (
+            Form.objects.filter(user_id__in=user_ids, submitted_at__isnull=False)
+            .values("user_id", "sii_rut")
+            .annotate(
+                submitted=Count("pk", distinct=True),
+                compras=Count("pk", filter=Q(type="compras"), distinct=True),
+                ventas=Count("pk", filter=Q(type="ventas"), distinct=True),
+                done=Count("pk", filter=Q(status="done"), distinct=True),
+                error=Count("pk", filter=Q(status="error"), distinct=True),
+                compras_total=Coalesce(Sum(total, filter=Q(type="compras", status="done")), 0),
+                ventas_total=Coalesce(Sum(total, filter=Q(type="ventas", status="done")), 0),
+                last_submitted_at=Max("submitted_at"),
+            )
+            .order_by()
+        )
+        # sii_rut sin normalizar puede repetir un RUT: se juntan en Python
+        acc: dict[tuple[int, str], dict] = {}
+        for r in rows:
+            key = (r["user_id"], normalize_rut(r["sii_rut"]))
+            cur = acc.setdefault(key, {f: 0 for f in COUNTERS} | {"last_submitted_at": None})
+            for f in COUNTERS:
+                cur[f] += r[f]
+            if cur["last_submitted_at"] is None or r["last_submitted_at"] > cur["last_submitted_at"]:
+                cur["last_submitted_at"] = r["last_submitted_at"]
+        RutFormSummary.objects.filter(user_id__in=user_ids).delete()
+        RutFormSummary.objects.bulk_create(
+            [RutFormSummary(user_id=u, rut=rut, **vals) for (u, rut), vals in acc.items()], batch_size=1000
+        )
+    return len(acc)
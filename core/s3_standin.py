@@ -0,0 +1,206 @@
+# core/s3_standin.py
+"""Servidor local compatible con S3 (el subconjunto que usa ``core/storage.py``), para
+desarrollo, tests y ``bench_storage`` sin MinIO ni red.
+
+Buckets, PUT/GET (con ``Range``)/HEAD/DELETE de objetos y multipart (crear, subir parte,
+completar, abortar). Verifica la firma SigV4 con las credenciales con que se crea. Los
+objetos quedan como archivos bajo ``root/<bucket>/<clave>``.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import shutil
+import threading
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from .storage import COPY_BLOCK, sign_v4
+
+_CRED = re.compile(r"Credential=([^/]+)/\d{8}/([^/]+)/s3/aws4_request, SignedHeaders=([^,]+), Signature=(\w+)")
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "S3StandIn"
+
+    def log_message(self, *args):  # silencioso: lo usan tests y benchmarks
+        pass
+
+    # -----------------------------
+    # Utilidades
+    # -----------------------------
+    def _reply(self, status: int, body: bytes = b"", headers: Optional[dict] = None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status: int, code: str):
+        self._drain()
+        self._reply(status, f"<Error><Code>{code}</Code></Error>".encode(), {"Content-Type": "application/xml"})
+
+    def _drain(self):
+        """Descarta el cuerpo no leído para poder reusar la conexión."""
+        left, self._unread = self._unread, 0
+        while left > 0:
+            block = self.rfile.read(min(COPY_BLOCK, left))
+            if not block:
+                break
+            left -= len(block)
+
+    def _authorized(self, path: str, query: dict) -> bool:
+        m = _CRED.search(self.headers.get("Authorization", ""))
+        if not m or m.group(1) != self.server.access_key:
+            return False
+        names = m.group(3).split(";")
+        headers = {n: self.headers.get(n, "") for n in names if n not in ("host", "x-amz-date", "x-amz-content-sha256")}
+        expected = sign_v4(
+            self.command, self.headers.get("host", ""), path, query, headers,
+            self.headers.get("x-amz-content-sha256", ""), self.server.access_key, self.server.secret_key,
+            m.group(2), now=_parse_date(self.headers.get("x-amz-date", "")),
+        )
+        return expected["authorization"].endswith(m.group(4))
+
+    def _route(self):
+        self._unread = int(self.headers.get("Content-Length") or 0)
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        if not self._authorized(url.path, query):
+            return self._error(403, "SignatureDoesNotMatch")
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        bucket_dir = self.server.root / bucket
+        if not key:
+            if self.command == "PUT":
+                bucket_dir.mkdir(parents=True, exist_ok=True)
+                return self._reply(200)
+            return self._error(405, "MethodNotAllowed")
+        if not bucket_dir.is_dir():
+            return self._error(404, "NoSuchBucket")
+        getattr(self, f"_{self.command.lower()}")(bucket_dir / key, query)
+
+    do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _route
+
+    # -----------------------------
+    # Operaciones
+    # -----------------------------
+    def _receive(self, dest: Path) -> str:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        left, self._unread = self._unread, 0
+        digest = hashlib.md5()
+        with open(dest, "wb") as fh:
+            while left > 0:
+                block = self.rfile.read(min(COPY_BLOCK, left))
+                if not block:
+                    break
+                fh.write(block)
+                digest.update(block)
+                left -= len(block)
+        return f'"{digest.hexdigest()}"'
+
+    def _put(self, path: Path, query: dict):
+        if "uploadId" in query:
+            parts = self.server.root / ".multipart" / query["uploadId"]
+            if not parts.is_dir():
+                return self._error(404, "NoSuchUpload")
+            etag = self._receive(parts / f"{int(query['partNumber']):05d}")
+        else:
+            etag = self._receive(path)
+        self._reply(200, headers={"ETag": etag})
+
+    def _post(self, path: Path, query: dict):
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            (self.server.root / ".multipart" / upload_id).mkdir(parents=True)
+            body = f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            self._drain()
+            return self._reply(200, body.encode(), {"Content-Type": "application/xml"})
+        parts = self.server.root / ".multipart" / query.get("uploadId", "-")
+        self._drain()
+        if not parts.is_dir():
+            return self._error(404, "NoSuchUpload")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as out:
+            for part in sorted(parts.iterdir()):
+                with open(part, "rb") as fh:
+                    shutil.copyfileobj(fh, out, COPY_BLOCK)
+        shutil.rmtree(parts)
+        self._reply(200, b"<CompleteMultipartUploadResult/>", {"Content-Type": "application/xml"})
+
+    def _delete(self, path: Path, query: dict):
+        if "uploadId" in query:
+            shutil.rmtree(self.server.root / ".multipart" / query["uploadId"], ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+        self._reply(204)
+
+    def _get(self, path: Path, query: dict):
+        if not path.is_file():
+            return self._error(404, "NoSuchKey")
+        size = path.stat().st_size
+        start, end, status = 0, size - 1, 200
+        m = _RANGE.fullmatch(self.headers.get("Range", ""))
+        if m:
+            if m.group(1):
+                start, end = int(m.group(1)), min(int(m.group(2) or size - 1), size - 1)
+            else:  # sufijo: los últimos N bytes
+                start = max(size - int(m.group(2)), 0)
+            status = 206
+        length = max(end - start + 1, 0)
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        with open(path, "rb") as fh:
+            fh.seek(start)
+            while length > 0:
+                block = fh.read(min(COPY_BLOCK, length))
+                if not block:
+                    break
+                self.wfile.write(block)
+                length -= len(block)
+
+    _head = _get
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+class S3StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root, host: str = "127.0.0.1", port: int = 0,
+                 access_key: str = "standin", secret_key: str = "standin-secret"):
+        super().__init__((host, port), _Handler)
+        self.root = Path(root)
+        self.access_key = access_key
+        self.secret_key = secret_key
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "S3StandIn":
+        """Sirve en un hilo de fondo (tests, benchmarks)."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -1,7 +1,11 @@
 # core/signals.py
-from django.db.models.signals import post_save, pre_save
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import UserRutSlot, Form, AuditLog
+from . import entitlements, ledger, live, user_status
+from .models import UserRutSlot, UserSubscriptionCurrent, Form, AuditLog
 
 @receiver(pre_save, sender=UserRutSlot)
 def audit_slot_state_change(sender, instance: UserRutSlot, **kwargs):
@@ -29,3 +33,84 @@ def audit_form_saved(sender, instance: Form, created: bool, **kwargs):
         entity_id=str(instance.pk),
         metadata={"status": instance.status, "type": instance.type},
     )
+
+@receiver(post_save, sender=UserSubscriptionCurrent)
+def ledger_subscription_saved(sender, instance: UserSubscriptionCurrent, created: bool, **kwargs):
+    prev = None if created else getattr(instance, "_ledger_state", None)
+    status_from, plan_from = prev or ("none", None)
+    if (status_from, plan_from) != (instance.status, instance.plan_id):
+        activating = instance.status == "active" and status_from != "active"
+        ledger.record(
+            instance.user_id,
+            instance.plan_id,
+            status_from,
+            instance.status,
+            plan_from_id=plan_from,
+            price_paid=instance.plan.price_month if activating else None,
+            valid_to=instance.expires_at,
+            notes=instance.provider,
+        )
+    instance._ledger_state = (instance.status, instance.plan_id)
+
+@receiver(post_delete, sender=UserSubscriptionCurrent)
+def ledger_subscription_deleted(sender, instance: UserSubscriptionCurrent, **kwargs):
+    if instance.status == "canceled":
+        return
+    ledger.record(
+        instance.user_id,
+        instance.plan_id,
+        instance.status,
+        "canceled",
+        plan_from_id=instance.plan_id,
+        notes="deleted",
+    )
+
+
+@receiver(post_save, sender=UserSubscriptionCurrent)
+@receiver(post_delete, sender=UserSubscriptionCurrent)
+def invalidate_user_status(sender, instance: UserSubscriptionCurrent, **kwargs):
+    email = (
+        get_user_model().objects.filter(pk=instance.user_id).values_list("email", flat=True).first()
+    )
+    if email:
+        # Tras el commit: antes, un lector concurrente podría volver a cachear el estado viejo
+        transaction.on_commit(lambda: user_status.invalidate(email))
+
+
+@receiver(post_save, sender=UserSubscriptionCurrent)
+@receiver(post_delete, sender=UserSubscriptionCurrent)
+def bump_entitlement_version(sender, instance: UserSubscriptionCurrent, **kwargs):
+    # Revoca los tokens de entitlement emitidos antes del cambio
+    entitlements.bump_versions([instance.user_id])
+
+
+@receiver(post_save, sender=UserSubscriptionCurrent)
+def publish_subscription_saved(sender, instance: UserSubscriptionCurrent, **kwargs):
+    # SSE de /account/events/: llega al navegador cuando el webhook hace commit
+    live.publish(instance.user_id, live.state_payload(instance))
+
+
+@receiver(post_delete, sender=UserSubscriptionCurrent)
+def publish_subscription_deleted(sender, instance: UserSubscriptionCurrent, **kwargs):
+    live.publish(instance.user_id, live.state_payload(None))
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_previous_email(sender, instance, update_fields=None, **kwargs):
+    instance._previous_email = None
+    if not instance.pk or (update_fields is not None and "email" not in update_fields):
+        return  # p. ej. el login solo guarda last_login
+    instance._previous_email = (
+        sender.objects.filter(pk=instance.pk).values_list("email", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_status_on_user(sender, instance, **kwargs):
+    # Usuario nuevo o email cambiado: evita servir un "has_user": false cacheado, y que el
+    # email anterior siga respondiendo con el estado de este usuario
+    emails = [instance.email]
+    previous = getattr(instance, "_previous_email", None)
+    if previous and previous != instance.email:
+        emails.append(previous)
+    transaction.on_commit(lambda: user_status.invalidate(*emails))
@@ -0,0 +1,195 @@
+# core/slowqueries.py
+"""Registro de consultas lentas.
+
+Se instala como ``execute_wrapper`` en cada conexión nueva (ver ``CoreConfig.ready``)
+y registra toda sentencia que supere ``SLOW_QUERY_MS`` junto a su huella normalizada,
+el punto de llamada y los parámetros. En PostgreSQL además guarda el
+``EXPLAIN (FORMAT JSON)`` de las primeras ``SLOW_QUERY_EXPLAIN_LIMIT`` ocurrencias
+de cada huella.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+# Huellas que ya alcanzaron el cupo de EXPLAIN en este proceso (evita volver a contar en BD)
+_explain_done: set[str] = set()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|\$\d+|\?")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_RE = re.compile(r"\bVALUES\s*\(.*\)", re.IGNORECASE | re.DOTALL)
+_SPACES_RE = re.compile(r"\s+")
+
+_SKIP_PATHS = (
+    os.sep + "django" + os.sep,
+    "site-packages",
+    "dist-packages",
+    os.sep + "asgiref" + os.sep,
+)
+_MAX_PARAM_LEN = 200
+
+
+def normalize_sql(sql: str) -> str:
+    """Reduce una sentencia a su forma canónica: literales y placeholders → ``?``,
+    listas ``IN (...)`` y ``VALUES`` colapsadas, espacios compactados."""
+    s = _STRING_RE.sub("?", sql)
+    s = _PLACEHOLDER_RE.sub("?", s)
+    s = _NUMBER_RE.sub("?", s)
+    s = _IN_LIST_RE.sub("IN (...)", s)
+    s = _VALUES_RE.sub("VALUES (...)", s)
+    return _SPACES_RE.sub(" ", s).strip()
+
+
+def fingerprint(sql: str) -> tuple[str, str]:
+    """Retorna (huella, sql_normalizado)."""
+    normalized = normalize_sql(sql)
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+    return digest, normalized
+
+
+def _call_site() -> str:
+    """Primer frame del stack que pertenece al proyecto (no a Django ni a este módulo)."""
+    here = os.path.abspath(__file__)
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = os.path.abspath(frame.filename)
+        if filename == here or any(p in filename for p in _SKIP_PATHS):
+            continue
+        rel = os.path.relpath(filename, settings.BASE_DIR)
+        return f"{rel}:{frame.lineno} in {frame.name}"[:255]
+    return ""
+
+
+def _safe_params(params, many: bool) -> list:
+    if params is None:
+        return []
+    if many:
+        # executemany: basta con la primera fila como muestra
+        params = next(iter(params), [])
+    if isinstance(params, dict):
+        params = list(params.values())
+    out = []
+    for p in params:
+        try:
+            json.dumps(p)
+            out.append(p if not isinstance(p, str) else p[:_MAX_PARAM_LEN])
+        except (TypeError, ValueError):
+            out.append(repr(p)[:_MAX_PARAM_LEN])
+    return out
+
+
+def _threshold_ms() -> float:
+    return float(getattr(settings, "SLOW_QUERY_MS", 0) or 0)
+
+
+def _should_explain(fp: str, sql: str, vendor: str) -> bool:
+    if vendor != "postgresql":
+        return False
+    if fp in _explain_done:
+        return False
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    if head not in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"):
+        return False
+    limit = int(getattr(settings, "SLOW_QUERY_EXPLAIN_LIMIT", 3) or 0)
+    if limit <= 0:
+        return False
+
+    from .models import SlowQuery
+
+    done = SlowQuery.objects.filter(fingerprint=fp, explain__isnull=False).count()
+    if done >= limit:
+        _explain_done.add(fp)
+        return False
+    return True
+
+
+def _explain(connection, sql: str, params) -> Optional[object]:
+    # Sin ANALYZE: el plan se obtiene sin volver a ejecutar la sentencia.
+    with connection.cursor() as cur:
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        row = cur.fetchone()
+    plan = row[0] if row else None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan
+
+
+def _record(connection, sql: str, params, many: bool, duration_ms: float) -> None:
+    fp, normalized = fingerprint(sql)
+    site = _call_site()
+    safe_params = _safe_params(params, many)
+    log.warning(
+        "slow query %.1fms fp=%s at %s: %s params=%r",
+        duration_ms, fp, site or "?", normalized[:500], safe_params,
+    )
+    if not getattr(settings, "SLOW_QUERY_PERSIST", True):
+        return
+    if connection.needs_rollback:
+        return  # transacción ya marcada para rollback; no ensuciarla más
+
+    from .models import SlowQuery
+
+    try:
+        # Savepoint: si EXPLAIN o el INSERT fallan no abortan la transacción del llamador
+        with transaction.atomic(using=connection.alias):
+            plan = None
+            if not many and _should_explain(fp, sql, connection.vendor):
+                plan = _explain(connection, sql, params)
+            SlowQuery.objects.using(connection.alias).create(
+                fingerprint=fp,
+                normalized_sql=normalized,
+                sql=sql,
+                params=safe_params,
+                duration_ms=round(duration_ms, 3),
+                call_site=site,
+                vendor=connection.vendor,
+                explain=plan,
+            )
+    except Exception as e:
+        log.debug("slow query persist failed fp=%s: %s", fp, e)
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    # Reentrante: las consultas propias (EXPLAIN/INSERT) y un wrapper duplicado pasan directo
+    if getattr(_local, "active", False):
+        return execute(sql, params, many, context)
+    threshold = _threshold_ms()
+    _local.active = True
+    try:
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - start) * 1000.0
+        if threshold and duration_ms >= threshold:
+            try:
+                _record(context["connection"], sql, params, many, duration_ms)
+            except Exception as e:  # nunca romper la consulta original
+                log.debug("slow query hook failed: %s", e)
+        return result
+    finally:
+        _local.active = False
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+def install() -> None:
+    if not _threshold_ms():
+        return
+    connection_created.connect(_on_connection_created, dispatch_uid="core.slowqueries")
@@ -0,0 +1,393 @@
+# core/storage.py
+"""Almacenamiento de los archivos subidos, elegido por esquema de URI.
+
+- Sin esquema o ``file://``: ``LocalStorage``, un directorio (``MEDIA_ROOT`` por defecto)
+  con fan-out: ``uploads/x.csv`` queda en ``uploads/ab/cd/x.csv`` con ``ab/cd`` sacado del
+  hash del nombre, para que ningún directorio junte cientos de miles de archivos. Cada
+  escritura va a un temporal en el mismo directorio, ``fsync`` según ``STORAGE_FSYNC`` y
+  ``os.replace``: un lector ve el archivo completo o no lo ve.
+- ``s3://bucket/prefijo``: ``S3Storage``, S3 o compatible (MinIO, ``core/s3_standin.py``)
+  con direcciones estilo path y firma SigV4, solo con la librería estándar. Los archivos se
+  suben en streaming por multipart (partes de ``STORAGE_S3_PART_MB``) y se leen por rangos.
+
+Las URIs de objetos locales siguen siendo rutas relativas a ``MEDIA_ROOT`` (como las de
+antes); las de S3 son ``s3://bucket/clave``. ``config()`` es un dict picklable para que el
+proceso hijo del pool abra archivos sin settings configurados.
+"""
+from __future__ import annotations
+
+import contextlib
+import errno
+import hashlib
+import hmac
+import http.client
+import os
+import shutil
+import tempfile
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+from urllib.parse import quote, urlsplit
+
+COPY_BLOCK = 1024 * 1024
+FSYNC_POLICIES = ("always", "data", "never")  # archivo + directorio | solo archivo | nada
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class StorageError(OSError):
+    """Falla del almacenamiento (red, respuesta inesperada): transitoria para quien lee."""
+
+
+def scheme_of(uri: str) -> str:
+    return uri.split("://", 1)[0] if "://" in uri else "file"
+
+
+def is_remote(uri: str) -> bool:
+    return scheme_of(uri) != "file"
+
+
+def config() -> dict:
+    from django.conf import settings
+
+    return {
+        "root": str(settings.MEDIA_ROOT),
+        "uploads_uri": getattr(settings, "STORAGE_UPLOADS_URI", "file://"),
+        "fsync": getattr(settings, "STORAGE_FSYNC", "always"),
+        "fanout": getattr(settings, "STORAGE_FANOUT", 2),
+        "s3": {
+            "endpoint": getattr(settings, "STORAGE_S3_ENDPOINT", ""),
+            "region": getattr(settings, "STORAGE_S3_REGION", "us-east-1"),
+            "access_key": getattr(settings, "STORAGE_S3_ACCESS_KEY", ""),
+            "secret_key": getattr(settings, "STORAGE_S3_SECRET_KEY", ""),
+            "part_size": getattr(settings, "STORAGE_S3_PART_MB", 8) * 1024 * 1024,
+        },
+    }
+
+
+def backend(base_uri: str, cfg: Optional[dict] = None) -> Union["LocalStorage", "S3Storage"]:
+    """Backend para ``base_uri`` (``file://``, ``file:///ruta``, ``s3://bucket/prefijo``)."""
+    cfg = cfg or config()
+    scheme = scheme_of(base_uri)
+    if scheme == "file":
+        path = base_uri[len("file://"):] if base_uri.startswith("file://") else base_uri
+        return LocalStorage(Path(cfg["root"]) / path, media_root=cfg["root"], fsync=cfg["fsync"], fanout=cfg["fanout"])
+    if scheme == "s3":
+        parts = urlsplit(base_uri)
+        return S3Storage(parts.netloc, prefix=parts.path.strip("/"), **cfg["s3"])
+    raise ValueError(f"esquema de almacenamiento desconocido: {scheme}")
+
+
+def uploads(cfg: Optional[dict] = None):
+    """Backend donde van los CSV subidos (``STORAGE_UPLOADS_URI``)."""
+    cfg = cfg or config()
+    return backend(cfg["uploads_uri"], cfg)
+
+
+def for_uri(uri: str, cfg: Optional[dict] = None):
+    """Backend capaz de leer el objeto ``uri`` (una URI devuelta por ``put_*``)."""
+    cfg = cfg or config()
+    if scheme_of(uri) == "s3":
+        return backend(f"s3://{urlsplit(uri).netloc}", cfg)
+    return backend("file://", cfg)
+
+
+# -----------------------------
+# Local
+# -----------------------------
+def fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: Path, data: Union[bytes, BinaryIO], fsync: str = "always") -> int:
+    """Escribe ``data`` (bytes o stream) en ``path`` vía temporal + ``os.replace``."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(tmp, "wb") as fh:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                fh.write(data)
+            else:
+                shutil.copyfileobj(data, fh, COPY_BLOCK)
+            size = fh.tell()
+            if fsync != "never":
+                fh.flush()
+                os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if fsync == "always":
+        fsync_dir(path.parent)
+    return size
+
+
+class LocalStorage:
+    def __init__(self, root: Union[str, Path], media_root: Union[str, Path, None] = None,
+                 fsync: str = "always", fanout: int = 2):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"STORAGE_FSYNC debe ser uno de {FSYNC_POLICIES}")
+        self.root = Path(root)
+        self.media_root = Path(media_root) if media_root is not None else self.root
+        self.fsync = fsync
+        self.fanout = fanout
+
+    def _rel(self, name: str) -> Path:
+        """``dir/nombre`` → ``dir/ab/cd/nombre`` (``fanout`` niveles de 2 hex del hash)."""
+        name = Path(name)
+        h = hashlib.blake2b(name.name.encode(), digest_size=8).hexdigest()
+        return name.parent.joinpath(*(h[2 * i : 2 * i + 2] for i in range(self.fanout)), name.name)
+
+    def uri_for(self, name: str) -> str:
+        path = self.root / self._rel(name)
+        try:
+            return str(path.relative_to(self.media_root))
+        except ValueError:
+            return str(path)
+
+    def path(self, uri: str) -> Path:
+        if uri.startswith("file://"):
+            uri = uri[len("file://"):]
+        path = Path(uri)
+        return path if path.is_absolute() else self.media_root / path
+
+    def put_stream(self, name: str, stream: BinaryIO) -> str:
+        uri = self.uri_for(name)
+        atomic_write(self.path(uri), stream, self.fsync)
+        return uri
+
+    def put_file(self, name: str, src: Union[str, Path], move: bool = False) -> str:
+        """Copia ``src``; con ``move`` lo renombra (atómico si está en el mismo disco)."""
+        uri = self.uri_for(name)
+        dest = self.path(uri)
+        if move:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if self.fsync != "never":
+                    with open(src, "rb") as fh:
+                        os.fsync(fh.fileno())
+                os.replace(src, dest)
+            except OSError as e:
+                if e.errno != errno.EXDEV:  # otro filesystem: se copia
+                    raise
+            else:
+                if self.fsync == "always":
+                    fsync_dir(dest.parent)
+                return uri
+        with open(src, "rb") as fh:
+            atomic_write(dest, fh, self.fsync)
+        if move:
+            os.unlink(src)
+        return uri
+
+    def open(self, uri: str) -> BinaryIO:
+        return open(self.path(uri), "rb")
+
+    def read_range(self, uri: str, start: int, length: int) -> bytes:
+        with open(self.path(uri), "rb") as fh:
+            fh.seek(start)
+            return fh.read(length)
+
+    def size(self, uri: str) -> int:
+        return self.path(uri).stat().st_size
+
+    def delete(self, uri: str) -> None:
+        self.path(uri).unlink(missing_ok=True)
+
+    @contextlib.contextmanager
+    def local_copy(self, uri: str) -> Iterator[Path]:
+        yield self.path(uri)
+
+
+# -----------------------------
+# S3 (y compatibles)
+# -----------------------------
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+def sign_v4(method: str, host: str, path: str, query: dict, headers: dict, payload_sha256: str,
+            access_key: str, secret_key: str, region: str, now: Optional[datetime] = None) -> dict:
+    """Headers firmados (AWS Signature V4, servicio ``s3``). ``path`` ya va codificado."""
+    amz_date = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    signed = {k.lower(): str(v).strip() for k, v in headers.items()}
+    signed.update({"host": host, "x-amz-date": amz_date, "x-amz-content-sha256": payload_sha256})
+    names = sorted(signed)
+    canonical = "\n".join([
+        method,
+        path,
+        "&".join(f"{quote(k, safe='-_.~')}={quote(str(v), safe='-_.~')}" for k, v in sorted(query.items())),
+        "".join(f"{n}:{signed[n]}\n" for n in names),
+        ";".join(names),
+        payload_sha256,
+    ])
+    scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+    to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+    key = ("AWS4" + secret_key).encode()
+    for part in (amz_date[:8], region, "s3", "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    return signed
+
+
+def _xml_text(body: bytes, tag: str) -> str:
+    for el in ET.fromstring(body).iter():
+        if el.tag.rsplit("}", 1)[-1] == tag:
+            return el.text or ""
+    raise StorageError(f"respuesta S3 sin {tag}")
+
+
+class S3Storage:
+    """Cliente mínimo de S3 (estilo path). No es thread-safe: una instancia por hilo."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint: str = "", region: str = "us-east-1",
+                 access_key: str = "", secret_key: str = "", part_size: int = 8 * 1024 * 1024):
+        if not bucket:
+            raise ValueError("s3:// requiere un bucket")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.part_size = max(part_size, 5 * 1024 * 1024)  # mínimo de S3 salvo la última parte
+        url = urlsplit(endpoint or f"https://s3.{region}.amazonaws.com")
+        self.secure = url.scheme == "https"
+        self.host = url.netloc
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        return cls(self.host, timeout=60)
+
+    def _key(self, uri: str) -> str:
+        parts = urlsplit(uri)
+        if parts.scheme != "s3" or parts.netloc != self.bucket:
+            raise ValueError(f"{uri} no es de s3://{self.bucket}")
+        return parts.path.lstrip("/")
+
+    def _send(self, conn, method: str, key: str, query=None, body: bytes = b"", headers=None):
+        query = query or {}
+        path = quote(f"/{self.bucket}/{key}" if key else f"/{self.bucket}", safe="/-_.~")
+        signed = sign_v4(
+            method, self.host, path, query, headers or {}, hashlib.sha256(body).hexdigest() if body else EMPTY_SHA256,
+            self.access_key, self.secret_key, self.region,
+        )
+        qs = "&".join(f"{quote(k, safe='-_.~')}={quote(str(v), safe='-_.~')}" for k, v in query.items())
+        conn.request(method, f"{path}?{qs}" if qs else path, body=body or None, headers=signed)
+        return conn.getresponse()
+
+    def _request(self, method: str, key: str, query=None, body: bytes = b"", headers=None, ok=(200,)):
+        """Request con la conexión persistente; devuelve ``(respuesta, cuerpo)``."""
+        for retry in (True, False):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                resp = self._send(self._conn, method, key, query, body, headers)
+                data = resp.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self._conn.close()
+                self._conn = None  # keep-alive cortado por el servidor: un reintento
+                if not retry:
+                    raise
+        return self._check(resp, key, data, ok), data
+
+    def _check(self, resp, key, data, ok):
+        if resp.status == 404:
+            raise FileNotFoundError(f"s3://{self.bucket}/{key}")
+        if resp.status not in ok:
+            raise StorageError(f"S3 {resp.status}: {data[:200]!r}")
+        return resp
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def create_bucket(self) -> None:
+        self._request("PUT", "", ok=(200, 409))
+
+    def uri_for(self, name: str) -> str:
+        return f"s3://{self.bucket}/{self.prefix + '/' if self.prefix else ''}{name}"
+
+    def put_stream(self, name: str, stream: BinaryIO) -> str:
+        """Sube ``stream`` sin cargarlo entero: un PUT si cabe en una parte; si no, multipart."""
+        uri = self.uri_for(name)
+        key = self._key(uri)
+        first = stream.read(self.part_size)
+        nxt = stream.read(self.part_size) if len(first) == self.part_size else b""
+        if not nxt:
+            self._request("PUT", key, body=first)
+            return uri
+        _, data = self._request("POST", key, {"uploads": ""})
+        upload_id = _xml_text(data, "UploadId")
+        etags = []
+        try:
+            part = first
+            while part:
+                resp, _ = self._request("PUT", key, {"partNumber": len(etags) + 1, "uploadId": upload_id}, body=part)
+                etags.append(resp.getheader("ETag"))
+                part, nxt = nxt, stream.read(self.part_size) if nxt else b""
+            body = "<CompleteMultipartUpload>%s</CompleteMultipartUpload>" % "".join(
+                f"<Part><PartNumber>{i}</PartNumber><ETag>{etag}</ETag></Part>" for i, etag in enumerate(etags, 1)
+            )
+            _, data = self._request("POST", key, {"uploadId": upload_id}, body=body.encode())
+            if b"<Error>" in data:  # S3 puede fallar el complete con 200
+                raise StorageError(f"S3 complete: {data[:200]!r}")
+        except BaseException:
+            with contextlib.suppress(Exception):
+                self._request("DELETE", key, {"uploadId": upload_id}, ok=(200, 204))
+            raise
+        return uri
+
+    def put_file(self, name: str, src: Union[str, Path], move: bool = False) -> str:
+        with open(src, "rb") as fh:
+            uri = self.put_stream(name, fh)
+        if move:
+            os.unlink(src)
+        return uri
+
+    def open(self, uri: str) -> BinaryIO:
+        """Cuerpo del objeto en streaming (conexión propia, se cierra con la respuesta)."""
+        conn = self._connect()
+        resp = self._send(conn, "GET", self._key(uri))
+        if resp.status != 200:
+            data = resp.read()
+            conn.close()
+            self._check(resp, self._key(uri), data, (200,))
+        return resp
+
+    def read_range(self, uri: str, start: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        _, data = self._request(
+            "GET", self._key(uri), headers={"Range": f"bytes={start}-{start + length - 1}"}, ok=(200, 206)
+        )
+        return data
+
+    def size(self, uri: str) -> int:
+        resp, _ = self._request("HEAD", self._key(uri))
+        return int(resp.getheader("Content-Length"))
+
+    def delete(self, uri: str) -> None:
+        self._request("DELETE", self._key(uri), ok=(200, 204))
+
+    @contextlib.contextmanager
+    def local_copy(self, uri: str) -> Iterator[Path]:
+        """Descarga en streaming a un temporal (para ``mmap``); se borra al salir."""
+        fd, name = tempfile.mkstemp(suffix=".s3")
+        try:
+            with os.fdopen(fd, "wb") as fh, contextlib.closing(self.open(uri)) as body:
+                shutil.copyfileobj(body, fh, COPY_BLOCK)
+            yield Path(name)
+        finally:
+            os.unlink(name)
+
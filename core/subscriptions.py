@@ -0,0 +1,177 @@
+# core/subscriptions.py
+"""Operaciones de ciclo de vida de suscripciones que no dependen de un request."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import entitlements, ledger, metrics, user_status
+from .models import AuditLog, Plan, UserSubscriptionCurrent, UserSubscriptionHistory, freeze_slots
+
+
+@dataclass
+class _ExpireResult:
+    batches: int = 0
+    expired: int = 0
+    slots_frozen: int = 0
+
+
+def expire_due_subscriptions(
+    now: Optional[datetime] = None, batch_size: int = 500, max_batches: int = 0
+) -> _ExpireResult:
+    """Pasa a ``past_due`` las suscripciones activas con ``expires_at`` vencido.
+
+    Recorre el índice (status, expires_at) por lotes con cursor (expires_at, id).
+    Cada lote toma sus filas con ``FOR UPDATE SKIP LOCKED``: varios nodos pueden correr
+    el barrido a la vez sin pisarse; las filas tomadas por otro nodo se saltan y el
+    cursor avanza igual.
+    """
+    now = now or timezone.now()
+    res = _ExpireResult()
+    cursor: Optional[tuple[datetime, int]] = None
+
+    while not max_batches or res.batches < max_batches:
+        with transaction.atomic(), ledger.batch():
+            qs = UserSubscriptionCurrent.objects.filter(status="active", expires_at__lt=now)
+            if cursor:
+                qs = qs.filter(
+                    Q(expires_at__gt=cursor[0]) | Q(expires_at=cursor[0], pk__gt=cursor[1])
+                )
+            rows = list(
+                qs.select_for_update(skip_locked=True)
+                .order_by("expires_at", "pk")
+                .values_list("pk", "user_id", "plan_id", "expires_at")[:batch_size]
+            )
+            if not rows:
+                break
+            cursor = (rows[-1][3], rows[-1][0])
+            res.batches += 1
+
+            ids = [r[0] for r in rows]
+            user_ids = [r[1] for r in rows]
+            # update() no dispara post_save: no se resincronizan slots fila a fila
+            res.expired += UserSubscriptionCurrent.objects.filter(
+                pk__in=ids, status="active"
+            ).update(status="past_due")
+            res.slots_frozen += freeze_slots(user_ids)
+
+            ledger.record_many(
+                [
+                    UserSubscriptionHistory(
+                        user_id=user_id,
+                        plan_id=plan_id,
+                        status_from="active",
+                        status_to="past_due",
+                        plan_from_id=plan_id,
+                        valid_from=expires_at,
+                        notes="expired",
+                    )
+                    for _, user_id, plan_id, expires_at in rows
+                ]
+            )
+            AuditLog.objects.bulk_create(
+                [
+                    AuditLog(
+                        user_id=user_id,
+                        action="subscription_expired",
+                        entity="user_subscription_current",
+                        entity_id=str(pk),
+                        metadata={"expires_at": expires_at.isoformat(), "plan_id": plan_id},
+                    )
+                    for pk, user_id, plan_id, expires_at in rows
+                ]
+            )
+            expired = len(rows)
+            transaction.on_commit(lambda n=expired: metrics.SUBSCRIPTIONS_EXPIRED.inc(n))
+            # update() no pasa por los signals: invalidar la caché de estado a mano
+            emails = list(
+                get_user_model().objects.filter(pk__in=user_ids).values_list("email", flat=True)
+            )
+            transaction.on_commit(lambda e=emails: user_status.invalidate(*e))
+            entitlements.bump_versions(user_ids)
+
+        if len(rows) < batch_size:
+            break
+
+    return res
+
+
+def start_plan_change(user_id: int, plan: Plan, sdk=None) -> Optional[UserSubscriptionCurrent]:
+    """Inicia un cambio de plan sin borrar nada.
+
+    Cancela en MP el preapproval vigente (si lo hay) y deja ``pending_plan`` en la misma
+    fila; el plan, el estado y los slots actuales se mantienen hasta que el webhook
+    confirme el nuevo preapproval (``activate_plan``).
+    """
+    usc = UserSubscriptionCurrent.objects.filter(user_id=user_id).first()
+    if not usc:
+        return None
+    if usc.external_subscription_id and sdk:
+        try:
+            sdk.preapproval().update(usc.external_subscription_id, {"status": "cancelled"})
+        except Exception:
+            pass
+    # update(): sin post_save, no hay resincronización de slots ni fila de ledger
+    UserSubscriptionCurrent.objects.filter(pk=usc.pk).update(
+        pending_plan=plan, pending_since=timezone.now(), replaced_subscription_id=usc.external_subscription_id
+    )
+    usc.pending_plan, usc.pending_since = plan, timezone.now()
+    usc.replaced_subscription_id = usc.external_subscription_id
+    return usc
+
+
+async def astart_plan_change(user_id: int, plan: Plan, mp=None) -> Optional[UserSubscriptionCurrent]:
+    """``start_plan_change`` para vistas async; ``mp`` es un cliente de ``core/mp_async.py``."""
+    usc = await UserSubscriptionCurrent.objects.filter(user_id=user_id).afirst()
+    if not usc:
+        return None
+    if usc.external_subscription_id and mp:
+        try:
+            await mp.preapproval_update(usc.external_subscription_id, {"status": "cancelled"})
+        except Exception:
+            pass
+    now = timezone.now()
+    await UserSubscriptionCurrent.objects.filter(pk=usc.pk).aupdate(
+        pending_plan=plan, pending_since=now, replaced_subscription_id=usc.external_subscription_id
+    )
+    usc.pending_plan, usc.pending_since = plan, now
+    usc.replaced_subscription_id = usc.external_subscription_id
+    return usc
+
+
+def activate_plan(
+    user_id: int,
+    plan: Plan,
+    *,
+    provider: str = "",
+    external_id: str = "",
+    days: Optional[int] = None,
+) -> UserSubscriptionCurrent:
+    """Aplica el plan confirmado sobre la fila existente (o la crea) en una transacción.
+
+    El post_save ajusta los slots con la diferencia mínima respecto al cupo anterior
+    (``_sync_slots_for_quota``) y registra la transición en el ledger.
+    """
+    with transaction.atomic():
+        usc = UserSubscriptionCurrent.objects.select_for_update().filter(user_id=user_id).first()
+        if usc is None:
+            usc = UserSubscriptionCurrent(user_id=user_id)
+        usc.plan = plan
+        usc.status = "active"
+        usc.pending_plan = None
+        usc.pending_since = None
+        if provider:
+            usc.provider = provider
+        if external_id:
+            usc.external_subscription_id = external_id
+        if days:
+            usc.activated_at = timezone.now()
+            usc.expires_at = usc.activated_at + timedelta(days=days)
+        usc.save()
+    return usc
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core import aggregation, columnar
+
+COLS = {
+    "Tipo Doc": ["33", "33", "61", "33", "33"],
+    "RUT Proveedor": ["76.1-K", "76.1-K", "76.1-K", "77.2-3", "76.1-K"],
+    "Fecha Docto": ["02/01/2025", "31/01/2025", "15/01/2025", "01/01/2025", "03/02/2025"],
+    "Monto Neto": [100, 200, -50, 10, 7],
+    "Monto IVA Recuperable": [19, 38, -9, 2, 1],
+    "Monto Total": [119, 238, -59, 12, 8],
+}
+EXPECTED = [
+    {"counterparty_rut": "76.1-K", "doc_type": 33, "period": "2025-01", "rows": 2,
+     "exento": 0, "neto": 300, "iva": 57, "total": 357},
+    {"counterparty_rut": "76.1-K", "doc_type": 33, "period": "2025-02", "rows": 1,
+     "exento": 0, "neto": 7, "iva": 1, "total": 8},
+    {"counterparty_rut": "76.1-K", "doc_type": 61, "period": "2025-01", "rows": 1,
+     "exento": 0, "neto": -50, "iva": -9, "total": -59},
+    {"counterparty_rut": "77.2-3", "doc_type": 33, "period": "2025-01", "rows": 1,
+     "exento": 0, "neto": 10, "iva": 2, "total": 12},
+]
+
+
+def _sorted(groups):
+    return sorted(groups, key=lambda g: (g["counterparty_rut"], g["doc_type"], g["period"]))
+
+
+class AggregationTests(SimpleTestCase):
+    def test_period_of(self):
+        self.assertEqual(aggregation.period_of("31/12/2024"), "2024-12")
+        self.assertEqual(aggregation.period_of("2024-12-31"), "2024-12")
+        self.assertEqual(aggregation.period_of("?"), "")
+
+    def test_columns_and_table_agree_with_and_without_numpy(self):
+        blob = columnar.encode_table(COLS, {"Tipo Doc": "int"})
+        for np in ({aggregation.np, None} if aggregation.np is not None else {None}):
+            with mock.patch.object(aggregation, "np", np):
+                self.assertEqual(_sorted(aggregation.aggregate_columns(COLS)), EXPECTED)
+                table = columnar.ColumnarPayload(blob).table()
+                self.assertEqual(_sorted(aggregation.aggregate_table(table)), EXPECTED)
+
+    def test_empty(self):
+        self.assertEqual(aggregation.aggregate_columns({"Monto Total": []}), [])
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Plan, UserSubscriptionCurrent
+
+
+@override_settings(FRONTEND_SYNC_API_KEY="k", USER_STATUS_BATCH_MAX=3)
+class UserStatusBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = Plan.objects.create(code="pro", name="Pro", price_month="2000.00", rut_quota=5)
+        User = get_user_model()
+        cls.a = User.objects.create_user(username="a", email="a@example.com")
+        cls.b = User.objects.create_user(username="b", email="b@example.com")
+        UserSubscriptionCurrent.objects.create(user=cls.a, plan=cls.plan)
+
+    def setUp(self):
+        cache.clear()
+
+    def _post(self, emails):
+        return self.client.post(
+            reverse("api_user_status_batch"),
+            data=json.dumps({"emails": emails}),
+            content_type="application/json",
+            HTTP_X_API_KEY="k",
+        )
+
+    def test_single_query_and_map(self):
+        with self.assertNumQueries(1):
+            resp = self._post(["A@example.com", "b@example.com", "nobody@example.com"])
+        self.assertEqual(resp.status_code, 200)
+        results = resp.json()["results"]
+        self.assertEqual(results["a@example.com"]["plan"]["code"], "pro")
+        self.assertEqual(results["a@example.com"]["status"], "active")
+        self.assertEqual(results["b@example.com"]["status"], "none")
+        self.assertFalse(results["nobody@example.com"]["has_user"])
+
+        with self.assertNumQueries(0):
+            self._post(["a@example.com", "b@example.com"])
+
+    def test_limit_and_auth(self):
+        self.assertEqual(self._post(["x@e.com"] * 4).status_code, 400)
+        resp = self.client.post(reverse("api_user_status_batch"), data="{}", content_type="application/json")
+        self.assertEqual(resp.status_code, 403)
+
+    def test_invalidated_on_subscription_change(self):
+        self._post(["b@example.com"])
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscriptionCurrent.objects.create(user=self.b, plan=self.plan)
+        results = self._post(["b@example.com"]).json()["results"]
+        self.assertEqual(results["b@example.com"]["status"], "active")
+
+    def test_invalidated_on_email_change(self):
+        self._post(["a@example.com", "new@example.com"])
+        self.a.email = "new@example.com"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.save()
+        results = self._post(["a@example.com", "new@example.com"]).json()["results"]
+        self.assertFalse(results["a@example.com"]["has_user"])
+        self.assertEqual(results["new@example.com"]["status"], "active")
+
+    def test_single_endpoint_shape_unchanged(self):
+        resp = self.client.get(reverse("api_user_status"), {"email": "a@example.com"}, HTTP_X_API_KEY="k")
+        self.assertEqual(
+            resp.json(),
+            {"has_user": True, "email": "a@example.com", "plan": {"code": "pro", "name": "Pro", "rut_quota": 5}, "status": "active"},
+        )
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from core import backup, ledger, rut_summary
+from core.models import (
+    AuditLog, EntitlementVersion, FileUpload, Form, FormAggregate, Plan, RutFormSummary, SubscriptionMonthlySummary,
+    UserRutSlot, UserSubscriptionHistory,
+)
+
+
+class BackupRestoreTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = Path(self.tmp.name)
+        User = get_user_model()
+        self.user = User.objects.create_user(username="b", email="b@example.com")
+        self.plan = Plan.objects.create(code="p", name="P", price_month=1000, rut_quota=1)
+        UserSubscriptionHistory.objects.create(user=self.user, plan=self.plan, price_paid="1000.50")
+        self.form = Form.objects.create(user=self.user, type="compras", sii_rut="11111111-1", status="stored", submitted_at=timezone.now())
+        FileUpload.objects.create(
+            form=self.form, file_kind="compras_33", storage_uri="u", original_filename="a.csv", row_hashes=b"\x00\xff"
+        )
+        AuditLog.log(self.user.pk, "login", "user", str(self.user.pk), {"ip": "127.0.0.1"})
+        FormAggregate.objects.create(form=self.form, file_kind="compras_33", counterparty_rut="1-9", doc_type=33, period="2024-01", rows=2, total=10)
+        EntitlementVersion.objects.update_or_create(user=self.user, defaults={"version": 7})
+
+    def _backup(self, **kw):
+        return backup.backup(self.dir, workers=1, segment_rows=2, fsync="never", **kw)
+
+    def _snapshot(self):
+        return {
+            "forms": list(Form.objects.values_list("pk", "status", "created_at", "processed_at")),
+            "audit": list(AuditLog.objects.order_by("pk").values_list("pk", "action", "metadata", "at")),
+            "history": list(UserSubscriptionHistory.objects.values_list("pk", "price_paid")),
+            "hashes": [bytes(h) for h in FileUpload.objects.values_list("row_hashes", flat=True)],
+            "slots": list(UserRutSlot.objects.values_list("pk", "rut", "state")),
+            "aggregates": list(FormAggregate.objects.values_list("pk", "form_id", "total")),
+            "versions": list(EntitlementVersion.objects.values_list("user_id", "version")),
+            "monthly": list(SubscriptionMonthlySummary.objects.values_list("plan_id", "activations", "revenue")),
+            "ruts": list(RutFormSummary.objects.values_list("user_id", "rut", "submitted", "done")),
+        }
+
+    def test_full_plus_incremental_restores_state(self):
+        full = self._backup()
+        self.assertEqual(full.tables["core.auditlog"].rows, AuditLog.objects.count())
+        self.assertTrue(all(len(s) and s["rows"] <= 2 for s in full.tables["core.auditlog"].segments))
+
+        Form.objects.filter(pk=self.form.pk).update(status="done", processed_at=timezone.now())
+        for i in range(3):
+            AuditLog.log(self.user.pk, "form_processed", "form", str(i), {})
+        inc = self._backup(incremental=True, overlap=0)
+        self.assertEqual(inc.tables["core.auditlog"].rows, 3)
+        self.assertEqual(inc.tables["core.form"].rows, 1)
+        self.assertEqual(inc.tables["core.usersubscriptionhistory"].rows, 0)
+        self.assertEqual(backup.chain(inc.path), [full.path, inc.path])
+
+        # Filas creadas directo, sin pasar por ledger.record ni submit
+        ledger.rebuild_summary()
+        rut_summary.rebuild([self.user.pk])
+        expected = self._snapshot()
+        self.assertTrue(expected["monthly"] and expected["ruts"])
+        get_user_model().objects.all().delete()
+        AuditLog.objects.all().delete()
+        SubscriptionMonthlySummary.objects.all().delete()
+        Plan.objects.all().delete()
+        self.assertEqual(Form.objects.count(), 0)
+
+        res = backup.restore(inc.path, batch_size=2)
+        self.assertEqual(res.backups, 2)
+        self.assertEqual(self._snapshot(), expected)
+        self.assertEqual(res.summaries, len(expected["monthly"]) + len(expected["ruts"]))
+
+    def test_corrupt_segment_is_rejected_before_loading(self):
+        res = self._backup()
+        seg = res.tables["core.form"].segments[0]["file"]
+        (res.path / seg).write_bytes(b"not gzip")
+        with self.assertRaisesMessage(backup.BackupError, "checksum"):
+            backup.restore(res.path)
+        self.assertEqual(Form.objects.count(), 1)
+        manifest = json.loads((res.path / backup.MANIFEST).read_text())
+        self.assertFalse(manifest["incremental"])
+        with self.assertRaises(backup.BackupError):
+            backup.read_manifest(self.dir / "missing")
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core import columnar
+from core import form_processing as fp
+from core.models import FileUpload, Form
+
+COLS = {
+    "Folio": ["010", "11", "12", "13"],
+    "RUT Proveedor": ["76.1-K", "76.1-K", "77.2-3", "76.1-K"],
+    "Razon Social": ["A", "B", "C", "D"],
+    "Monto Total": [1190, 595, -10, 0],
+}
+
+
+class ColumnarFormatTests(SimpleTestCase):
+    def test_roundtrip_types_and_lazy_columns(self):
+        blob = columnar.pack({"t": COLS}, {"t": {"Monto Total": "int"}})
+        table = columnar.ColumnarPayload(blob).table("t")
+        self.assertEqual(table.rows, 4)
+        self.assertEqual(
+            [table.column_type(c) for c in table.columns], ["str", "dict", "str", "int"]
+        )
+        self.assertEqual(sum(table.int_array("Monto Total")), 1775)
+        self.assertEqual(list(table._cache), [])  # int_array no materializa la columna
+        self.assertEqual(table.column("RUT Proveedor"), COLS["RUT Proveedor"])
+        self.assertEqual(list(table._cache), ["RUT Proveedor"])
+        # Dígitos sin declarar como int: texto, sin perder el cero a la izquierda
+        self.assertEqual(next(table.iter_rows(["Folio"])), {"Folio": "010"})
+
+    def test_merge_keeps_tables_and_foreign_byteorder(self):
+        merged = columnar.merge({
+            "a": columnar.encode_table({"x": [1, 2]}),
+            "b": columnar.encode_table({"y": ["p", "q", "r"]}),
+        })
+        payload = columnar.ColumnarPayload(merged)
+        self.assertEqual(payload.tables, ["a", "b"])
+        self.assertEqual(payload.table("b").column("y"), ["p", "q", "r"])
+
+        payload.byteorder = "big" if sys.byteorder == "little" else "little"
+        swapped = payload.table("a").int_array("x")
+        self.assertNotEqual(swapped.tolist(), [1, 2])
+
+
+class ColumnarPayloadStorageTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.user = get_user_model().objects.create_user(username="a", email="a@example.com")
+
+    def _process(self):
+        form = Form.objects.create(user=self.user, type="ventas", status="stored", submitted_at=timezone.now())
+        for kind in ("ventas_33", "ventas_36"):
+            path = self.root / f"{kind}.csv"
+            path.write_text("Tipo Doc;Folio;RUT Cliente;Monto Total\n33;1;1-9;100\n33;2;1-9;50\n")
+            FileUpload.objects.create(form=form, file_kind=kind, storage_uri=str(path), original_filename="v.csv")
+        self.assertEqual(fp.process_batch().done, 1)
+        return form.form_payloads.get()
+
+    def test_small_payload_inline(self):
+        with self.settings(MEDIA_ROOT=str(self.root)):
+            payload = self._process()
+        self.assertFalse(payload.columns_uri)
+        cols = payload.columns()
+        self.assertEqual(cols.tables, ["ventas_33", "ventas_36"])
+        self.assertEqual(cols.table("ventas_36").column("RUT Cliente"), ["1-9", "1-9"])
+
+    def test_large_payload_to_file(self):
+        with self.settings(MEDIA_ROOT=str(self.root), FORM_PAYLOAD_INLINE_MAX=10):
+            payload = self._process()
+            self.assertIsNone(payload.columns_blob)
+            self.assertTrue((self.root / payload.columns_uri).exists())
+            self.assertEqual(sum(payload.columns().table("ventas_33").int_array("Monto Total")), 150)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core import csvscan
+
+CSV = "﻿Tipo Doc;Folio;Razon Social;Monto Total\r\n33;1;Ñandú SpA;1190\r\n;;;\r\n61;2;B;-10\r\n"
+
+
+class MappedCSVTests(SimpleTestCase):
+    def _open(self, raw: bytes) -> csvscan.MappedCSV:
+        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+        self.addCleanup(Path(tmp.name).unlink)
+        with tmp:
+            tmp.write(raw)
+        src = csvscan.MappedCSV.open(tmp.name)
+        self.addCleanup(src.close)
+        return src
+
+    def test_header_rows_and_selected_columns(self):
+        src = self._open(CSV.encode("utf-8"))
+        self.assertEqual(src.header, ["Tipo Doc", "Folio", "Razon Social", "Monto Total"])
+        self.assertEqual(len(src.index()), 2)  # la fila vacía no cuenta
+        cols = src.read_columns(["Razon Social", "Monto Total"], ints=["Monto Total"])
+        self.assertEqual(cols, {"Razon Social": ["Ñandú SpA", "B"], "Monto Total": [1190, -10]})
+        self.assertEqual(src.read_columns(["Folio"], rows=[1]), {"Folio": ["2"]})
+        self.assertEqual(src.line_number(1), 4)
+
+    def test_latin1_and_quoted_multiline_rows_across_windows(self):
+        src = self._open("Folio;Razon Social\n1;Ñandú\n".encode("latin-1"))
+        self.assertEqual(src.read_columns()["Razon Social"], ["Ñandú"])
+
+        raw = b"Folio;Glosa\n" + b"".join(
+            (b'%d;"linea\n%d;x"\n' if i % 3 == 0 else b"%d;g%d\n") % (i, i) for i in range(30)
+        )
+        with mock.patch.object(csvscan, "WINDOW", 16):
+            src = self._open(raw)
+            hashes = src.index()
+            glosa = src.read_columns()["Glosa"]
+        self.assertEqual(len(hashes), 30)
+        self.assertEqual(glosa[:2], ["linea\n0;x", "g1"])
+        self.assertEqual(list(src.lines([3])), [(3, b'3;"linea\n3;x"')])
+
+    def test_empty_file_and_row_error(self):
+        self.assertEqual(self._open(b"").header, [])
+        src = self._open(b"Folio;Monto\n1;x\n")
+        with self.assertRaises(csvscan.RowError) as ctx:
+            src.read_columns(ints=["Monto"])
+        self.assertEqual((ctx.exception.row, ctx.exception.column), (0, "Monto"))
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import entitlements
+from core.checks import shared_cache_check
+from core.models import Plan, UserSubscriptionCurrent
+
+
+@override_settings(FRONTEND_SYNC_API_KEY="k", ENTITLEMENT_TOKEN_SECRET="s")
+class EntitlementTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = Plan.objects.create(code="pro", name="Pro", price_month="2000.00", rut_quota=5)
+        cls.user = get_user_model().objects.create_user(username="a", email="a@example.com")
+
+    def setUp(self):
+        cache.clear()
+
+    def _token(self):
+        resp = self.client.post(
+            reverse("api_entitlement_token"),
+            data=json.dumps({"email": "a@example.com"}),
+            content_type="application/json",
+            HTTP_X_API_KEY="k",
+        )
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def _version(self):
+        resp = self.client.get(reverse("api_entitlement_versions"), {"user_id": self.user.pk}, HTTP_X_API_KEY="k")
+        return resp.json()["versions"][str(self.user.pk)]
+
+    def test_token_roundtrip_and_revocation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscriptionCurrent.objects.create(user=self.user, plan=self.plan)
+        data = self._token()
+        claims = entitlements.decode(data["token"])
+        self.assertEqual((claims["plan"]["code"], claims["status"]), ("pro", "active"))
+        self.assertEqual(claims["ver"], self._version())
+
+        with self.assertNumQueries(0):
+            self._version()  # cacheada
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscriptionCurrent.objects.filter(user=self.user).delete()
+        self.assertGreater(self._version(), claims["ver"])
+
+    def test_rejects_tampered_and_expired(self):
+        token = entitlements.encode({"sub": "1", "exp": int(time.time()) + 60})
+        header, payload, sig = token.split(".")
+        with self.assertRaises(entitlements.InvalidToken):
+            entitlements.decode(f"{header}.{payload}.{sig[:-2]}xx")
+        with self.assertRaises(entitlements.InvalidToken):
+            entitlements.decode(token, now=time.time() + 120)
+
+    def test_deploy_check_requires_shared_cache(self):
+        self.assertEqual([w.id for w in shared_cache_check(None)], ["core.W001"])
+        db_cache = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "c"}}
+        with override_settings(CACHES=db_cache):
+            self.assertEqual(shared_cache_check(None), [])
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import exports
+from core.models import AuditLog, Form
+
+
+@override_settings(EXPORT_API_KEY="k")
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username="s", email="s@example.com", is_staff=True)
+        cls.user = User.objects.create_user(username="u", email="u@example.com")
+        Form.objects.create(user=cls.user, type="compras", sii_rut="11111111-1", status="done")
+        AuditLog.objects.all().delete()  # los que dejan las señales
+        now = timezone.now()
+        for i in range(10):
+            row = AuditLog.log(
+                cls.user.pk if i % 2 else None, "login" if i % 3 else "form_submitted", "user", str(i), {"i": i}
+            )
+            AuditLog.objects.filter(pk=row.pk).update(at=now - timedelta(days=10 - i))
+
+    def _get(self, dataset="audit", key="k", **params):
+        resp = self.client.get(reverse("api_export", args=[dataset]), params, HTTP_X_API_KEY=key)
+        body = b"".join(resp.streaming_content) if resp.streaming else resp.content
+        return resp, body
+
+    def test_csv_in_time_order_with_filters(self):
+        resp, body = self._get()
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('filename="audit-', resp["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([int(r["entity_id"]) for r in rows], list(range(10)))
+        self.assertEqual(json.loads(rows[1]["metadata"]), {"i": 1})
+        self.assertEqual(rows[1]["user_email"], "u@example.com")
+
+        since = (timezone.now() - timedelta(days=5, hours=1)).isoformat()
+        _, body = self._get(since=since, action="login", user="u@example.com")
+        ids = [int(r["entity_id"]) for r in csv.DictReader(io.StringIO(body.decode()))]
+        self.assertEqual(ids, [5, 7])
+
+    def test_jsonl_gzip_and_streams_in_chunks(self):
+        with mock.patch.object(exports, "EXPORT_BUFFER_BYTES", 200):
+            resp, body = self._get("forms", format="jsonl", gzip="1")
+            chunks = list(exports.stream("audit", "jsonl", chunk_size=3))
+        self.assertEqual(resp["Content-Type"], "application/gzip")
+        (row,) = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual((row["sii_rut"], row["status"], row["user_email"]), ("11111111-1", "done", "u@example.com"))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(len(b"".join(chunks).splitlines()), 10)
+
+    def test_auth_and_bad_input(self):
+        self.assertEqual(self._get(key="x")[0].status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self._get(key="")[0].status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self._get(key="")[0].status_code, 200)
+        self.assertEqual(self._get("users")[0].status_code, 400)
+        self.assertEqual(self._get(format="xml")[0].status_code, 400)
+        self.assertEqual(self._get(since="ayer")[0].status_code, 400)
+        self.assertEqual(self._get(since="2026-02-30")[0].status_code, 400)
+        self.assertEqual(self._get(until="2026-13-01T00:00")[0].status_code, 400)
+        resp, body = self._get(user="²")
+        self.assertEqual((resp.status_code, body.count(b"\n")), (200, 1))  # se trata como email: sin filas
+        with self.assertRaises(CommandError):
+            call_command("export_data", "audit", "--since", "2026-02-30")
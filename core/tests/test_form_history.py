@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core import form_history
+from core.models import FileUpload, Form
+
+
+class FormHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user(username="h", email="h@example.com")
+        other = User.objects.create_user(username="o", email="o@example.com")
+        Form.objects.create(user=other, type="compras")
+        now = timezone.now()
+        cls.forms = []
+        for i in range(7):
+            form = Form.objects.create(user=cls.user, type="ventas" if i % 3 == 0 else "compras", status="done")
+            # dos Forms con el mismo created_at: el id desempata
+            Form.objects.filter(pk=form.pk).update(created_at=now - timedelta(days=i // 2 * 2))
+            cls.forms.append(form)
+        for kind in ("compras_33", "compras_46"):
+            FileUpload.objects.create(form=cls.forms[0], file_kind=kind, storage_uri="x", original_filename="x.csv")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _get(self, **params):
+        resp = self.client.get(reverse("api_forms"), params)
+        return resp.status_code, resp.json()
+
+    def test_pages_follow_cursor_without_gaps_or_repeats(self):
+        seen, cursor = [], None
+        while True:
+            status, data = self._get(limit=3, **({"cursor": cursor} if cursor else {}))
+            self.assertEqual(status, 200)
+            seen += [r["id"] for r in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        expected = list(
+            Form.objects.filter(user=self.user).order_by("-created_at", "-pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(seen, expected)
+        first = next(r for r in self._get()[1]["results"] if r["id"] == self.forms[0].pk)
+        self.assertEqual(first["files"], 2)
+
+    def test_filters_and_bad_input(self):
+        status, data = self._get(type="ventas")
+        self.assertEqual({r["type"] for r in data["results"]}, {"ventas"})
+        self.assertEqual(len(data["results"]), 3)
+        self.assertEqual(self._get(status="bogus")[0], 400)
+        self.assertEqual(self._get(owner="x")[0], 400)
+        self.assertEqual(self._get(limit=0)[0], 400)
+        self.assertEqual(self._get(cursor="%%%")[0], 400)
+
+    def test_single_query_per_page(self):
+        with self.assertNumQueries(1):
+            form_history.page(self.user, {}, limit=5)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import form_processing as fp
+from core.models import FileUpload, Form, FormTransition
+
+CSV = "Nro;Tipo Doc;Folio;Monto Neto;Monto IVA Recuperable;Monto Total\n1;33;10;1000;190;1190\n2;33;11;500;95;595\n"
+
+
+class FormProcessingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="a", email="a@example.com")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _form(self, content=CSV, kinds=("compras_33", "compras_46")):
+        form = Form.objects.create(user=self.user, type="compras", status="stored", submitted_at=timezone.now())
+        for kind in kinds:
+            path = Path(self.tmp.name) / f"{form.pk}_{kind}.csv"
+            path.write_text(content, encoding="utf-8")
+            FileUpload.objects.create(form=form, file_kind=kind, storage_uri=str(path), original_filename=f"{kind}.csv")
+        return form
+
+    def test_done_with_payload_and_transitions(self):
+        form = self._form()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            res = fp.process_batch(pool)
+        self.assertEqual((res.claimed, res.done), (1, 1))
+        form.refresh_from_db()
+        self.assertEqual((form.status, form.attempts, form.error_message), ("done", 1, ""))
+        payload = form.form_payloads.get().payload_json
+        self.assertEqual(payload["files"]["compras_46"]["totals"]["Monto Total"], 1785)
+        self.assertEqual(payload["totals"]["Monto Total"], 2 * 1785)
+        aggs = list(form.aggregates.values_list("file_kind", "doc_type", "rows", "total"))
+        self.assertEqual(sorted(aggs), [("compras_33", 33, 2, 1785), ("compras_46", 33, 2, 1785)])
+        for fu in form.file_uploads.all():
+            self.assertEqual(fu.rows_count, 2)
+            self.assertEqual(len(fu.content_hash), 64)
+        steps = list(FormTransition.objects.filter(form=form).order_by("pk"))
+        self.assertEqual([(t.from_status, t.to_status) for t in steps], [("stored", "validating"), ("validating", "done")])
+        self.assertTrue({"validate", "aggregate", "parallel", "join", "store", "file:compras_33"} <= set(steps[-1].timings))
+
+    def test_files_of_a_submission_run_concurrently(self):
+        self._form()
+        real = fp.process_file
+
+        def slow(f, root):
+            time.sleep(0.2)
+            return real(f, root)
+
+        with mock.patch.object(fp, "process_file", slow), ThreadPoolExecutor(max_workers=2) as pool:
+            self.assertEqual(fp.process_batch(pool).done, 1)
+        timings = FormTransition.objects.get(to_status="done").timings
+        self.assertLess(timings["parallel"], 380)  # ~ el más lento, no la suma
+
+    def test_missing_pair_file_is_an_error(self):
+        form = self._form(kinds=("compras_33",))
+        self.assertEqual(fp.process_batch().failed, 1)
+        form.refresh_from_db()
+        self.assertEqual(form.error_message, "falta el archivo compras_46")
+
+    def test_submission_without_files_is_not_queued(self):
+        form = self._form(kinds=())
+        self.assertEqual(fp.process_batch().claimed, 0)
+        form.refresh_from_db()
+        self.assertEqual(form.status, "stored")
+
+    def test_invalid_csv_ends_in_error(self):
+        form = self._form("Folio;Monto Total\n1;abc\n")
+        res = fp.process_batch()
+        self.assertEqual(res.failed, 1)
+        form.refresh_from_db()
+        self.assertEqual(form.status, "error")
+        self.assertIn("faltan columnas Tipo Doc", form.error_message)
+
+    @override_settings(FORM_MAX_ATTEMPTS=2, FORM_RETRY_BASE_SECONDS=60)
+    def test_transient_errors_retry_with_backoff(self):
+        form = self._form()
+        boom = fp.TransientProcessingError("storage caído")
+        with mock.patch.object(fp, "_open_stored", side_effect=boom):
+            self.assertEqual(fp.process_batch().retried, 1)
+            form.refresh_from_db()
+            self.assertEqual((form.status, form.attempts), ("stored", 1))
+            self.assertGreater(form.next_attempt_at, timezone.now())
+            self.assertEqual(fp.process_batch().claimed, 0)  # aún en backoff
+
+            Form.objects.filter(pk=form.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(fp.process_batch().failed, 1)
+        form.refresh_from_db()
+        self.assertEqual((form.status, form.error_message), ("error", "storage caído"))
+
+    def test_unexpected_errors_are_not_retried(self):
+        form = self._form()
+        with mock.patch.object(fp, "parse_rows", side_effect=KeyError("Folio")):
+            self.assertEqual(fp.process_batch().failed, 1)
+        form.refresh_from_db()
+        self.assertEqual((form.status, form.attempts), ("error", 1))
+
+    def test_stale_claim_is_not_overwritten(self):
+        form = self._form()
+        claim = fp.claim_forms(1)[0]
+        Form.objects.filter(pk=form.pk).update(claimed_at=timezone.now())  # otro worker lo retomó
+        self.assertFalse(fp.complete(claim, fp.run_stages(claim.job)))
+        self.assertFalse(form.form_payloads.exists())
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core import form_processing as fp
+from core.form_scheduler import Candidate, queue_stats, schedule
+from core.models import FileUpload, Form, Plan, UserSubscriptionCurrent
+
+WEIGHTS = {"basic": 1, "enterprise": 4}
+CAPS = {"basic": 1, "enterprise": 4}
+
+
+@override_settings(FORM_PLAN_WEIGHTS=WEIGHTS, FORM_PLAN_MAX_INFLIGHT=CAPS)
+class ScheduleTests(SimpleTestCase):
+    def _cands(self, user_id, tier, n, priority=0):
+        t0 = timezone.now() - timedelta(hours=1)
+        return [Candidate(user_id * 100 + i, user_id, tier, priority, t0 + timedelta(seconds=i)) for i in range(n)]
+
+    def test_caps_and_weights(self):
+        big = self._cands(1, "enterprise", 10)
+        small = self._cands(2, "basic", 3) + self._cands(3, "basic", 3)
+        order = schedule(big + small, running={}, limit=10)
+        self.assertEqual(sum(c.user_id == 1 for c in order), 4)  # tope enterprise
+        self.assertEqual({c.user_id for c in order if c.tier == "basic"}, {2, 3})  # 1 c/u
+        # enterprise (peso 4, 1 usuario) va antes que cada usuario basic (peso 1, 2 usuarios)
+        self.assertEqual(order[0].user_id, 1)
+
+    def test_priority_lane_first_and_running_counts(self):
+        cands = self._cands(1, "enterprise", 3) + self._cands(2, "basic", 1, priority=5)
+        order = schedule(cands, running={1: 3}, limit=5)
+        self.assertEqual([c.user_id for c in order], [2, 1])
+
+
+@override_settings(FORM_PLAN_WEIGHTS=WEIGHTS, FORM_PLAN_MAX_INFLIGHT=CAPS)
+class ClaimFairnessTests(TestCase):
+    def test_big_backlog_does_not_starve_others(self):
+        User = get_user_model()
+        ent = Plan.objects.create(code="enterprise", name="E", price_month="1.00", rut_quota=20)
+        big = User.objects.create_user(username="big", email="big@example.com")
+        small = User.objects.create_user(username="small", email="small@example.com")
+        UserSubscriptionCurrent.objects.create(user=big, plan=ent)
+        old = timezone.now() - timedelta(hours=1)
+        forms = Form.objects.bulk_create(
+            [Form(user=big, type="compras", status="stored", submitted_at=old) for _ in range(50)]
+            + [Form(user=small, type="compras", status="stored", submitted_at=timezone.now())]
+        )
+        FileUpload.objects.bulk_create(
+            [FileUpload(form=f, file_kind="compras_33", storage_uri="x.csv", original_filename="x.csv") for f in forms]
+        )
+        self.assertEqual(queue_stats()["enterprise"]["depth"], 50)
+
+        claims = fp.claim_forms(10)
+        by_tier = {c.tier: 0 for c in claims}
+        for c in claims:
+            by_tier[c.tier] += 1
+        self.assertEqual(by_tier, {"enterprise": 4, "none": 1})
+        # Con el tope alcanzado, la siguiente ronda no le da más al usuario grande
+        self.assertEqual(fp.claim_forms(10), [])
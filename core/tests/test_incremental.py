@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core import form_processing as fp
+from core import incremental
+from core.models import FileUpload, Form
+
+HEADER = "Nro;Tipo Doc;RUT Proveedor;Folio;Fecha Docto;Monto Neto;Monto IVA Recuperable;Monto Total"
+ROWS = [
+    "1;33;76.1-K;10;02/01/2025;1000;190;1190",
+    "2;33;76.1-K;11;03/01/2025;500;95;595",
+    "3;61;77.2-3;12;04/01/2025;-100;-19;-119",
+    "4;33;77.2-3;13;05/02/2025;200;38;238",
+]
+
+
+def _csv(rows):
+    return "\n".join([HEADER, *rows]) + "\n"
+
+
+class DiffTests(SimpleTestCase):
+    def test_multiset_diff(self):
+        d = incremental.diff([1, 2, 2, 3], [2, 4, 1, 2, 2])
+        self.assertEqual((d.added, d.removed), ([1, 4], [3]))
+        self.assertEqual(list(d.order), [1, 4, 0, 2, 5])  # agregadas: 4 + k
+
+    def test_rebuild_and_merge_groups(self):
+        d = incremental.diff([1, 2], [2, 3])
+        cols = incremental.rebuild({"x": ["a", "b"]}, {"x": ["c"]}, d)
+        self.assertEqual(cols, {"x": ["b", "c"]})
+        g = {"counterparty_rut": "r", "doc_type": 33, "period": "2025-01", "rows": 1,
+             "exento": 0, "neto": 10, "iva": 0, "total": 10}
+        self.assertEqual(incremental.merge_groups([g], [], [g]), [])
+        self.assertEqual(incremental.merge_groups([g], [g], [])[0]["total"], 20)
+
+    def test_hashes_roundtrip(self):
+        hashes = [incremental.row_hash(r.encode()) for r in ROWS]
+        self.assertEqual(list(incremental.unpack_hashes(incremental.pack_hashes(hashes))), hashes)
+
+
+class IncrementalProcessingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="a", email="a@example.com")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _process(self, rows):
+        form = Form.objects.create(
+            user=self.user, type="compras", sii_rut="11111111-1", status="stored", submitted_at=timezone.now()
+        )
+        for kind in ("compras_33", "compras_46"):
+            path = Path(self.tmp.name) / f"{form.pk}_{kind}.csv"
+            path.write_text(_csv(rows), encoding="utf-8")
+            FileUpload.objects.create(form=form, file_kind=kind, storage_uri=str(path), original_filename="x.csv")
+        with override_settings(MEDIA_ROOT=self.tmp.name):
+            self.assertEqual(fp.process_batch().done, 1)
+        return form
+
+    def _summary(self, form):
+        return sorted(form.aggregates.values_list("file_kind", "counterparty_rut", "doc_type", "period", "rows", "total"))
+
+    def test_reupload_only_processes_changed_rows(self):
+        self._process(ROWS)
+        changed = [ROWS[0], ROWS[1].replace(";595", ";600"), ROWS[3], "5;33;78.3-4;14;06/02/2025;10;2;12"]
+        with override_settings(FORM_INCREMENTAL_MAX_CHANGE=1.0):  # 4 de 8 filas cambian
+            form = self._process(changed)
+
+        payload = form.form_payloads.get()
+        delta = payload.payload_json["files"]["compras_33"]["delta"]
+        self.assertEqual((delta["added"], delta["removed"], delta["kept"]), (2, 2, 2))
+        self.assertEqual(payload.payload_json["files"]["compras_33"]["totals"]["Monto Total"], 1190 + 600 + 238 + 12)
+        table = payload.columns().table("compras_33")
+        self.assertEqual(table.column("Monto Total"), [1190, 600, 238, 12])
+
+        # mismo resultado que procesar el archivo completo sin base
+        with override_settings(FORM_INCREMENTAL_MAX_CHANGE=0):
+            full = self._process(changed)
+        self.assertNotIn("delta", full.form_payloads.get().payload_json["files"]["compras_33"])
+        self.assertEqual(self._summary(form), self._summary(full))
+        self.assertEqual(
+            payload.payload_json["totals"], full.form_payloads.get().payload_json["totals"]
+        )
+
+    def test_large_change_falls_back_to_full(self):
+        self._process(ROWS)
+        form = self._process([r.replace("/2025", "/2024") for r in ROWS])
+        self.assertNotIn("delta", form.form_payloads.get().payload_json["files"]["compras_33"])
+        self.assertEqual({p for *_, p, _, _ in self._summary(form)}, {"2024-01", "2024-02"})
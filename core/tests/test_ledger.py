@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import ledger
+from core.models import (
+    Plan,
+    SubscriptionMonthlySummary,
+    UserSubscriptionCurrent,
+    UserSubscriptionHistory,
+)
+from core.views import _apply_payment
+
+
+class LedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.basic = Plan.objects.create(code="basic", name="Básico", price_month="1000.00", rut_quota=1)
+        cls.pro = Plan.objects.create(code="pro", name="Pro", price_month="2000.00", rut_quota=5)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="u", email="u@example.com")
+
+    def _summary(self, plan):
+        return SubscriptionMonthlySummary.objects.get(plan=plan)
+
+    def test_transitions_are_recorded_and_summarized(self):
+        sub = UserSubscriptionCurrent.objects.create(user=self.user, plan=self.basic)
+        sub = UserSubscriptionCurrent.objects.get(pk=sub.pk)
+        sub.plan = self.pro
+        sub.save()
+        sub.save()  # sin cambios: no agrega fila
+        UserSubscriptionCurrent.objects.filter(pk=sub.pk).delete()
+
+        rows = list(UserSubscriptionHistory.objects.order_by("pk"))
+        self.assertEqual(
+            [(r.status_from, r.status_to, r.plan_id) for r in rows],
+            [("none", "active", self.basic.pk), ("active", "active", self.pro.pk), ("active", "canceled", self.pro.pk)],
+        )
+        self.assertEqual(rows[1].plan_from_id, self.basic.pk)
+
+        basic, pro = self._summary(self.basic), self._summary(self.pro)
+        self.assertEqual((basic.activations, basic.revenue), (1, Decimal("1000.00")))
+        self.assertEqual((pro.upgrades, pro.churned), (1, 1))
+
+    def test_batch_writes_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with ledger.batch():
+                for _ in range(3):
+                    ledger.record(self.user.pk, self.basic.pk, "none", "active", price_paid=Decimal("1000"))
+                self.assertEqual(len(ctx.captured_queries), 0)
+        inserts = [q for q in ctx.captured_queries if "INSERT INTO \"core_usersubscriptionhistory\"" in q["sql"]]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(UserSubscriptionHistory.objects.count(), 3)
+        self.assertEqual(self._summary(self.basic).activations, 3)
+
+    def test_append_only(self):
+        ledger.record(self.user.pk, self.basic.pk, "none", "active")
+        row = UserSubscriptionHistory.objects.get()
+        with self.assertRaises(ValidationError):
+            row.save()
+        with self.assertRaises(ValidationError):
+            UserSubscriptionHistory.objects.update(notes="x")
+
+    def test_rebuild_matches_incremental(self):
+        UserSubscriptionCurrent.objects.create(user=self.user, plan=self.pro)
+        before = list(SubscriptionMonthlySummary.objects.values())
+        call_command("rebuild_subscription_summary", stdout=open("/dev/null", "w"))
+        after = list(SubscriptionMonthlySummary.objects.values())
+        self.assertEqual([{k: v for k, v in r.items() if k != "id"} for r in before],
+                         [{k: v for k, v in r.items() if k != "id"} for r in after])
+
+    def test_recurring_payments_are_renewals(self):
+        _apply_payment(self.user.pk, "basic", "p1", 1000)  # alta: el primer cobro es el del alta
+        _apply_payment(self.user.pk, "basic", "p1", 1000)  # reintento de MP
+        _apply_payment(self.user.pk, "basic", "p2", "1000.00")
+
+        rows = list(UserSubscriptionHistory.objects.order_by("pk").values_list("status_from", "price_paid", "notes"))
+        self.assertEqual(
+            rows,
+            [
+                ("none", Decimal("1000.00"), ""),
+                ("active", None, "mp_payment:p1"),
+                ("active", Decimal("1000.00"), "mp_payment:p2"),
+            ],
+        )
+        basic = self._summary(self.basic)
+        self.assertEqual((basic.activations, basic.renewals, basic.revenue), (1, 1, Decimal("2000.00")))
+        before = list(SubscriptionMonthlySummary.objects.values("renewals", "revenue"))
+        ledger.rebuild_summary()
+        self.assertEqual(list(SubscriptionMonthlySummary.objects.values("renewals", "revenue")), before)
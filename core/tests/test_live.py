@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import live
+from core.models import Plan, UserSubscriptionCurrent
+
+
+@override_settings(LIVE_BACKEND="cache", LIVE_HEARTBEAT_SECONDS=0.05, LIVE_STREAM_MAX_SECONDS=0.2)
+class LiveEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = Plan.objects.create(code="pro", name="Pro", price_month="2000.00", rut_quota=2)
+        cls.user = get_user_model().objects.create_user(username="a", email="a@example.com")
+
+    def setUp(self):
+        cache.clear()
+
+    def _activate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscriptionCurrent.objects.create(user=self.user, plan=self.plan)
+
+    async def test_hub_receives_state_after_commit(self):
+        q = live.hub.subscribe(self.user.pk)
+        try:
+            await sync_to_async(self._activate)()
+            await live.hub._listener.poll_once()
+            payload = q.get_nowait()
+            self.assertEqual((payload["status"], payload["plan"]), ("active", "pro"))
+            # Ya entregado: un segundo sondeo no lo repite
+            await live.hub._listener.poll_once()
+            self.assertTrue(q.empty())
+        finally:
+            live.hub.unsubscribe(self.user.pk, q)
+        self.assertIsNone(live.hub._listener)
+
+    async def test_stream_sends_current_state_and_heartbeat(self):
+        await self.async_client.aforce_login(self.user)
+        resp = await self.async_client.get(reverse("account_events"))
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in resp.streaming_content]).decode()
+        self.assertIn('event: subscription\ndata: {"status":"none"', body)
+        self.assertIn(": ping", body)
+
+    def test_account_script_only_while_pending(self):
+        self.client.force_login(self.user)
+        self.assertNotContains(self.client.get(reverse("account")), "account/events")
+
+        basic = Plan.objects.create(code="basic", name="Básico", price_month="1000.00", rut_quota=1)
+        UserSubscriptionCurrent.objects.create(user=self.user, plan=self.plan, pending_plan=basic)
+        resp = self.client.get(reverse("account"))
+        self.assertContains(resp, "?poll=1")  # WSGI: sondeo corto, sin EventSource
+        self.assertNotContains(resp, "new EventSource")
+        self.assertEqual(
+            self.client.get(reverse("account_events")).json(), {"status": "active", "plan": "pro", "pending": True}
+        )
+
+    async def test_account_uses_sse_under_asgi(self):
+        basic = await Plan.objects.acreate(code="basic", name="Básico", price_month="1000.00", rut_quota=1)
+        await UserSubscriptionCurrent.objects.acreate(user=self.user, plan=self.plan, pending_plan=basic)
+        await self.async_client.aforce_login(self.user)
+        resp = await self.async_client.get(reverse("account"))
+        self.assertContains(resp, "new EventSource")
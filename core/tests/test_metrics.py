@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import Counter, Gauge, Histogram, Registry, instrument_mp_sdk, webhook_topic
+
+
+class RegistryTests(SimpleTestCase):
+    def test_render_text_format(self):
+        reg = Registry()
+        c = Counter("t_events_total", "Eventos", ("topic",), registry=reg)
+        h = Histogram("t_seconds", "Duración", buckets=(0.1, 1.0), registry=reg)
+        c.inc(topic="payment")
+        c.inc(2, topic="payment")
+        h.observe(0.05)
+        h.observe(0.5)
+
+        text = reg.render()
+        self.assertIn("# TYPE t_events_total counter", text)
+        self.assertIn('t_events_total{topic="payment"} 3.0', text)
+        self.assertIn('t_seconds_bucket{le="0.1"} 1.0', text)
+        self.assertIn('t_seconds_bucket{le="+Inf"} 2.0', text)
+        self.assertIn("t_seconds_count 2.0", text)
+
+    def test_multiprocess_files_are_merged(self):
+        with tempfile.TemporaryDirectory() as d, override_settings(METRICS_MULTIPROC_DIR=d):
+            reg = Registry()
+            c = Counter("t_total", "x", registry=reg)
+            g = Gauge("t_gauge", "x", multiprocess_mode="max", registry=reg)
+            c.inc(5)
+            g.set(3)
+            # Archivo de otro worker (pid ficticio, ya terminado)
+            with open(os.path.join(d, "metrics_999999.json"), "w") as fh:
+                fh.write('{"t_total": [[[], 2.0]], "t_gauge": [[[], 7.0]]}')
+
+            text = reg.render()
+            self.assertIn("t_total 7.0", text)
+            self.assertIn("t_gauge 7.0", text)
+            self.assertTrue(os.path.exists(os.path.join(d, f"metrics_{os.getpid()}.json")))
+
+    def test_webhook_topic_is_bounded(self):
+        self.assertEqual(webhook_topic("payment", None), "payment")
+        self.assertEqual(webhook_topic(None, "preapproval.updated"), "preapproval")
+        self.assertEqual(webhook_topic("x" * 500, "whatever.created"), "other")
+        self.assertEqual(webhook_topic(["payment"], {"a": 1}), "other")
+
+    def test_instrumented_sdk_records_calls(self):
+        reg_before = _sample("autocs_mp_calls_total")
+
+        class _Res:
+            def get(self, _id):
+                return {"status": 200, "response": {}}
+
+        class _SDK:
+            def payment(self):
+                return _Res()
+
+        sdk = instrument_mp_sdk(_SDK())
+        self.assertEqual(sdk.payment().get(1)["status"], 200)
+        self.assertGreater(_sample("autocs_mp_calls_total"), reg_before)
+
+
+def _sample(name: str) -> float:
+    from core.metrics import REGISTRY
+
+    return sum(v for v in REGISTRY.collect()[name].values())
+
+
+@override_settings(METRICS_API_KEY="k")
+class MetricsEndpointTests(TestCase):
+    def test_requires_key(self):
+        resp = self.client.get(reverse("metrics"))
+        self.assertEqual(resp.status_code, 403)
+
+    def test_exposes_without_db_queries(self):
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer k")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("autocs_webhook_events_total", resp.content.decode())
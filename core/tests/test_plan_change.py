@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import views_flow
+
+from core.models import Plan, UserRutSlot, UserSubscriptionCurrent
+from core.subscriptions import activate_plan, start_plan_change
+from core.views import _apply_preapproval
+
+
+class _FakePreapproval:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, pid, data):
+        self.updates.append((pid, data))
+        return {"status": 200}
+
+    def create(self, data):
+        return {"status": 400, "response": {"message": "invalid payer"}}
+
+
+class _FakeSDK:
+    def __init__(self):
+        self.pre = _FakePreapproval()
+
+    def preapproval(self):
+        return self.pre
+
+
+class PlanChangeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.basic = Plan.objects.create(code="basic", name="Básico", price_month="1000.00", rut_quota=1)
+        cls.pro = Plan.objects.create(code="pro", name="Pro", price_month="2000.00", rut_quota=5)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="u", email="u@example.com")
+
+    def test_start_keeps_row_and_slots(self):
+        activate_plan(self.user.pk, self.pro, provider="mercadopago", external_id="old", days=30)
+        UserRutSlot.objects.filter(user=self.user, slot_index=1).update(rut="12345678-5", state="available")
+        sdk = _FakeSDK()
+
+        start_plan_change(self.user.pk, self.basic, sdk)
+
+        self.assertEqual(sdk.pre.updates, [("old", {"status": "cancelled"})])
+        usc = UserSubscriptionCurrent.objects.get(user=self.user)
+        self.assertEqual((usc.plan, usc.pending_plan, usc.status), (self.pro, self.basic, "active"))
+        self.assertEqual(UserRutSlot.objects.filter(user=self.user).count(), 5)
+
+    def test_cancel_webhook_of_replaced_preapproval_is_ignored(self):
+        activate_plan(self.user.pk, self.pro, provider="mercadopago", external_id="old", days=30)
+        start_plan_change(self.user.pk, self.basic, _FakeSDK())
+
+        # MP avisa la cancelación del preapproval viejo antes de confirmar el nuevo
+        _apply_preapproval(self.user.pk, "pro", "old", "cancelled")
+        usc = UserSubscriptionCurrent.objects.get(user=self.user)
+        self.assertEqual((usc.plan, usc.pending_plan, usc.replaced_subscription_id), (self.pro, self.basic, "old"))
+        self.assertEqual(UserRutSlot.objects.filter(user=self.user).count(), 5)
+
+        _apply_preapproval(self.user.pk, "basic", "new", "authorized")
+        _apply_preapproval(self.user.pk, "pro", "old", "cancelled")  # llega tarde
+        usc = UserSubscriptionCurrent.objects.get(user=self.user)
+        self.assertEqual((usc.plan, usc.external_subscription_id), (self.basic, "new"))
+        self.assertEqual(UserRutSlot.objects.filter(user=self.user).count(), 1)
+
+        _apply_preapproval(self.user.pk, "basic", "new", "cancelled")
+        self.assertFalse(UserSubscriptionCurrent.objects.filter(user=self.user).exists())
+
+    def test_failed_checkout_keeps_current_plan(self):
+        activate_plan(self.user.pk, self.pro, provider="mercadopago", external_id="old", days=30)
+        sdk = _FakeSDK()
+        self.client.force_login(self.user)
+
+        with mock.patch.object(views_flow, "_get_mp_sdk", return_value=sdk):
+            resp = self.client.get(reverse("contratar_plan", args=["basic"]))
+
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(sdk.pre.updates, [])
+        usc = UserSubscriptionCurrent.objects.get(user=self.user)
+        self.assertEqual((usc.plan, usc.pending_plan, usc.replaced_subscription_id), (self.pro, None, ""))
+
+    def test_upgrade_creates_missing_in_one_insert(self):
+        activate_plan(self.user.pk, self.basic)
+        with CaptureQueriesContext(connection) as ctx:
+            activate_plan(self.user.pk, self.pro)
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "core_userrutslot"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            list(UserRutSlot.objects.filter(user=self.user).values_list("slot_index", flat=True).order_by("slot_index")),
+            [1, 2, 3, 4, 5],
+        )
+        self.assertIsNone(UserSubscriptionCurrent.objects.get(user=self.user).pending_plan)
+
+    def test_downgrade_preserves_saved_ruts(self):
+        activate_plan(self.user.pk, self.pro)
+        UserRutSlot.objects.filter(user=self.user, slot_index=4).update(rut="12345678-5", state="locked")
+
+        activate_plan(self.user.pk, self.basic)
+
+        slots = list(UserRutSlot.objects.filter(user=self.user))
+        self.assertEqual(len(slots), 1)
+        self.assertEqual((slots[0].slot_index, slots[0].rut, slots[0].state), (1, "12345678-5", "available"))
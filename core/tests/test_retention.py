@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import retention
+from core.models import (
+    FileDeletion, FileUpload, Form, FormAggregate, FormPayload, FormTransition, UploadSession, UserRutSlot,
+)
+
+
+class RetentionPurgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="r", email="r@example.com")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=self.tmp.name, STORAGE_FSYNC="never")
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _file(self, rel, size):
+        path = Path(self.tmp.name) / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        return path
+
+    def _form(self, days_old, status="done"):
+        form = Form.objects.create(user=self.user, type="compras", status=status)
+        Form.objects.filter(pk=form.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        self._file(f"uploads/{form.pk}.csv", 100)
+        FileUpload.objects.create(
+            form=form, file_kind="compras_33", storage_uri=f"uploads/{form.pk}.csv",
+            original_filename="c.csv", rows_count=3, row_hashes=b"\0" * 24,
+        )
+        self._file(f"payloads/{form.pk}.acp", 50)
+        FormPayload.objects.create(form=form, payload_json={}, columns_uri=f"payloads/{form.pk}.acp", columns_size=50)
+        FormPayload.objects.create(form=form, payload_json={}, columns_blob=b"y" * 10, columns_size=10)
+        FormAggregate.objects.create(form=form, file_kind="compras_33", counterparty_rut="1-9", doc_type=33, period="2024-01", rows=3)
+        FormTransition.objects.create(form=form, from_status="stored", to_status=status)
+        return form
+
+    def test_purges_expired_forms_in_batches_with_files(self):
+        old = [self._form(400), self._form(500)]
+        busy = self._form(400, status="validating")
+        recent = self._form(10)
+        session = UploadSession.objects.create(
+            user=self.user, form=old[0], file_kind="compras_46", filename="c.csv", size=10,
+            chain_sha256="0" * 64, expires_at=timezone.now(),
+        )
+        part = self._file(f"uploads/parts/{session.pk}.part", 7)
+        seen = []
+
+        res = retention.purge(retention.cutoff(365), batch_size=1, progress=lambda r: seen.append(r.forms))
+        self.assertEqual(seen, [1, 2])
+        self.assertEqual(set(Form.objects.values_list("pk", flat=True)), {busy.pk, recent.pk})
+        self.assertEqual(res.rows["FormPayload"], 4)
+        self.assertEqual(res.rows["UploadSession"], 1)
+        self.assertEqual((res.files, res.file_bytes, res.db_bytes), (5, 2 * 150 + 7, 2 * (10 + 24)))
+        self.assertFalse((Path(self.tmp.name) / f"uploads/{old[1].pk}.csv").exists())
+        self.assertFalse(part.exists())
+        self.assertTrue((Path(self.tmp.name) / f"uploads/{recent.pk}.csv").exists())
+        self.assertFalse(FileDeletion.objects.exists())
+
+    def test_keeps_form_that_locked_a_slot(self):
+        first, other = self._form(400), self._form(400)
+        slot = UserRutSlot.objects.create(
+            user=self.user, slot_index=1, rut="12345678-5", state="locked",
+            locked_at=timezone.now(), locked_by_form=first,
+        )
+        res = retention.purge(retention.cutoff(365))
+        self.assertEqual(res.forms, 1)
+        self.assertEqual(list(Form.objects.values_list("pk", flat=True)), [first.pk])
+        slot.refresh_from_db()
+        self.assertEqual((slot.state, slot.locked_by_form_id), ("locked", first.pk))
+        self.assertFalse(Form.objects.filter(pk=other.pk).exists())
+
+    def test_pending_files_are_resumed_and_failures_kept(self):
+        leftover = self._file("uploads/leftover.csv", 5)
+        FileDeletion.objects.create(uri="uploads/leftover.csv")
+        self._form(400)
+        with mock.patch.object(retention, "_delete_file", side_effect=[5, OSError("disco"), OSError("disco")]):
+            res = retention.purge(retention.cutoff(365))
+        self.assertEqual((res.files, res.files_failed, res.forms), (1, 2, 1))
+        self.assertEqual(list(FileDeletion.objects.values_list("attempts", "last_error")), [(1, "disco")] * 2)
+        self.assertTrue(leftover.exists())  # _delete_file simulado
+
+        res = retention.purge(retention.cutoff(365))
+        self.assertEqual((res.files, res.file_bytes, res.forms), (2, 150, 0))
+        self.assertFalse(FileDeletion.objects.exists())
+
+    def test_disabled_without_days(self):
+        with override_settings(FORM_RETENTION_DAYS=0):
+            self.assertIsNone(retention.cutoff())
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import form_processing as fp
+from core import retention, rut_summary
+from core.models import FileUpload, Form, Plan, RutFormSummary, UserRutSlot, UserSubscriptionCurrent
+
+CSV = "Tipo Doc;Folio;Monto Total\n33;1;1190\n33;2;595\n"
+FIELDS = ("rut", "submitted", "compras", "ventas", "done", "error", "compras_total", "ventas_total")
+
+
+class RutSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="r", email="r@example.com")
+        cls.slot = UserRutSlot.objects.create(user=cls.user, slot_index=1, rut="11111111-1", state="available")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _submit(self, form_type="compras", content=CSV, rut="11.111.111-1"):
+        form = Form.objects.create(user=self.user, type=form_type, sii_rut=rut)
+        for kind in fp.FILE_KINDS[form_type]:
+            path = Path(self.tmp.name) / f"{form.pk}_{kind}.csv"
+            path.write_text(content, encoding="utf-8")
+            FileUpload.objects.create(form=form, file_kind=kind, storage_uri=str(path), original_filename="x.csv")
+        form.submit_and_lock_first_use(slot_id=self.slot.pk)
+        return form
+
+    def _process_all(self):
+        while fp.process_batch().claimed:  # la cola justa toma un Form por usuario a la vez
+            pass
+
+    def _rows(self):
+        return list(RutFormSummary.objects.filter(user=self.user).order_by("rut").values_list(*FIELDS))
+
+    def test_incremental_matches_rebuild(self):
+        self._submit()
+        self._submit("ventas")
+        self._submit(content="Folio\n1\n")  # termina en error
+        self.assertEqual(self._rows(), [("11111111-1", 3, 2, 1, 0, 0, 0, 0)])
+        self._process_all()
+        incremental = self._rows()
+        self.assertEqual(incremental, [("11111111-1", 3, 2, 1, 2, 1, 2 * 1785, 2 * 1785)])
+        self.assertIsNotNone(RutFormSummary.objects.get().last_submitted_at)
+
+        RutFormSummary.objects.update(submitted=99)
+        self.assertEqual(rut_summary.rebuild([self.user.pk]), 1)
+        self.assertEqual(self._rows(), incremental)
+
+    @override_settings(STORAGE_FSYNC="never")
+    def test_retention_subtracts_purged_forms(self):
+        self._submit("ventas")  # bloquea el slot por primer uso: la retención lo conserva
+        old = self._submit()
+        self._process_all()
+        Form.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        with override_settings(MEDIA_ROOT=self.tmp.name):
+            retention.purge(retention.cutoff(365))
+        self.assertEqual(self._rows(), [("11111111-1", 1, 0, 1, 1, 0, 0, 2 * 1785)])
+        rut_summary.rebuild([self.user.pk])
+        self.assertEqual(self._rows(), [("11111111-1", 1, 0, 1, 1, 0, 0, 2 * 1785)])
+
+    def test_account_page_shows_summary(self):
+        plan = Plan.objects.create(code="pro", name="Pro", price_month="1.00", rut_quota=5)
+        UserSubscriptionCurrent.objects.create(user=self.user, plan=plan, status="active")
+        self._submit()
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("account"))
+        self.assertContains(resp, "1 (1 compras, 0 ventas)")
+
+    def test_formulario_submit_uses_slot_rut(self):
+        plan = Plan.objects.create(code="pro", name="Pro", price_month="1.00", rut_quota=5)
+        UserSubscriptionCurrent.objects.create(user=self.user, plan=plan, status="active")
+        draft = Form.objects.create(user=self.user, type="compras", sii_rut="")
+        FileUpload.objects.create(form=draft, file_kind="compras_33", storage_uri="x.csv", original_filename="x.csv")
+        self.client.force_login(self.user)
+        self.client.post(reverse("formulario"), {"slot_id": self.slot.pk, "form_id": draft.pk, "sii_rut": ""})
+        draft.refresh_from_db()
+        self.assertEqual((draft.status, draft.sii_rut), ("stored", "11111111-1"))
+        self.assertEqual(self._rows(), [("11111111-1", 1, 1, 0, 0, 0, 0, 0)])
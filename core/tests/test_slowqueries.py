@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.models import SlowQuery
+from core.slowqueries import fingerprint, normalize_sql, slow_query_wrapper
+
+
+class SlowQueryTests(TestCase):
+    def test_normalize_collapses_literals(self):
+        a = normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'")
+        b = normalize_sql("SELECT *  FROM t WHERE id IN (%s) AND name = 'yy'")
+        self.assertEqual(a, b)
+        self.assertEqual(a, "SELECT * FROM t WHERE id IN (...) AND name = ?")
+        # identificadores con dígitos se mantienen
+        self.assertIn("core_t2_idx", normalize_sql('SELECT 1 FROM "core_t2_idx" LIMIT 21'))
+
+    def test_fingerprint_stable(self):
+        self.assertEqual(
+            fingerprint("SELECT a FROM t WHERE b = 1")[0],
+            fingerprint("SELECT a FROM t WHERE b = 2")[0],
+        )
+
+    def test_wrapper_records_and_report(self):
+        User = get_user_model()
+        with override_settings(SLOW_QUERY_MS=0.000001, SLOW_QUERY_PERSIST=True):
+            with connection.execute_wrapper(slow_query_wrapper):
+                User.objects.filter(email="a@example.com").first()
+                User.objects.filter(email="b@example.com").first()
+
+        rows = list(SlowQuery.objects.all())
+        self.assertGreaterEqual(len(rows), 2)
+        fps = {r.fingerprint for r in rows}
+        self.assertEqual(len(fps), 1)
+        self.assertIn("core/tests/test_slowqueries.py", rows[0].call_site)
+        self.assertIn("a@example.com", rows[0].params)
+        self.assertIsNone(rows[0].explain)  # sqlite: sin EXPLAIN
+
+        out = StringIO()
+        call_command("slow_queries", stdout=out)
+        self.assertIn(rows[0].fingerprint, out.getvalue())
+        self.assertIn("calls=2", out.getvalue())
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core import form_processing as fp
+from core import storage
+from core.models import FileUpload, Form
+from core.s3_standin import S3StandIn
+
+CSV = b"Tipo Doc;Folio;Monto Total\n33;1;1190\n33;2;595\n"
+
+
+class LocalStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = storage.LocalStorage(self.tmp.name, fanout=2)
+
+    def test_fanout_atomic_write_and_ranges(self):
+        uri = self.store.put_stream("uploads/a.csv", io.BytesIO(CSV))
+        self.assertRegex(uri, r"^uploads/[0-9a-f]{2}/[0-9a-f]{2}/a\.csv$")
+        self.assertEqual(self.store.path(uri).read_bytes(), CSV)
+        self.assertEqual(self.store.read_range(uri, 9, 5), CSV[9:14])
+        self.assertEqual(os.listdir(self.store.path(uri).parent), ["a.csv"])  # sin temporales
+
+        src = Path(self.tmp.name) / "x.part"
+        src.write_bytes(b"nuevo")
+        self.assertEqual(self.store.put_file("uploads/a.csv", src, move=True), uri)  # reemplaza
+        self.assertFalse(src.exists())
+        self.assertEqual(self.store.size(uri), 5)
+        with self.assertRaises(ValueError):
+            storage.LocalStorage(self.tmp.name, fsync="a veces")
+
+    def test_backend_by_scheme(self):
+        cfg = {**storage.config(), "root": self.tmp.name}
+        self.assertIsInstance(storage.backend("file://", cfg), storage.LocalStorage)
+        self.assertEqual(storage.backend("file:///srv/csv", cfg).root, Path("/srv/csv"))
+        s3 = storage.backend("s3://b/pre", cfg)
+        self.assertEqual((s3.bucket, s3.uri_for("uploads/a.csv")), ("b", "s3://b/pre/uploads/a.csv"))
+        with self.assertRaises(ValueError):
+            storage.backend("ftp://x", cfg)
+
+
+class S3StorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="s", email="s@example.com")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.srv = S3StandIn(self.tmp.name).start()
+        self.addCleanup(self.srv.stop)
+        override = override_settings(
+            STORAGE_UPLOADS_URI="s3://csv/sii", STORAGE_S3_ENDPOINT=self.srv.endpoint,
+            STORAGE_S3_ACCESS_KEY=self.srv.access_key, STORAGE_S3_SECRET_KEY=self.srv.secret_key,
+            STORAGE_S3_PART_MB=5,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.store = storage.uploads()
+        self.store.create_bucket()
+        self.addCleanup(self.store.close)
+
+    def test_multipart_stream_ranges_and_missing(self):
+        data = os.urandom(11 * 1024 * 1024)  # 3 partes de 5 MiB
+        uri = self.store.put_stream("big.bin", io.BytesIO(data))
+        self.assertEqual(uri, "s3://csv/sii/big.bin")
+        self.assertEqual(self.store.size(uri), len(data))
+        self.assertEqual(self.store.read_range(uri, 5 * 1024 * 1024 - 3, 10), data[5 * 1024 * 1024 - 3 : 5 * 1024 * 1024 + 7])
+        with contextlib.closing(self.store.open(uri)) as fh:
+            self.assertEqual(fh.read(), data)
+        self.assertFalse(os.listdir(Path(self.tmp.name) / ".multipart"))
+
+        self.store.delete(uri)
+        with self.assertRaises(FileNotFoundError):
+            self.store.size(uri)
+        bad = storage.S3Storage("csv", endpoint=self.srv.endpoint, access_key=self.srv.access_key, secret_key="x")
+        with self.assertRaises(storage.StorageError):
+            bad.put_stream("x", io.BytesIO(b"x"))
+
+    def test_forms_are_processed_from_s3(self):
+        form = Form.objects.create(user=self.user, type="compras", status="stored", submitted_at=timezone.now())
+        for kind in ("compras_33", "compras_46"):
+            uri = self.store.put_stream(f"uploads/{form.pk}-{kind}.csv", io.BytesIO(CSV))
+            FileUpload.objects.create(form=form, file_kind=kind, storage_uri=uri, original_filename=f"{kind}.csv")
+        self.assertEqual(fp.process_batch().done, 1)
+        form.refresh_from_db()
+        self.assertEqual(form.form_payloads.get().payload_json["totals"]["Monto Total"], 2 * 1785)
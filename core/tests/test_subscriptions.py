@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import (
+    AuditLog,
+    Plan,
+    UserRutSlot,
+    UserSubscriptionCurrent,
+    UserSubscriptionHistory,
+)
+from core.subscriptions import expire_due_subscriptions
+
+
+class ExpirySweeperTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = Plan.objects.create(code="pro", name="Pro", price_month="2000.00", rut_quota=2)
+
+    def _subscribe(self, username: str, expires_in_days: int) -> UserSubscriptionCurrent:
+        user = get_user_model().objects.create_user(username=username, email=f"{username}@example.com")
+        return UserSubscriptionCurrent.objects.create(
+            user=user, plan=self.plan, expires_at=timezone.now() + timedelta(days=expires_in_days)
+        )
+
+    def test_expires_in_batches_and_writes_history(self):
+        expired = [self._subscribe(f"old{i}", -1 - i) for i in range(5)]
+        fresh = self._subscribe("fresh", 10)
+        slot = UserRutSlot.objects.get(user=expired[0].user, slot_index=1)
+        UserRutSlot.objects.filter(pk=slot.pk).update(rut="12345678-5", state="available")
+
+        res = expire_due_subscriptions(batch_size=2)
+
+        self.assertEqual(res.expired, 5)
+        self.assertEqual(res.batches, 3)
+        self.assertEqual(
+            UserSubscriptionCurrent.objects.filter(status="past_due").count(), 5
+        )
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, "active")
+        self.assertEqual(UserSubscriptionHistory.objects.filter(status_to="past_due").count(), 5)
+        self.assertEqual(AuditLog.objects.filter(action="subscription_expired").count(), 5)
+
+        slot.refresh_from_db()
+        self.assertEqual(slot.state, "locked")
+        self.assertIsNone(slot.locked_by_form)
+
+        # Segunda pasada: nada pendiente
+        self.assertEqual(expire_due_subscriptions().expired, 0)
+
+    def test_reactivation_thaws_frozen_slots(self):
+        sub = self._subscribe("u", -1)
+        UserRutSlot.objects.filter(user=sub.user, slot_index=1).update(rut="12345678-5", state="available")
+        call_command("expire_subscriptions", stdout=open("/dev/null", "w"))
+
+        sub.refresh_from_db()
+        sub.status = "active"
+        sub.expires_at = timezone.now() + timedelta(days=30)
+        sub.save()
+
+        slot = UserRutSlot.objects.get(user=sub.user, slot_index=1)
+        self.assertEqual(slot.state, "available")
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import uploads
+from core.models import FileDeletion, FileUpload, Form, UploadSession
+
+DATA = b"Tipo Doc;Folio;Monto Total\n" + b"".join(b"33;%d;1190\n" % i for i in range(200))
+
+
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="u", email="u@example.com")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=self.tmp.name, UPLOAD_CHUNK_MAX_BYTES=1024)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.user)
+
+    def _create(self, size=len(DATA)):
+        resp = self.client.post(
+            reverse("upload_create"),
+            data={"file_kind": "compras_33", "filename": "c33.csv", "size": size, "sii_rut": "1-9"},
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 201, resp.content)
+        return resp.json()
+
+    def _put(self, sid, offset, chunk, checksum=None):
+        return self.client.put(
+            reverse("upload_session", args=[sid]),
+            data=chunk,
+            content_type="application/octet-stream",
+            headers={"Upload-Offset": str(offset), "X-Chunk-Sha256": checksum or hashlib.sha256(chunk).hexdigest()},
+        )
+
+    def test_chunks_resume_and_complete(self):
+        s = self._create()
+        chunks = [DATA[i : i + 1000] for i in range(0, len(DATA), 1000)]
+        self.assertEqual(self._put(s["id"], 0, chunks[0]).json()["offset"], 1000)
+
+        # checksum malo: se descarta y el offset no avanza
+        bad = self._put(s["id"], 1000, chunks[1], checksum="0" * 64)
+        self.assertEqual(bad.status_code, 400)
+        # parte fuera de orden: 409 con el offset desde el que reanudar
+        skip = self._put(s["id"], 2000, chunks[2])
+        self.assertEqual((skip.status_code, skip.json()["offset"]), (409, 1000))
+        self.assertEqual(self.client.get(reverse("upload_session", args=[s["id"]])).json()["offset"], 1000)
+
+        expected = bytes(32)
+        for i, chunk in enumerate(chunks):
+            if i:
+                self.assertEqual(self._put(s["id"], i * 1000, chunk).status_code, 200)
+            expected = hashlib.sha256(expected + hashlib.sha256(chunk).digest()).digest()
+
+        wrong = self.client.post(
+            reverse("upload_complete", args=[s["id"]]), data={"sha256": "ab" * 32}, content_type="application/json"
+        )
+        self.assertEqual(wrong.status_code, 400)
+        done = self.client.post(
+            reverse("upload_complete", args=[s["id"]]), data={"sha256": expected.hex()}, content_type="application/json"
+        )
+        self.assertEqual(done.status_code, 200, done.content)
+        fu = FileUpload.objects.get(pk=done.json()["file_upload_id"])
+        self.assertEqual((Path(self.tmp.name) / fu.storage_uri).read_bytes(), DATA)
+        self.assertEqual(fu.form.status, "draft")
+        self.assertEqual(UploadSession.objects.get(pk=s["id"]).status, "complete")
+        self.assertEqual(self._put(s["id"], len(DATA), b"x").status_code, 410)
+
+    def test_rejects_incomplete_and_oversized(self):
+        s = self._create()
+        self.assertEqual(self._put(s["id"], 0, DATA[:2000]).status_code, 400)  # > UPLOAD_CHUNK_MAX_BYTES
+        resp = self.client.post(reverse("upload_complete", args=[s["id"]]), content_type="application/json")
+        self.assertEqual((resp.status_code, resp.json()["offset"]), (409, 0))
+        with self.assertRaises(uploads.UploadError):
+            uploads.create_session(self.user, file_kind="ventas_33", filename="v.csv", size=10)
+
+    def test_other_user_cannot_see_session(self):
+        s = self._create()
+        other = get_user_model().objects.create_user(username="o", email="o@example.com")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse("upload_session", args=[s["id"]])).status_code, 404)
+        self.assertEqual(self._put(s["id"], 0, DATA[:100]).status_code, 404)
+
+    def test_submitted_form_takes_no_more_parts(self):
+        s = self._create()
+        self.assertEqual(self._put(s["id"], 0, DATA[:1000]).status_code, 200)
+        Form.objects.filter(pk=s["form_id"]).update(status="stored")
+        self.assertEqual(self._put(s["id"], 1000, DATA[1000:2000]).status_code, 400)
+        resp = self.client.post(reverse("upload_complete", args=[s["id"]]), content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(FileUpload.objects.exists())
+
+    def test_create_rejects_malformed_body(self):
+        ok = {"file_kind": "compras_33", "filename": "c.csv", "size": 10}
+        for body in (
+            [1, 2], "x", {"form_id": "abc", "size": 10}, {"form_id": [1]},
+            {**ok, "file_kind": 5}, {**ok, "filename": ["c.csv"]},
+            {**ok, "type": "foo"}, {**ok, "file_kind": "ventas_33"}, {**ok, "sii_rut": "1" * 40},
+        ):
+            resp = self.client.post(reverse("upload_create"), data=body, content_type="application/json")
+            self.assertEqual(resp.status_code, 400, body)
+        self.assertFalse(Form.objects.exists())  # ningún borrador huérfano
+
+    def test_part_is_read_outside_the_transaction(self):
+        s = self._create()
+        session = UploadSession.objects.get(pk=s["id"])
+        depth = len(connection.savepoint_ids)  # TestCase ya envuelve el test en un atómico
+        seen = []
+
+        class Stream:
+            def __init__(self, data):
+                self.data = data
+
+            def read(self, n):
+                seen.append(len(connection.savepoint_ids))
+                block, self.data = self.data[:n], self.data[n:]
+                return block
+
+        chunk = DATA[:1000]
+        uploads.write_chunk(self.user, s["id"], 0, Stream(chunk), len(chunk), hashlib.sha256(chunk).hexdigest())
+        self.assertEqual(set(seen), {depth})
+        # Otra parte en curso (flock tomado): 409 sin tocar el offset
+        with uploads._locked_part(uploads.part_path(session)):
+            resp = self._put(s["id"], 1000, DATA[1000:2000])
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(UploadSession.objects.get(pk=s["id"]).received, 1000)
+
+    def test_replaced_file_is_queued_for_deletion(self):
+        s = self._create(size=100)
+        old = FileUpload.objects.create(form_id=s["form_id"], file_kind="compras_33", storage_uri="uploads/old.csv")
+        self.assertEqual(self._put(s["id"], 0, DATA[:100]).status_code, 200)
+        resp = self.client.post(reverse("upload_complete", args=[s["id"]]), content_type="application/json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertFalse(FileUpload.objects.filter(pk=old.pk).exists())
+        self.assertEqual(list(FileDeletion.objects.values_list("uri", flat=True)), ["uploads/old.csv"])
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+
+from allauth.socialaccount.models import SocialAccount
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.user_sync import allocate_username
+
+
+class UsernameAllocationTests(TestCase):
+    def test_allocates_first_free_suffix(self):
+        taken = {"ana", "ana-1", "ana-3"}
+        self.assertEqual(allocate_username("ana", taken), "ana-2")
+        self.assertEqual(allocate_username("ana", taken), "ana-4")
+        self.assertEqual(allocate_username("bob", taken), "bob")
+
+
+@override_settings(FRONTEND_SYNC_API_KEY="k")
+class UpsertUsersApiTests(TestCase):
+    def _post(self, users):
+        return self.client.post(
+            reverse("api_auth_upsert_users"),
+            data=json.dumps({"users": users}),
+            content_type="application/json",
+            HTTP_X_API_KEY="k",
+        )
+
+    def test_batch_creates_updates_and_links(self):
+        User = get_user_model()
+        User.objects.create_user(username="ana", email="ana@example.com")
+        User.objects.create_user(username="ana-1", email="other@example.com")
+
+        resp = self._post([
+            {"email": "ANA@example.com", "name": "Ana Pérez"},
+            {"email": "ana@other.com", "name": "Ana Dos", "provider": "google", "provider_account_id": "g1"},
+            {"email": "ana@third.com"},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual((data["created"], data["updated"], data["social_linked"]), (2, 1, 1))
+        self.assertEqual(
+            sorted(User.objects.filter(email__in=["ana@other.com", "ana@third.com"]).values_list("username", flat=True)),
+            ["ana-2", "ana-3"],
+        )
+        self.assertEqual(User.objects.get(email="ana@example.com").first_name, "Ana")
+        self.assertTrue(SocialAccount.objects.filter(provider="google", uid="g1", user_id=data["user_ids"]["ana@other.com"]).exists())
+
+        # Re-envío idempotente
+        data = self._post([{"email": "ana@other.com", "name": "Ana Dos", "provider": "google", "provider_account_id": "g1"}]).json()
+        self.assertEqual((data["created"], data["updated"], data["unchanged"], data["social_linked"]), (0, 0, 1, 0))
+
+    def test_non_string_fields_are_per_entry_errors(self):
+        resp = self._post([{"email": 5}, {"email": "ok@example.com", "name": ["x"]}, {"email": "b@example.com"}])
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(
+            data["errors"], [{"index": 0, "error": "email must be a string"}, {"index": 1, "error": "name must be a string"}]
+        )
+        self.assertEqual((data["created"], list(data["user_ids"])), (1, ["b@example.com"]))
+        self.assertEqual(self._post([{"email": " "}]).status_code, 400)
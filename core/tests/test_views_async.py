@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+
+from core import views_api, views_async
+from core.models import Plan, UserSubscriptionCurrent
+
+
+class _FakeMP:
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    async def preapproval_get(self, preapproval_id):
+        return {
+            "status": 200,
+            "response": {"status": "authorized", "external_reference": f"user:{self.user_id}|plan:pro"},
+        }
+
+
+@override_settings(FRONTEND_SYNC_API_KEY="k")
+class AsyncViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = Plan.objects.create(code="pro", name="Pro", price_month="2000.00", rut_quota=2)
+        cls.user = get_user_model().objects.create_user(username="a", email="a@example.com")
+
+    def setUp(self):
+        cache.clear()
+        self.arf = AsyncRequestFactory()
+
+    async def test_plans_and_status_match_sync_views(self):
+        resp = await views_async.api_plans_async(self.arf.get("/api/plans/"))
+        sync = await sync_to_async(views_api.api_plans)(RequestFactory().get("/api/plans/"))
+        self.assertEqual(json.loads(resp.content), json.loads(sync.content))
+
+        req = self.arf.get("/api/user/status/", {"email": "A@example.com"}, headers={"X-Api-Key": "k"})
+        data = json.loads((await views_async.api_user_status_async(req)).content)
+        self.assertEqual((data["has_user"], data["status"]), (True, "none"))
+
+    async def test_webhook_activates_plan(self):
+        body = json.dumps({"type": "preapproval", "data": {"id": "pre-1"}})
+        req = self.arf.post("/webhooks/mercadopago/", data=body, content_type="application/json")
+        with mock.patch.object(views_async, "get_async_mp", lambda: _FakeMP(self.user.pk)):
+            resp = await views_async.billing_webhook_async(req)
+        self.assertEqual(resp.status_code, 200)
+        usc = await UserSubscriptionCurrent.objects.aget(user=self.user)
+        self.assertEqual((usc.status, usc.external_subscription_id), ("active", "pre-1"))
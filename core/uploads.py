@@ -0,0 +1,235 @@
+# core/uploads.py
+"""Subida reanudable por partes de los CSV del SII (``/api/uploads/``).
+
+1. ``create_session`` reserva la subida (tamaño, tipo de archivo) sobre un Form en borrador.
+2. Las partes llegan en orden con su offset y su sha256. Cada una se escribe directo al
+   ``.part`` en bloques de ``READ_BLOCK`` mientras se hashea: el request nunca se carga
+   entero en memoria ni pasa por el manejo de uploads de Django. Mientras se lee del
+   cliente no hay transacción abierta; las partes de una sesión se serializan con
+   ``flock`` sobre el ``.part``.
+3. El hash del archivo se actualiza con cada parte como hash encadenado,
+   ``H_i = sha256(H_{i-1} || sha256(parte_i))`` con ``H_0`` = 32 bytes en cero: son 32 bytes
+   en la fila de la sesión (el estado de ``hashlib`` no se puede guardar entre requests ni
+   entre workers) y el cliente lo puede calcular igual.
+4. Si la conexión se corta, ``received`` dice desde dónde seguir. Una parte incompleta o
+   con checksum distinto se descarta truncando el archivo al offset anterior.
+5. ``complete`` verifica tamaño y hash, lleva el archivo al almacenamiento
+   (``core/storage.py``: rename en disco local, multipart a S3) y crea el ``FileUpload``.
+"""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import metrics, storage
+from .form_processing import FILE_KINDS
+from .models import FileDeletion, FileUpload, Form, UploadSession
+
+READ_BLOCK = 64 * 1024
+ZERO_CHAIN = "0" * 64
+
+
+class UploadError(Exception):
+    status = 400
+
+
+class OffsetMismatch(UploadError):
+    """La parte no empieza donde terminó la última confirmada."""
+
+    status = 409
+
+    def __init__(self, offset: int):
+        super().__init__(f"offset esperado {offset}")
+        self.offset = offset
+
+
+class SessionClosed(UploadError):
+    status = 410
+
+
+def chain(prev_hex: str, chunk_digest: bytes) -> str:
+    return hashlib.sha256(bytes.fromhex(prev_hex) + chunk_digest).hexdigest()
+
+
+def part_path(session: UploadSession) -> Path:
+    return Path(settings.MEDIA_ROOT) / "uploads" / "parts" / f"{session.pk}.part"
+
+
+def create_session(
+    user, *, file_kind: str, filename: str, size: int,
+    form: Optional[Form] = None, form_type: str = "compras", sii_rut: str = "",
+) -> UploadSession:
+    """Sesión sobre ``form`` (borrador del usuario) o sobre un Form borrador nuevo."""
+    if os.path.splitext(filename.lower())[1] != ".csv":
+        raise UploadError("Solo se acepta formato .csv")
+    max_mb = getattr(settings, "UPLOAD_MAX_MB", 200)
+    if size <= 0 or size > max_mb * 1024 * 1024:
+        raise UploadError(f"El archivo debe pesar entre 1 byte y {max_mb} MB")
+    if form is not None and (form.user_id != user.pk or form.status != "draft"):
+        raise UploadError("El formulario ya fue enviado")
+    if len(sii_rut) > Form._meta.get_field("sii_rut").max_length:
+        raise UploadError("RUT inválido")
+    ftype = form.type if form is not None else form_type
+    if ftype not in FILE_KINDS:
+        raise UploadError(f"Tipo de formulario inválido: {ftype}")
+    if file_kind not in FILE_KINDS[ftype]:
+        raise UploadError(f"{file_kind} no corresponde a un formulario de {ftype}")
+    hours = getattr(settings, "UPLOAD_SESSION_TTL_HOURS", 24)
+    # Todo validado antes de escribir: un error no deja un Form borrador huérfano
+    with transaction.atomic():
+        if form is None:
+            form = Form.objects.create(user=user, type=form_type, sii_rut=sii_rut)
+        return UploadSession.objects.create(
+            user=user,
+            form=form,
+            file_kind=file_kind,
+            filename=filename,
+            size=size,
+            chain_sha256=ZERO_CHAIN,
+            expires_at=timezone.now() + timedelta(hours=hours),
+        )
+
+
+def _open_for(user, session_id) -> UploadSession:
+    """Sesión abierta del usuario, con lock: una parte a la vez por sesión. También
+    bloquea el Form, que debe seguir en borrador (no se agregan archivos a un envío)."""
+    session = UploadSession.objects.select_for_update().filter(pk=session_id, user=user).first()
+    if session is None:
+        raise UploadSession.DoesNotExist
+    if session.status != "open" or session.expires_at <= timezone.now():
+        raise SessionClosed("La subida ya no está abierta")
+    status = Form.objects.select_for_update().filter(pk=session.form_id).values_list("status", flat=True).first()
+    if status != "draft":
+        raise UploadError("El formulario ya fue enviado")
+    return session
+
+
+class PartInProgress(UploadError):
+    """Otra parte de la misma sesión se está escribiendo (otro request del cliente)."""
+
+    status = 409
+
+
+def _check_part(session: UploadSession, offset: int, length: int) -> None:
+    if offset != session.received:
+        metrics.UPLOAD_CHUNKS.inc(result="offset")
+        raise OffsetMismatch(session.received)
+    if offset + length > session.size:
+        raise UploadError("La parte excede el tamaño declarado")
+
+
+@contextmanager
+def _locked_part(path: Path) -> Iterator[BinaryIO]:
+    """``.part`` abierto con ``flock`` exclusivo (no bloqueante): serializa las partes de
+    una sesión sin transacción abierta; el sistema lo libera si el worker muere."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b") as fh:
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise PartInProgress("Otra parte de esta subida está en curso")
+        yield fh
+
+
+def write_chunk(user, session_id, offset: int, stream: BinaryIO, length: int, checksum: str) -> UploadSession:
+    """Escribe una parte de ``length`` bytes leída de ``stream`` en ``offset``.
+
+    Las filas (sesión y Form) se bloquean solo para validar el offset y para confirmar la
+    parte: el cuerpo se lee del cliente fuera de la transacción, con el ``.part`` bajo
+    ``flock``. Un cliente lento solo retiene su archivo, no una conexión con locks."""
+    if length <= 0 or length > getattr(settings, "UPLOAD_CHUNK_MAX_BYTES", 8 * 1024 * 1024):
+        metrics.UPLOAD_CHUNKS.inc(result="too_large")
+        raise UploadError("Largo de parte inválido")
+    with transaction.atomic():
+        session = _open_for(user, session_id)
+        _check_part(session, offset, length)
+    with _locked_part(part_path(session)) as fh:
+        # con el lock: otra parte pudo confirmarse entre la validación y el flock
+        with transaction.atomic():
+            _check_part(_open_for(user, session_id), offset, length)
+        digest = hashlib.sha256()
+        fh.seek(offset)
+        fh.truncate()  # restos de una parte anterior que no se confirmó
+        n = 0
+        while n < length:
+            block = stream.read(min(READ_BLOCK, length - n))
+            if not block:
+                break
+            fh.write(block)
+            digest.update(block)
+            n += len(block)
+        if n != length or digest.hexdigest() != checksum.strip().lower():
+            fh.truncate(offset)
+            metrics.UPLOAD_CHUNKS.inc(result="checksum" if n == length else "short")
+            raise UploadError("Parte incompleta o con checksum distinto")
+        fh.flush()
+        os.fsync(fh.fileno())
+        try:
+            with transaction.atomic():
+                session = _open_for(user, session_id)  # cerrada o enviada mientras tanto
+                _check_part(session, offset, length)
+                session.received += length
+                session.chunks += 1
+                session.chain_sha256 = chain(session.chain_sha256, digest.digest())
+                session.save(update_fields=["received", "chunks", "chain_sha256", "updated_at"])
+        except (UploadError, UploadSession.DoesNotExist):
+            fh.truncate(offset)
+            raise
+    metrics.UPLOAD_CHUNKS.inc(result="ok")
+    metrics.UPLOAD_BYTES.inc(length)
+    return session
+
+
+def complete(user, session_id, expected_sha256: str = "") -> FileUpload:
+    """Cierra la subida: guarda el archivo en ``STORAGE_UPLOADS_URI`` y crea el
+    ``FileUpload`` del Form. Reemplaza un archivo anterior del mismo tipo en el borrador."""
+    with transaction.atomic():
+        session = _open_for(user, session_id)
+        if session.received != session.size:
+            raise OffsetMismatch(session.received)
+        if expected_sha256 and expected_sha256.strip().lower() != session.chain_sha256:
+            raise UploadError("El hash del archivo no coincide")
+        store = storage.uploads()
+        name = f"uploads/{session.form_id}-{session.file_kind}-{session.pk.hex[:12]}.csv"
+        replaced = FileUpload.objects.filter(form_id=session.form_id, file_kind=session.file_kind)
+        # el archivo reemplazado lo borra la retención (FileDeletion), como en _purge_batch
+        FileDeletion.objects.bulk_create(
+            [FileDeletion(uri=u) for u in replaced.values_list("storage_uri", flat=True) if u]
+        )
+        replaced.delete()
+        fu = FileUpload.objects.create(
+            form_id=session.form_id,
+            file_kind=session.file_kind,
+            storage_uri=store.uri_for(name),
+            original_filename=session.filename,
+        )
+        session.status = "complete"
+        session.file_upload = fu
+        session.save(update_fields=["status", "file_upload", "updated_at"])
+        # al final: si falla, el rollback deja la sesión abierta y el .part intacto
+        store.put_file(name, part_path(session), move=True)
+    return fu
+
+
+def describe(session: UploadSession) -> dict:
+    return {
+        "id": str(session.pk),
+        "form_id": session.form_id,
+        "file_kind": session.file_kind,
+        "size": session.size,
+        "offset": session.received,
+        "chunks": session.chunks,
+        "sha256": session.chain_sha256,
+        "status": session.status,
+        "chunk_max": getattr(settings, "UPLOAD_CHUNK_MAX_BYTES", 8 * 1024 * 1024),
+        "expires_at": session.expires_at.isoformat(),
+    }
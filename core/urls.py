@@ -1,7 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views  # billing y otros
 from . import views_flow as vf
 from . import views_api as api
+from . import views_async as av
+
+# ASGI: variantes async de la API JSON y del webhook (no ocupan un hilo esperando a MP)
+if getattr(settings, "ASYNC_VIEWS", False):
+    billing_webhook = av.billing_webhook_async
+    api_plans = av.api_plans_async
+    api_user_status = av.api_user_status_async
+    api_subscriptions_start = av.api_subscriptions_start_async
+else:
+    billing_webhook = views.billing_webhook
+    api_plans = api.api_plans
+    api_user_status = api.api_user_status
+    api_subscriptions_start = api.api_subscriptions_start
 
 urlpatterns = [
     # Landing / públicas
@@ -13,11 +27,16 @@ urlpatterns = [
 
     # Área autenticada
     path("account/", vf.account_view, name="account"),
+    path("account/events/", vf.account_events_view, name="account_events"),
     path("account/slot/<int:slot_id>/update/", vf.slot_update_view, name="slot_update"),
     path("account/slot/<int:slot_id>/delete/", vf.slot_delete_view, name="slot_delete"),
 
     # Formulario
     path("formulario/", vf.formulario_view, name="formulario"),
+    path("api/uploads/", vf.upload_create_view, name="upload_create"),
+    path("api/uploads/<uuid:session_id>/", vf.upload_session_view, name="upload_session"),
+    path("api/uploads/<uuid:session_id>/complete/", vf.upload_complete_view, name="upload_complete"),
+    path("api/forms/", vf.forms_api_view, name="api_forms"),
 
     # Compat de rutas anteriores (no romper enlaces ya existentes)
     path("pricing/", vf.precios_view, name="pricing"),
@@ -29,12 +48,22 @@ urlpatterns = [
     path("billing/return/", vf.billing_return_preapproval, name="billing_return"),
 
     # Webhook MP
-    path("webhooks/mercadopago", views.billing_webhook, name="billing_webhook_no_slash"),
-    path("webhooks/mercadopago/", views.billing_webhook, name="billing_webhook"),
+    path("webhooks/mercadopago", billing_webhook, name="billing_webhook_no_slash"),
+    path("webhooks/mercadopago/", billing_webhook, name="billing_webhook"),
 
     # API pública para Next.js
-    path("api/plans/", api.api_plans, name="api_plans"),
+    path("api/plans/", api_plans, name="api_plans"),
     path("api/auth/upsert_user/", api.api_auth_upsert_user, name="api_auth_upsert_user"),
-    path("api/user/status/", api.api_user_status, name="api_user_status"),
-    path("api/subscriptions/start/", api.api_subscriptions_start, name="api_subscriptions_start"),
+    path("api/auth/upsert_users/", api.api_auth_upsert_users, name="api_auth_upsert_users"),
+    path("api/user/status/", api_user_status, name="api_user_status"),
+    path("api/user/status/batch/", api.api_user_status_batch, name="api_user_status_batch"),
+    path("api/subscriptions/start/", api_subscriptions_start, name="api_subscriptions_start"),
+    path("api/entitlements/token/", api.api_entitlement_token, name="api_entitlement_token"),
+    path("api/entitlements/version/", api.api_entitlement_versions, name="api_entitlement_versions"),
+
+    # Exportaciones en streaming (staff / EXPORT_API_KEY)
+    path("api/exports/<str:dataset>/", api.export_view, name="api_export"),
+
+    # Métricas Prometheus
+    path("metrics", api.metrics_view, name="metrics"),
 ]
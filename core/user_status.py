@@ -0,0 +1,108 @@
+# core/user_status.py
+"""Estado de suscripción por email para la API de Next.js, con caché por email.
+
+``get_statuses`` resuelve N emails con una sola consulta (usuario + suscripción + plan)
+y guarda cada resultado en la caché por separado; los signals de ``core/signals.py``
+invalidan la entrada del usuario cuando cambia su suscripción o su email.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+_KEY_PREFIX = "user_status:v1:"
+
+
+def normalize_email(raw: Optional[str]) -> str:
+    return (raw or "").strip().lower()
+
+
+def status_key(email: str) -> str:
+    # hash: los emails pueden exceder el largo / charset de claves de memcached
+    return _KEY_PREFIX + hashlib.sha1(email.encode("utf-8")).hexdigest()
+
+
+def _payload(email: str, user) -> dict:
+    if user is None:
+        return {"has_user": False, "email": email, "plan": None, "status": "none"}
+    plan = None
+    status = "none"
+    sub = getattr(user, "usersubscriptioncurrent", None)
+    if sub and sub.plan:
+        status = sub.status
+        plan = {
+            "code": sub.plan.code,
+            "name": sub.plan.name,
+            "rut_quota": sub.plan.rut_quota,
+        }
+    return {"has_user": True, "email": email, "plan": plan, "status": status}
+
+
+def _wanted(emails: Iterable[str]) -> list[str]:
+    return list(dict.fromkeys(normalize_email(e) for e in emails if normalize_email(e)))
+
+
+def _users_qs(emails: list[str]):
+    return (
+        get_user_model()
+        .objects.filter(email__in=emails)
+        .select_related("usersubscriptioncurrent__plan")
+        .order_by("pk")
+    )
+
+
+def _fresh(missing: list[str], users) -> dict[str, dict]:
+    by_email: dict[str, object] = {}
+    for u in users:
+        # Emails duplicados: gana el primero, igual que .filter(email=...).first()
+        by_email.setdefault(normalize_email(u.email), u)
+    return {e: _payload(e, by_email.get(e)) for e in missing}
+
+
+def get_statuses(emails: Iterable[str]) -> dict[str, dict]:
+    """Mapa email → payload de estado. Una consulta para todos los que no estén en caché."""
+    wanted = _wanted(emails)
+    if not wanted:
+        return {}
+    keys = {status_key(e): e for e in wanted}
+    out = {keys[k]: v for k, v in cache.get_many(list(keys)).items()}
+
+    missing = [e for e in wanted if e not in out]
+    if missing:
+        fresh = _fresh(missing, _users_qs(missing))
+        cache.set_many(
+            {status_key(e): p for e, p in fresh.items()},
+            timeout=getattr(settings, "USER_STATUS_CACHE_SECONDS", 60),
+        )
+        out.update(fresh)
+    return {e: out[e] for e in wanted}
+
+
+async def aget_statuses(emails: Iterable[str]) -> dict[str, dict]:
+    """Versión async de ``get_statuses`` (caché y ORM async, sin hilo por request)."""
+    wanted = _wanted(emails)
+    if not wanted:
+        return {}
+    keys = {status_key(e): e for e in wanted}
+    out = {keys[k]: v for k, v in (await cache.aget_many(list(keys))).items()}
+
+    missing = [e for e in wanted if e not in out]
+    if missing:
+        fresh = _fresh(missing, [u async for u in _users_qs(missing)])
+        await cache.aset_many(
+            {status_key(e): p for e, p in fresh.items()},
+            timeout=getattr(settings, "USER_STATUS_CACHE_SECONDS", 60),
+        )
+        out.update(fresh)
+    return {e: out[e] for e in wanted}
+
+
+def invalidate(*emails: str) -> None:
+    """Borra el estado cacheado; llega a todos los workers solo con caché compartida (``CACHE_URL``)."""
+    keys = [status_key(normalize_email(e)) for e in emails if normalize_email(e)]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,180 @@
+# core/user_sync.py
+"""Alta/actualización de usuarios desde el frontend (NextAuth), en lote.
+
+Los usernames se asignan con un solo escaneo por prefijo de los bases involucrados
+en lugar de probar ``exists()`` sufijo por sufijo.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import or_
+from typing import Iterable
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .user_status import invalidate, normalize_email
+
+USERNAME_MAX = 30
+_ALLOC_RETRIES = 3
+_TEXT_FIELDS = ("email", "name", "provider", "provider_account_id")
+
+
+def username_base(email: str) -> str:
+    return email.split("@", 1)[0][:20] or "user"
+
+
+def _candidate(base: str, i: int) -> str:
+    if i == 0:
+        return base
+    username = f"{base}-{i}"
+    if len(username) > USERNAME_MAX:
+        username = base[: (USERNAME_MAX - len(str(i)) - 1)] + f"-{i}"
+    return username
+
+
+def taken_usernames(bases: Iterable[str]) -> set[str]:
+    """Usernames existentes que empiezan con alguno de los bases (una consulta)."""
+    bases = set(bases)
+    if not bases:
+        return set()
+    User = get_user_model()
+    cond = reduce(or_, (Q(username__startswith=b) for b in bases))
+    return set(User.objects.filter(cond).values_list("username", flat=True))
+
+
+def allocate_username(base: str, taken: set[str]) -> str:
+    """Primer ``base``, ``base-1``, ``base-2``… libre; lo agrega a ``taken``."""
+    i = 0
+    while _candidate(base, i) in taken:
+        i += 1
+    username = _candidate(base, i)
+    taken.add(username)
+    return username
+
+
+@dataclass
+class _UpsertResult:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    social_linked: int = 0
+    user_ids: dict[str, int] = field(default_factory=dict)
+    errors: list[dict] = field(default_factory=list)  # {"index", "error"} de entradas rechazadas
+
+
+def entry_error(entry: dict) -> str:
+    """Motivo por el que se rechaza una entrada; "" si es válida."""
+    for name in _TEXT_FIELDS:
+        if entry.get(name) is not None and not isinstance(entry[name], str):
+            return f"{name} must be a string"
+    return ""
+
+
+def upsert_users(entries: Iterable[dict]) -> _UpsertResult:
+    """``entries``: dicts con email, name, provider, provider_account_id. Las entradas con
+    campos que no son texto no se aplican y quedan en ``errors`` con su posición.
+
+    Una consulta para emails existentes, una para usernames ocupados, un
+    ``bulk_create``/``bulk_update`` de usuarios y un ``bulk_create`` de SocialAccount.
+    """
+    User = get_user_model()
+    by_email: dict[str, dict] = {}
+    errors = []
+    for i, e in enumerate(entries):
+        error = entry_error(e)
+        if error:
+            errors.append({"index": i, "error": error})
+            continue
+        email = normalize_email(e.get("email"))
+        if email:
+            by_email[email] = e  # email repetido: gana el último
+
+    res = _UpsertResult(errors=errors)
+    if not by_email:
+        return res
+
+    for attempt in range(_ALLOC_RETRIES):
+        try:
+            with transaction.atomic():
+                res = _upsert_once(User, by_email)
+            res.errors = errors
+            break
+        except IntegrityError:
+            # Otro proceso tomó un username entre el escaneo y el INSERT: reintentar
+            if attempt == _ALLOC_RETRIES - 1:
+                raise
+
+    invalidate(*by_email)
+    return res
+
+
+def _first_name(entry: dict) -> str:
+    return (entry.get("name") or "").strip().split(" ")[0]
+
+
+def _upsert_once(User, by_email: dict[str, dict]) -> _UpsertResult:
+    res = _UpsertResult()
+    # Orden descendente: ante emails duplicados queda el usuario más antiguo
+    existing = {
+        normalize_email(u.email): u
+        for u in User.objects.filter(email__in=list(by_email)).order_by("-pk")
+    }
+
+    to_update = []
+    for email, user in existing.items():
+        first = _first_name(by_email[email])
+        if first and user.first_name != first:
+            user.first_name = first
+            to_update.append(user)
+    if to_update:
+        User.objects.bulk_update(to_update, ["first_name"])
+    res.updated = len(to_update)
+    res.unchanged = len(existing) - len(to_update)
+
+    new_emails = [e for e in by_email if e not in existing]
+    if new_emails:
+        taken = taken_usernames(username_base(e) for e in new_emails)
+        new_users = [
+            User(
+                username=allocate_username(username_base(e), taken),
+                email=e,
+                first_name=_first_name(by_email[e]),
+            )
+            for e in new_emails
+        ]
+        User.objects.bulk_create(new_users)
+        res.created = len(new_users)
+        existing.update({normalize_email(u.email): u for u in new_users})
+
+    res.user_ids = {e: u.pk for e, u in existing.items()}
+    res.social_linked = _link_social_accounts(by_email, existing)
+    return res
+
+
+def _link_social_accounts(by_email: dict[str, dict], users: dict) -> int:
+    try:
+        from allauth.socialaccount.models import SocialAccount
+    except Exception:
+        return 0
+
+    wanted = {}
+    for email, entry in by_email.items():
+        provider = (entry.get("provider") or "").strip().lower()
+        uid = (entry.get("provider_account_id") or "").strip()
+        if provider and uid:
+            wanted[(provider, uid)] = users[email].pk
+    if not wanted:
+        return 0
+
+    cond = reduce(or_, (Q(provider=p, uid=u) for p, u in wanted))
+    linked = set(SocialAccount.objects.filter(cond).values_list("provider", "uid"))
+    missing = [
+        SocialAccount(user_id=user_id, provider=p, uid=u)
+        for (p, u), user_id in wanted.items()
+        if (p, u) not in linked
+    ]
+    SocialAccount.objects.bulk_create(missing, ignore_conflicts=True)
+    return len(missing)
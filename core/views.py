@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import json
 import logging
+from decimal import Decimal
 from typing import Optional
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.db.models import Q
 from django.http import (
     HttpRequest,
@@ -16,14 +18,16 @@ from django.http import (
 )
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.utils import timezone
 
+from . import ledger
+from .metrics import WEBHOOK_EVENTS, WEBHOOK_SECONDS, instrument_mp_sdk, timed, webhook_topic
 from .models import (
     Plan,
     UserSubscriptionCurrent,
     UserRutSlot,
     AuditLog,
 )
+from .subscriptions import activate_plan
 
 log = logging.getLogger(__name__)
 
@@ -144,7 +148,7 @@ def _get_mp_sdk():
     token = getattr(settings, "MP_ACCESS_TOKEN", "") or ""
     if not token:
         return None
-    return mercadopago.SDK(token)
+    return instrument_mp_sdk(mercadopago.SDK(token))
 
 
 @login_required
@@ -262,19 +266,91 @@ def billing_return(request: HttpRequest) -> HttpResponse:
 
 from django.views.decorators.csrf import csrf_exempt
 
+# Estados de preapproval de MP
+PREAPPROVAL_ACTIVE = ("authorized", "authorized_pending_payment", "active", "approved")
+PREAPPROVAL_INACTIVE = ("cancelled", "paused", "rejected", "expired")
+
+
+def _parse_ext_ref(ext_ref: str) -> tuple[Optional[int], Optional[str]]:
+    """``"user:12|plan:pro"`` → (12, "pro"); (None, None) si no se puede leer."""
+    try:
+        parts = dict(pair.split(":", 1) for pair in ext_ref.split("|"))
+        return int(parts.get("user")), parts.get("plan")
+    except Exception:
+        return None, None
+
+
+def _apply_payment(user_id: int, plan_code: str, payment_id="", amount=None) -> None:
+    """Cobro aprobado: activa el plan y deja el pago en el ledger (renovación si no es el
+    primer cobro del alta). Una sola transacción: el lock de la suscripción serializa los
+    reintentos del mismo pago."""
+    try:
+        plan = Plan.objects.get(code=plan_code, is_active=True)
+        try:
+            price = Decimal(str(amount)) if amount is not None else plan.price_month
+        except ArithmeticError:
+            price = plan.price_month
+        with transaction.atomic():
+            usc = activate_plan(user_id, plan)
+            if payment_id:
+                ledger.record_payment(user_id, plan.pk, str(payment_id), price, valid_to=usc.expires_at)
+        write_audit(None, "mp_webhook_activate_ok", {"user_id": user_id, "plan": plan_code})
+    except Exception as e:
+        write_audit(None, "mp_webhook_activate_err", {"user_id": user_id, "plan": plan_code, "error": str(e)})
+
+
+def _apply_preapproval(user_id: int, plan_code: str, preapproval_id, pstatus: str) -> None:
+    """Escrituras del webhook de preapproval (transacciones y signals: siempre síncrono)."""
+    # Activación
+    if pstatus in PREAPPROVAL_ACTIVE:
+        try:
+            plan = Plan.objects.get(code=plan_code, is_active=True)
+            activate_plan(
+                user_id,
+                plan,
+                provider="mercadopago",
+                external_id=str(preapproval_id),
+                days=30,
+            )
+            write_audit(None, "mp_preapproval_activate_ok", {"user_id": user_id, "plan": plan_code})
+        except Exception as e:
+            write_audit(None, "mp_preapproval_activate_err", {"user_id": user_id, "plan": plan_code, "error": str(e)})
+
+    # Cancelación/pausa/rechazo -> desactivar y limpiar slots
+    elif pstatus in PREAPPROVAL_INACTIVE:  # immediate deactivate
+        current = UserSubscriptionCurrent.objects.filter(user_id=user_id).first()
+        pid = str(preapproval_id)
+        if current and (
+            current.external_subscription_id not in ("", pid)
+            or pid == current.replaced_subscription_id
+            or current.pending_plan_id  # el cambio de plan canceló el vigente: esperar al nuevo
+        ):
+            # Cancelación del preapproval reemplazado en un cambio de plan: no tocar
+            write_audit(None, "mp_preapproval_deactivate_stale", {"user_id": user_id, "preapproval_id": preapproval_id})
+            return
+        try:
+            UserRutSlot.objects.filter(user_id=user_id).delete()
+            UserSubscriptionCurrent.objects.filter(user_id=user_id).delete()
+            write_audit(None, "mp_preapproval_deactivate_ok", {"user_id": user_id, "status": pstatus})
+        except Exception as e:
+            write_audit(None, "mp_preapproval_deactivate_err", {"user_id": user_id, "status": pstatus, "error": str(e)})
+
 
 @csrf_exempt
+@timed(WEBHOOK_SECONDS)
 def billing_webhook(request: HttpRequest) -> HttpResponse:
     try:
         body = request.body.decode("utf-8") or "{}"
         data = json.loads(body)
     except Exception:
+        WEBHOOK_EVENTS.inc(topic="invalid")
         return HttpResponseBadRequest("Invalid JSON")
 
     write_audit(None, "mp_webhook_receive", {"headers": dict(request.headers.items()), "body": data})
 
     topic = request.GET.get("type") or data.get("type")
     action = data.get("action")
+    WEBHOOK_EVENTS.inc(topic=webhook_topic(topic, action))
 
     if (topic == "payment") or (action and action.startswith("payment")):
         payment_id = data.get("data", {}).get("id") or data.get("id")
@@ -294,22 +370,9 @@ def billing_webhook(request: HttpRequest) -> HttpResponse:
         write_audit(None, "mp_payment_get_ok", {"payment_id": payment_id, "status": pstatus, "ext_ref": ext_ref})
 
         if pstatus == "approved" and ext_ref:
-            try:
-                parts = dict(pair.split(":", 1) for pair in ext_ref.split("|"))
-                user_id = int(parts.get("user"))
-                plan_code = parts.get("plan")
-            except Exception:
-                user_id, plan_code = None, None
-
+            user_id, plan_code = _parse_ext_ref(ext_ref)
             if user_id and plan_code:
-                try:
-                    plan = Plan.objects.get(code=plan_code, is_active=True)
-                    usc, _ = UserSubscriptionCurrent.objects.get_or_create(user_id=user_id)
-                    usc.plan = plan
-                    usc.save()
-                    write_audit(None, "mp_webhook_activate_ok", {"user_id": user_id, "plan": plan_code})
-                except Exception as e:
-                    write_audit(None, "mp_webhook_activate_err", {"user_id": user_id, "plan": plan_code, "error": str(e)})
+                _apply_payment(user_id, plan_code, payment_id, presp.get("transaction_amount"))
 
     # Manejo de suscripciones (preapproval): alta/cancelación/pausa
     if (topic == "preapproval") or (action and action.startswith("preapproval")):
@@ -329,44 +392,11 @@ def billing_webhook(request: HttpRequest) -> HttpResponse:
         ext_ref = presp.get("external_reference") or ""
         write_audit(None, "mp_preapproval_get_ok", {"preapproval_id": preapproval_id, "status": pstatus, "ext_ref": ext_ref})
 
-        user_id, plan_code = None, None
-        try:
-            parts = dict(pair.split(":", 1) for pair in ext_ref.split("|"))
-            user_id = int(parts.get("user"))
-            plan_code = parts.get("plan")
-        except Exception:
-            pass
-
+        user_id, plan_code = _parse_ext_ref(ext_ref)
         if not (user_id and plan_code):
             return JsonResponse({"ok": True})
 
-        # Activación
-        if pstatus in ("authorized", "authorized_pending_payment", "active", "approved"):
-            try:
-                plan = Plan.objects.get(code=plan_code, is_active=True)
-                usc, _ = UserSubscriptionCurrent.objects.get_or_create(user_id=user_id)
-                usc.plan = plan
-                usc.status = "active"
-                usc.provider = "mercadopago"
-                usc.external_subscription_id = str(preapproval_id)
-                usc.activated_at = timezone.now()
-                usc.expires_at = usc.activated_at + timezone.timedelta(days=30)
-                usc.save()
-                write_audit(None, "mp_preapproval_activate_ok", {"user_id": user_id, "plan": plan_code})
-            except Exception as e:
-                write_audit(None, "mp_preapproval_activate_err", {"user_id": user_id, "plan": plan_code, "error": str(e)})
-
-        # Cancelación/pausa/rechazo -> desactivar y limpiar slots
-        elif pstatus in ("cancelled", "paused", "rejected", "expired"):  # immediate deactivate
-            try:
-                from .models import UserRutSlot
-
-                UserRutSlot.objects.filter(user_id=user_id).delete()
-                UserSubscriptionCurrent.objects.filter(user_id=user_id).delete()
-                write_audit(None, "mp_preapproval_deactivate_ok", {"user_id": user_id, "status": pstatus})
-            except Exception as e:
-                write_audit(None, "mp_preapproval_deactivate_err", {"user_id": user_id, "status": pstatus, "error": str(e)})
-
+        _apply_preapproval(user_id, plan_code, preapproval_id, pstatus)
         return JsonResponse({"ok": True})
 
     return JsonResponse({"ok": True})
@@ -1,17 +1,25 @@
 from __future__ import annotations
 
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponseBadRequest
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    HttpResponse, JsonResponse, HttpResponseForbidden, HttpResponseBadRequest, StreamingHttpResponse,
+)
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils.crypto import get_random_string
 
+from . import exports
+from .metrics import REGISTRY
 from .models import Plan
 from .views_flow import _get_mp_sdk
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
-from django.db import transaction
-from .models import UserSubscriptionCurrent, UserRutSlot
+from .entitlements import get_versions, issue_token
+from .subscriptions import start_plan_change
+from .user_status import get_statuses, normalize_email
+from .user_sync import allocate_username, taken_usernames, upsert_users, username_base
 
 
 def api_plans(request):
@@ -55,15 +63,9 @@ def api_auth_upsert_user(request):
     try:
         user = User.objects.get(email=email)
     except User.DoesNotExist:
-        # Generate a unique username (for default Django User)
-        base = email.split("@", 1)[0][:20] or "user"
-        username = base
-        i = 0
-        while User.objects.filter(username=username).exists():
-            i += 1
-            username = f"{base}-{i}"
-            if len(username) > 30:
-                username = base[: (30 - len(str(i)) - 1)] + f"-{i}"
+        # Generate a unique username (for default Django User) with one prefix scan
+        base = username_base(email)
+        username = allocate_username(base, taken_usernames([base]))
         user = User.objects.create(username=username, email=email, first_name=(name or "").split(" ")[0])
         created = True
 
@@ -81,41 +83,127 @@ def api_auth_upsert_user(request):
     return JsonResponse({"ok": True, "created": created, "user_id": user.id})
 
 
+@csrf_exempt
+def api_auth_upsert_users(request):
+    """POST {"users": [{email, name, provider, provider_account_id}, ...]} en lote."""
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+    api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
+    if not api_key or api_key != getattr(settings, "FRONTEND_SYNC_API_KEY", ""):
+        return HttpResponseForbidden("Invalid API key")
+
+    try:
+        import json
+        body = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return HttpResponseBadRequest("Invalid JSON")
+
+    users = body.get("users") if isinstance(body, dict) else None
+    if not isinstance(users, list) or not all(isinstance(u, dict) for u in users):
+        return HttpResponseBadRequest("users must be a list of objects")
+    limit = getattr(settings, "USER_UPSERT_BATCH_MAX", 1000)
+    if len(users) > limit:
+        return HttpResponseBadRequest(f"too many users (max {limit})")
+    # Email de otro tipo: error por entrada (upsert_users); ausente o vacío: todo el lote
+    if any(u.get("email") is None or (isinstance(u["email"], str) and not normalize_email(u["email"])) for u in users):
+        return HttpResponseBadRequest("email required")
+
+    res = upsert_users(users)
+    return JsonResponse({
+        "ok": True,
+        "created": res.created,
+        "updated": res.updated,
+        "unchanged": res.unchanged,
+        "social_linked": res.social_linked,
+        "user_ids": res.user_ids,
+        "errors": res.errors,
+    })
+
+
 def api_user_status(request):
     api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
     if not api_key or api_key != getattr(settings, "FRONTEND_SYNC_API_KEY", ""):
         return HttpResponseForbidden("Invalid API key")
-    email = (request.GET.get("email") or "").strip().lower()
+    email = normalize_email(request.GET.get("email"))
     if not email:
         return HttpResponseBadRequest("email required")
+    return JsonResponse(get_statuses([email])[email])
 
-    User = get_user_model()
-    user = User.objects.filter(email=email).first()
-    if not user:
-        return JsonResponse({"has_user": False, "email": email, "plan": None, "status": "none"})
 
-    from .models import UserSubscriptionCurrent
+@csrf_exempt
+def api_user_status_batch(request):
+    """POST {"emails": [...]} → {"results": {email: estado}} en una sola consulta."""
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+    api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
+    if not api_key or api_key != getattr(settings, "FRONTEND_SYNC_API_KEY", ""):
+        return HttpResponseForbidden("Invalid API key")
+
+    try:
+        import json
+        body = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return HttpResponseBadRequest("Invalid JSON")
+
+    emails = body.get("emails") if isinstance(body, dict) else None
+    if not isinstance(emails, list) or not all(isinstance(e, str) for e in emails):
+        return HttpResponseBadRequest("emails must be a list of strings")
+    limit = getattr(settings, "USER_STATUS_BATCH_MAX", 500)
+    if len(emails) > limit:
+        return HttpResponseBadRequest(f"too many emails (max {limit})")
+
+    results = get_statuses(emails)
+    return JsonResponse({"results": results, "count": len(results)})
+
+
+@csrf_exempt
+def api_entitlement_token(request):
+    """POST {"email"} → token firmado con plan/cupo/estado/versión (verificable en Next.js)."""
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+    api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
+    if not api_key or api_key != getattr(settings, "FRONTEND_SYNC_API_KEY", ""):
+        return HttpResponseForbidden("Invalid API key")
+
+    try:
+        import json
+        body = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return HttpResponseBadRequest("Invalid JSON")
+
+    email = normalize_email(body.get("email") if isinstance(body, dict) else None)
+    if not email:
+        return HttpResponseBadRequest("email required")
 
-    sub = (
-        UserSubscriptionCurrent.objects.filter(user=user)
-        .select_related("plan")
+    User = get_user_model()
+    user = (
+        User.objects.filter(email=email)
+        .select_related("usersubscriptioncurrent__plan", "entitlement_version")
+        .order_by("pk")
         .first()
     )
-    plan = None
-    status = "none"
-    if sub and sub.plan:
-        status = sub.status
-        plan = {
-            "code": sub.plan.code,
-            "name": sub.plan.name,
-            "rut_quota": sub.plan.rut_quota,
-        }
-    return JsonResponse({
-        "has_user": True,
-        "email": email,
-        "plan": plan,
-        "status": status,
-    })
+    if not user:
+        return JsonResponse({"has_user": False, "email": email}, status=404)
+    token, claims = issue_token(user)
+    return JsonResponse({"token": token, "exp": claims["exp"], "ver": claims["ver"]})
+
+
+def api_entitlement_versions(request):
+    """GET ?user_id=1&user_id=2 → {"versions": {"1": 3, "2": 1}} (caché, sin tocar la suscripción)."""
+    api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
+    if not api_key or api_key != getattr(settings, "FRONTEND_SYNC_API_KEY", ""):
+        return HttpResponseForbidden("Invalid API key")
+    raw = request.GET.getlist("user_id")
+    if not raw:
+        return HttpResponseBadRequest("user_id required")
+    if len(raw) > getattr(settings, "USER_STATUS_BATCH_MAX", 500):
+        return HttpResponseBadRequest("too many user_id")
+    try:
+        ids = [int(x) for x in raw]
+    except ValueError:
+        return HttpResponseBadRequest("user_id must be integer")
+    versions = get_versions(ids)
+    return JsonResponse({"versions": {str(k): v for k, v in versions.items()}})
 
 
 @csrf_exempt
@@ -145,18 +233,6 @@ def api_subscriptions_start(request):
     if not sdk:
         return HttpResponseBadRequest("Mercado Pago SDK not configured")
 
-    # Cancelar suscripción anterior y limpiar
-    with transaction.atomic():
-        usc = UserSubscriptionCurrent.objects.filter(user=user).first()
-        if usc and usc.external_subscription_id:
-            try:
-                sdk.preapproval().update(usc.external_subscription_id, {"status": "cancelled"})
-            except Exception:
-                pass
-        if usc:
-            UserRutSlot.objects.filter(user=user).delete()
-            usc.delete()
-
     back_url = (getattr(settings, "PUBLIC_BASE_URL", "") or request.build_absolute_uri("/")) + reverse("billing_return")
     reason = f"Suscripción {plan.name} ({plan.rut_quota} RUTs)"
     ext_ref = f"user:{user.id}|plan:{plan.code}"
@@ -184,4 +260,68 @@ def api_subscriptions_start(request):
     if status not in (200, 201) or not init_point:
         msg = body.get("message") or body.get("error") or "No init_point"
         return HttpResponseBadRequest(f"mp error: {msg}")
+    # Con el nuevo preapproval creado: cancelar el anterior y dejar el cambio pendiente
+    # (sin borrar slots); si MP falla, el plan vigente queda intacto
+    start_plan_change(user.id, plan, sdk)
     return JsonResponse({"init_point": init_point})
+
+
+def metrics_view(request):
+    """Exposición Prometheus. Protegida con ``METRICS_API_KEY`` (X-Api-Key o Bearer)."""
+    expected = getattr(settings, "METRICS_API_KEY", "")
+    auth = request.headers.get("Authorization") or ""
+    api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
+    if auth.startswith("Bearer "):
+        api_key = auth[len("Bearer "):].strip()
+    if not expected or api_key != expected:
+        return HttpResponseForbidden("Invalid API key")
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def _aiter(chunks):
+    """Bajo ASGI un iterador síncrono se consumiría entero antes de enviar: se avanza por
+    bloque en el hilo de las vistas síncronas (mismo hilo, misma conexión y cursor)."""
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await step(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()  # cierra el cursor si el cliente se fue
+
+
+def export_view(request, dataset):
+    """GET → exportación en streaming. Staff logueado o ``EXPORT_API_KEY`` (X-Api-Key o Bearer).
+
+    ``?format=csv|jsonl&gzip=1&since=2026-01-01&until=2026-02-01&action=...&user=<id|email>``
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    expected = getattr(settings, "EXPORT_API_KEY", "")
+    auth = request.headers.get("Authorization") or ""
+    api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
+    if auth.startswith("Bearer "):
+        api_key = auth[len("Bearer "):].strip()
+    if not (request.user.is_authenticated and request.user.is_staff) and not (expected and api_key == expected):
+        return HttpResponseForbidden("Invalid API key")
+
+    fmt = request.GET.get("format") or "csv"
+    gzip = request.GET.get("gzip") in ("1", "true")
+    try:
+        chunks = exports.stream(
+            dataset,
+            fmt,
+            gzip=gzip,
+            since=exports.parse_when(request.GET["since"]) if request.GET.get("since") else None,
+            until=exports.parse_when(request.GET["until"]) if request.GET.get("until") else None,
+            action=request.GET.get("action") or "",
+            user=(request.GET.get("user") or "").strip(),
+        )
+    except exports.InvalidExport as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    resp = StreamingHttpResponse(
+        _aiter(chunks) if isinstance(request, ASGIRequest) else chunks,
+        content_type="application/gzip" if gzip else exports.FORMATS[fmt],
+    )
+    resp["Content-Disposition"] = f'attachment; filename="{exports.filename(dataset, fmt, gzip)}"'
+    resp["X-Accel-Buffering"] = "no"  # nginx: no bufferear la respuesta completa
+    return resp
@@ -0,0 +1,178 @@
+"""Variantes async de la API JSON y del webhook de MP para despliegues ASGI.
+
+Las esperas a Mercado Pago (lo más lento de cada request) se hacen con el cliente async de
+``core/mp_async.py`` sin ocupar un hilo. Las escrituras que dependen de transacciones y
+signals (``activate_plan``, bajas) reutilizan los helpers síncronos de ``core/views.py``
+vía ``sync_to_async``. Se activan con ``ASYNC_VIEWS=1`` (ver ``core/urls.py``).
+"""
+from __future__ import annotations
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+from django.views.decorators.csrf import csrf_exempt
+
+from .metrics import WEBHOOK_EVENTS, WEBHOOK_SECONDS, timed, webhook_topic
+from .models import Plan
+from .mp_async import get_async_mp
+from .subscriptions import astart_plan_change
+from .user_status import aget_statuses, normalize_email
+from .views import _apply_payment, _apply_preapproval, _parse_ext_ref, write_audit
+
+_audit = sync_to_async(write_audit)
+
+
+async def api_plans_async(request):
+    qs = Plan.objects.filter(is_active=True).order_by('rut_quota')
+    data = [
+        {
+            'code': p.code,
+            'name': p.name,
+            'price_month': str(p.price_month),
+            'rut_quota': p.rut_quota,
+            'is_active': p.is_active,
+        }
+        async for p in qs
+    ]
+    return JsonResponse(data, safe=False)
+
+
+async def api_user_status_async(request):
+    api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
+    if not api_key or api_key != getattr(settings, "FRONTEND_SYNC_API_KEY", ""):
+        return HttpResponseForbidden("Invalid API key")
+    email = normalize_email(request.GET.get("email"))
+    if not email:
+        return HttpResponseBadRequest("email required")
+    return JsonResponse((await aget_statuses([email]))[email])
+
+
+@csrf_exempt
+async def api_subscriptions_start_async(request):
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+    api_key = request.headers.get("X-Api-Key") or request.headers.get("X-API-KEY")
+    if not api_key or api_key != getattr(settings, "FRONTEND_SYNC_API_KEY", ""):
+        return HttpResponseForbidden("Invalid API key")
+
+    try:
+        body = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return HttpResponseBadRequest("Invalid JSON")
+
+    email = (body.get("email") or "").strip().lower()
+    plan_code = (body.get("plan") or "").strip()
+    if not email or not plan_code:
+        return HttpResponseBadRequest("email and plan required")
+
+    User = get_user_model()
+    user, _ = await User.objects.aget_or_create(email=email, defaults={"username": email.split("@", 1)[0][:30] or f"user-{get_random_string(6)}"})
+    try:
+        plan = await Plan.objects.aget(code=plan_code, is_active=True)
+    except Plan.DoesNotExist:
+        raise Http404("Plan not found")
+
+    mp = get_async_mp()
+    if not mp:
+        return HttpResponseBadRequest("Mercado Pago SDK not configured")
+
+    back_url = (getattr(settings, "PUBLIC_BASE_URL", "") or request.build_absolute_uri("/")) + reverse("billing_return")
+    reason = f"Suscripción {plan.name} ({plan.rut_quota} RUTs)"
+    ext_ref = f"user:{user.id}|plan:{plan.code}"
+    try:
+        resp = await mp.preapproval_create(
+            {
+                "payer_email": email,
+                "back_url": back_url,
+                "reason": reason,
+                "external_reference": ext_ref,
+                "auto_recurring": {
+                    "frequency": 1,
+                    "frequency_type": "months",
+                    "transaction_amount": float(plan.price_month),
+                    "currency_id": "CLP",
+                },
+            }
+        )
+    except Exception as e:
+        return HttpResponseBadRequest(f"preapproval error: {e}")
+
+    status = resp.get("status")
+    body = resp.get("response", {}) or {}
+    init_point = body.get("init_point") or body.get("sandbox_init_point")
+    if status not in (200, 201) or not init_point:
+        msg = body.get("message") or body.get("error") or "No init_point"
+        return HttpResponseBadRequest(f"mp error: {msg}")
+    # Con el nuevo preapproval creado: cancelar el anterior y dejar el cambio pendiente
+    # (sin borrar slots); si MP falla, el plan vigente queda intacto
+    await astart_plan_change(user.id, plan, mp)
+    return JsonResponse({"init_point": init_point})
+
+
+@csrf_exempt
+@timed(WEBHOOK_SECONDS)
+async def billing_webhook_async(request):
+    try:
+        data = json.loads(request.body.decode("utf-8") or "{}")
+    except Exception:
+        WEBHOOK_EVENTS.inc(topic="invalid")
+        return HttpResponseBadRequest("Invalid JSON")
+
+    await _audit(None, "mp_webhook_receive", {"headers": dict(request.headers.items()), "body": data})
+
+    topic = request.GET.get("type") or data.get("type")
+    action = data.get("action")
+    WEBHOOK_EVENTS.inc(topic=webhook_topic(topic, action))
+    mp = get_async_mp()
+
+    if (topic == "payment") or (action and action.startswith("payment")):
+        payment_id = data.get("data", {}).get("id") or data.get("id")
+        if not (mp and payment_id):
+            return JsonResponse({"ok": True})
+
+        try:
+            p = await mp.payment_get(payment_id)
+        except Exception as e:
+            await _audit(None, "mp_payment_get_error", {"payment_id": payment_id, "error": str(e)})
+            return JsonResponse({"ok": True})
+
+        presp = p.get("response", {}) or {}
+        pstatus = presp.get("status")
+        ext_ref = presp.get("external_reference") or ""
+        await _audit(None, "mp_payment_get_ok", {"payment_id": payment_id, "status": pstatus, "ext_ref": ext_ref})
+
+        if pstatus == "approved" and ext_ref:
+            user_id, plan_code = _parse_ext_ref(ext_ref)
+            if user_id and plan_code:
+                await sync_to_async(_apply_payment)(user_id, plan_code, payment_id, presp.get("transaction_amount"))
+
+    # Manejo de suscripciones (preapproval): alta/cancelación/pausa
+    if (topic == "preapproval") or (action and action.startswith("preapproval")):
+        preapproval_id = data.get("data", {}).get("id") or data.get("id")
+        if not (mp and preapproval_id):
+            return JsonResponse({"ok": True})
+
+        try:
+            info = await mp.preapproval_get(preapproval_id)
+        except Exception as e:
+            await _audit(None, "mp_preapproval_get_error", {"preapproval_id": preapproval_id, "error": str(e)})
+            return JsonResponse({"ok": True})
+
+        presp = info.get("response", {}) or {}
+        pstatus = (presp.get("status") or "").lower()
+        ext_ref = presp.get("external_reference") or ""
+        await _audit(None, "mp_preapproval_get_ok", {"preapproval_id": preapproval_id, "status": pstatus, "ext_ref": ext_ref})
+
+        user_id, plan_code = _parse_ext_ref(ext_ref)
+        if not (user_id and plan_code):
+            return JsonResponse({"ok": True})
+
+        await sync_to_async(_apply_preapproval)(user_id, plan_code, preapproval_id, pstatus)
+        return JsonResponse({"ok": True})
+
+    return JsonResponse({"ok": True})
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import time
+
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.conf import settings
 from django.utils import timezone
 
-from .models import Plan, UserSubscriptionCurrent, UserRutSlot, Form, AuditLog
+from . import form_history, live, uploads
+from .metrics import instrument_mp_sdk
+from .models import Plan, UserSubscriptionCurrent, UserRutSlot, Form, AuditLog, RutFormSummary
+from .subscriptions import start_plan_change
 
 
 def _get_mp_sdk():
@@ -22,7 +31,7 @@ def _get_mp_sdk():
         return None
     try:
         sdk = mercadopago.SDK(access_token)
-        return sdk
+        return instrument_mp_sdk(sdk)
     except Exception:
         return None
 
@@ -50,26 +59,13 @@ def contratar_plan_view(request: HttpRequest, plan_code: str) -> HttpResponse:
     if not request.user.is_authenticated:
         return redirect(reverse("account_signup") + f"?plan={plan.code}")
 
-    # Si tiene suscripción activa existente, cancelarla en MP y dejar sin plan
-    existing = UserSubscriptionCurrent.objects.filter(user=request.user).first()
-    preapproval_id = None
-    if existing and existing.external_subscription_id:
-        sdk = _get_mp_sdk()
-        if sdk:
-            try:
-                sdk.preapproval().update(existing.external_subscription_id, {"status": "cancelled"})
-            except Exception:
-                pass
-        # Remover slots y dejar al usuario sin suscripción
-        UserRutSlot.objects.filter(user=request.user).delete()
-        existing.delete()
-
-    # Crear preapproval (suscripción recurrente)
     sdk = _get_mp_sdk()
     if not sdk:
         messages.error(request, "Configuración de Mercado Pago incompleta. Contacta soporte.")
         return redirect("precios")
 
+    # Crear preapproval (suscripción recurrente)
+
     back_url = (getattr(settings, "PUBLIC_BASE_URL", "") or request.build_absolute_uri("/")) + reverse(
         "billing_return"
     )
@@ -123,17 +119,96 @@ def contratar_plan_view(request: HttpRequest, plan_code: str) -> HttpResponse:
         messages.error(request, f"Mercado Pago no pudo iniciar la suscripción. {msg}")
         return redirect("precios")
 
+    # Cambio de plan en la misma fila, solo con el nuevo preapproval ya creado (si MP
+    # falla, el vigente sigue cobrando): cancela el anterior en MP y deja el nuevo plan
+    # pendiente hasta el webhook (slots y RUTs se conservan)
+    start_plan_change(request.user.id, plan, sdk)
+    # /account/ sigue el estado en vivo hasta que llegue el webhook (ver _live_mode)
+    request.session[PAYMENT_PENDING_KEY] = time.time()
     # Redirigir al flujo de autorización de suscripción
     return redirect(init_point)
 
 
+PAYMENT_PENDING_KEY = "payment_pending_since"
+
+
+def _live_mode(request: HttpRequest, sub) -> str:
+    """Cómo sigue /account/ el estado de la suscripción: "sse" bajo ASGI, "poll" (sondeo
+    corto de /account/events/?poll=1) bajo WSGI, donde cada stream ocuparía un hilo del
+    worker, o "" si no hay nada pendiente: un pago recién iniciado o un cambio de plan."""
+    if sub and sub.plan_id and sub.status == "active" and not sub.pending_plan_id:
+        request.session.pop(PAYMENT_PENDING_KEY, None)
+        return ""
+    since = request.session.get(PAYMENT_PENDING_KEY)
+    waiting = since and time.time() - since < getattr(settings, "LIVE_PENDING_SECONDS", 900)
+    if not (waiting or (sub and sub.pending_plan_id)):
+        return ""
+    return "sse" if isinstance(request, ASGIRequest) else "poll"
+
+
 @login_required
 def account_view(request: HttpRequest) -> HttpResponse:
     sub = (
-        UserSubscriptionCurrent.objects.filter(user=request.user).select_related("plan").first()
+        UserSubscriptionCurrent.objects.filter(user=request.user)
+        .select_related("plan", "pending_plan")
+        .first()
+    )
+    slots = list(UserRutSlot.objects.filter(user=request.user).order_by("slot_index"))
+    # Resumen de envíos por RUT (core/rut_summary.py): una consulta para todos los slots
+    summaries = {
+        s.rut: s
+        for s in RutFormSummary.objects.filter(user=request.user, rut__in=[s.rut for s in slots if s.rut])
+    }
+    for s in slots:
+        s.summary = summaries.get(s.rut)
+    return render(
+        request,
+        "core/account.html",
+        {
+            "subscription": sub,
+            "slots": slots,
+            "live_mode": _live_mode(request, sub),
+            "live_poll_ms": int(getattr(settings, "LIVE_CLIENT_POLL_SECONDS", 5) * 1000),
+            "live_max_ms": int(getattr(settings, "LIVE_PENDING_SECONDS", 900) * 1000),
+        },
     )
-    slots = UserRutSlot.objects.filter(user=request.user).order_by("slot_index")
-    return render(request, "core/account.html", {"subscription": sub, "slots": slots})
+
+
+@login_required
+async def account_events_view(request: HttpRequest) -> HttpResponse:
+    """SSE con el estado de la suscripción; reemplaza recargar /account/ tras el checkout.
+
+    Vista async: bajo ASGI (``config/asgi.py``) cada conexión abierta es solo una cola en
+    el hub de ``core/live.py``, sin hilo propio. Bajo WSGI, o con ``?poll=1``, responde el
+    estado actual en JSON (sondeo corto) en vez de mantener la conexión.
+    """
+    user = await request.auser()
+    if request.GET.get("poll") or not isinstance(request, ASGIRequest):
+        return JsonResponse(await sync_to_async(live.current_state)(user.pk))
+    heartbeat = getattr(settings, "LIVE_HEARTBEAT_SECONDS", 15)
+    max_seconds = getattr(settings, "LIVE_STREAM_MAX_SECONDS", 300)
+
+    async def stream():
+        # Suscribir antes de leer el estado: un commit entre ambos no se pierde
+        q = live.hub.subscribe(user.pk)
+        try:
+            yield live.sse(await sync_to_async(live.current_state)(user.pk), retry_ms=3000)
+            deadline = time.monotonic() + max_seconds
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    payload = await asyncio.wait_for(q.get(), timeout=min(heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                payload.pop("user_id", None)
+                yield live.sse(payload)
+        finally:
+            live.hub.unsubscribe(user.pk, q)
+
+    resp = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # nginx: no bufferear el stream
+    return resp
 
 
 @login_required
@@ -184,7 +259,11 @@ def formulario_view(request: HttpRequest) -> HttpResponse:
         if not slot_id:
             messages.error(request, "Selecciona un RUT válido.")
             return redirect("formulario")
-        form = Form.objects.create(
+        # Form borrador con archivos ya subidos por /api/uploads/, o uno nuevo
+        form_id = request.POST.get("form_id")
+        form = (
+            Form.objects.filter(pk=form_id, user=request.user, status="draft").first() if form_id else None
+        ) or Form.objects.create(
             user=request.user,
             type=(request.POST.get("type") or "compras"),
             sii_rut=(request.POST.get("sii_rut") or ""),
@@ -212,3 +291,112 @@ def billing_return_preapproval(request: HttpRequest) -> HttpResponse:
     else:
         messages.info(request, "Tu suscripción está pendiente de confirmación (webhook).")
     return redirect("account")
+
+
+# ============ Subidas reanudables (core/uploads.py) ============
+
+def _upload_error(e: uploads.UploadError) -> JsonResponse:
+    data = {"error": str(e)}
+    if isinstance(e, uploads.OffsetMismatch):
+        data["offset"] = e.offset
+    return JsonResponse(data, status=e.status)
+
+
+@login_required
+def upload_create_view(request: HttpRequest) -> HttpResponse:
+    """POST {file_kind, filename, size, form_id? | type + sii_rut} → sesión de subida."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    try:
+        body = json.loads(request.body.decode("utf-8"))
+        if not isinstance(body, dict):
+            raise ValueError
+        size = int(body.get("size") or 0)
+        form_id = int(body.get("form_id") or 0)
+        text = {k: body.get(k) or "" for k in ("file_kind", "filename", "type", "sii_rut")}
+        if not all(isinstance(v, str) for v in text.values()):
+            raise TypeError
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    form = None
+    if form_id:
+        form = get_object_or_404(Form, pk=form_id, user=request.user)
+    try:
+        session = uploads.create_session(
+            request.user,
+            file_kind=text["file_kind"].strip(),
+            filename=text["filename"].strip(),
+            size=size,
+            form=form,
+            form_type=text["type"] or "compras",
+            sii_rut=text["sii_rut"].strip(),
+        )
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return JsonResponse(uploads.describe(session), status=201)
+
+
+@login_required
+def upload_session_view(request: HttpRequest, session_id) -> HttpResponse:
+    """GET: estado y offset para reanudar. PUT: una parte (``Upload-Offset`` + ``X-Chunk-Sha256``);
+    el cuerpo se lee del stream en bloques, nunca con ``request.body``."""
+    if request.method == "GET":
+        session = get_object_or_404(uploads.UploadSession, pk=session_id, user=request.user)
+        return JsonResponse(uploads.describe(session))
+    if request.method != "PUT":
+        return JsonResponse({"error": "GET or PUT required"}, status=405)
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return JsonResponse({"error": "Upload-Offset y Content-Length requeridos"}, status=400)
+    checksum = request.headers.get("X-Chunk-Sha256", "")
+    if not checksum:
+        return JsonResponse({"error": "X-Chunk-Sha256 requerido"}, status=400)
+    try:
+        session = uploads.write_chunk(request.user, session_id, offset, request, length, checksum)
+    except uploads.UploadSession.DoesNotExist:
+        raise Http404
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return JsonResponse(uploads.describe(session))
+
+
+@login_required
+def upload_complete_view(request: HttpRequest, session_id) -> HttpResponse:
+    """POST {sha256?}: verifica y crea el FileUpload del Form borrador."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    try:
+        body = json.loads(request.body.decode("utf-8") or "{}")
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    try:
+        fu = uploads.complete(request.user, session_id, body.get("sha256") or "")
+    except uploads.UploadSession.DoesNotExist:
+        raise Http404
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return JsonResponse({"file_upload_id": fu.pk, "form_id": fu.form_id, "file_kind": fu.file_kind})
+
+
+# ============ Historial de formularios (core/form_history.py) ============
+
+@login_required
+def forms_api_view(request: HttpRequest) -> HttpResponse:
+    """GET ?type=&status=&sii_rut=&limit=&cursor= → página de Forms del usuario."""
+    if request.method != "GET":
+        return JsonResponse({"error": "GET required"}, status=405)
+    params = request.GET.copy()
+    cursor = params.pop("cursor", [""])[-1]
+    try:
+        limit = int(params.pop("limit", [form_history.DEFAULT_LIMIT])[-1])
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= form_history.MAX_LIMIT:
+        return JsonResponse({"error": f"limit debe estar entre 1 y {form_history.MAX_LIMIT}"}, status=400)
+    try:
+        data = form_history.page(request.user, params.dict(), cursor or None, limit)
+    except form_history.InvalidQuery as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(data)